@@ -0,0 +1,51 @@
+"""
+PostgreSQL backend that records connect times and health check failures, and can hand out connections from a
+process-wide pool. Enable the pool with OPTIONS["pool"] (True, or a dict of ConnectionPool arguments) and
+CONN_MAX_AGE 0: closing a connection at the end of a request then returns it to the pool.
+"""
+import time
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgreSQLDatabaseWrapper
+from DjangoCoreAPI.db_backend.metrics import connection_metrics
+from DjangoCoreAPI.db_backend.pool import get_pool
+
+
+class DatabaseWrapper(PostgreSQLDatabaseWrapper):
+
+    @property
+    def pool(self):
+        options = self.settings_dict['OPTIONS'].get('pool')
+        return get_pool(self.alias, options) if options else None
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)  # Not a libpq parameter
+        return params
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return self.open_connection(conn_params)
+        return pool.acquire(lambda: self.open_connection(conn_params))
+
+    def open_connection(self, conn_params):
+        started = time.monotonic()
+        try:
+            connection = super().get_new_connection(conn_params)
+        except Exception:
+            connection_metrics.record_connect(self.alias, time.monotonic() - started, failed=True)
+            raise
+        connection_metrics.record_connect(self.alias, time.monotonic() - started)
+        return connection
+
+    def is_usable(self):
+        usable = super().is_usable()
+        if not usable:
+            connection_metrics.record_unusable(self.alias)
+        return usable
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.release(self.connection)
@@ -0,0 +1,67 @@
+import threading
+
+
+class ConnectionMetrics:
+    """
+    Process-local connection counters of each database alias: connects and their duration, unusable
+    connections dropped by the health checks, and pool acquisitions with the time spent waiting for a connection
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.aliases = {}
+
+    def counters(self, alias):
+        # Called with the lock held
+        return self.aliases.setdefault(alias, {
+            'connects': 0,
+            'connect_errors': 0,
+            'connect_seconds_total': 0.0,
+            'connect_seconds_max': 0.0,
+            'unusable': 0,
+            'acquisitions': 0,
+            'waits': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+            'wait_timeouts': 0,
+        })
+
+    def record_connect(self, alias, seconds, failed=False):
+        with self.lock:
+            counters = self.counters(alias)
+            if failed:
+                counters['connect_errors'] += 1
+                return
+            counters['connects'] += 1
+            counters['connect_seconds_total'] += seconds
+            counters['connect_seconds_max'] = max(counters['connect_seconds_max'], seconds)
+
+    def record_unusable(self, alias):
+        with self.lock:
+            self.counters(alias)['unusable'] += 1
+
+    def record_acquire(self, alias, waited=None, timed_out=False):
+        """
+        `waited` is None when a connection was free (or could be opened) right away
+        """
+        with self.lock:
+            counters = self.counters(alias)
+            if timed_out:
+                counters['wait_timeouts'] += 1
+            else:
+                counters['acquisitions'] += 1
+            if waited is not None:
+                counters['waits'] += 1
+                counters['wait_seconds_total'] += waited
+                counters['wait_seconds_max'] = max(counters['wait_seconds_max'], waited)
+
+    def snapshot(self, alias):
+        with self.lock:
+            return dict(self.counters(alias))
+
+
+connection_metrics = ConnectionMetrics()
@@ -0,0 +1,128 @@
+import threading
+import time
+from psycopg2 import OperationalError
+from DjangoCoreAPI.db_backend.metrics import connection_metrics
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of open psycopg2 connections of one alias, shared by every thread. At most `max_size`
+    connections are open, a caller waits up to `timeout` seconds for one to be released. A connection idle
+    for more than `check_idle_seconds` is checked with a round trip before it is handed out again, as the
+    server or a proxy may have dropped it meanwhile.
+    """
+
+    def __init__(self, alias, max_size=10, timeout=5, check_idle_seconds=5):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_idle_seconds = check_idle_seconds
+        self.condition = threading.Condition()
+        self.idle = []  # (connection, released at)
+        self.size = 0  # Open connections, idle or in use
+
+    def acquire(self, connect):
+        """
+        A usable idle connection, or a new one from `connect()` while the pool is not full
+        """
+        while True:
+            connection, released_at = self.take()
+            if connection is None:
+                try:
+                    return connect()
+                except BaseException:
+                    self.discard()
+                    raise
+            if self.usable(connection, released_at):
+                return connection
+            connection_metrics.record_unusable(self.alias)
+            if not connection.closed:
+                connection.close()
+            self.discard()
+
+    def take(self):
+        """
+        An idle connection and the time it was released, or (None, None) with a slot reserved for a new one
+        """
+        waited_since = None
+        with self.condition:
+            while not self.idle and self.size >= self.max_size:
+                if waited_since is None:
+                    waited_since = time.monotonic()
+                remaining = self.timeout - (time.monotonic() - waited_since)
+                if remaining <= 0 or not self.condition.wait(remaining):
+                    if self.idle or self.size < self.max_size:
+                        break
+                    connection_metrics.record_acquire(self.alias, time.monotonic() - waited_since, timed_out=True)
+                    raise OperationalError(
+                        f'No connection of the "{self.alias}" pool was released within {self.timeout} seconds'
+                    )
+            waited = None if waited_since is None else time.monotonic() - waited_since
+            if self.idle:
+                connection, released_at = self.idle.pop()
+            else:
+                connection, released_at = None, None
+                self.size += 1
+        connection_metrics.record_acquire(self.alias, waited)
+        return connection, released_at
+
+    def usable(self, connection, released_at):
+        if connection.closed:
+            return False
+        if time.monotonic() - released_at < self.check_idle_seconds:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            connection.rollback()  # Django turns autocommit back on once it gets the connection
+            return True
+        except Exception:
+            return False
+
+    def release(self, connection):
+        """
+        Roll back and reset the session of a connection and keep it for the next caller. Broken connections are closed.
+        """
+        try:
+            if connection.closed:
+                raise OperationalError()
+            connection.reset()  # Rolls back and runs RESET ALL
+        except Exception:
+            if not connection.closed:
+                connection.close()
+            self.discard()
+            return
+        with self.condition:
+            self.idle.append((connection, time.monotonic()))
+            self.condition.notify()
+
+    def discard(self):
+        with self.condition:
+            self.size -= 1
+            self.condition.notify()
+
+    def close(self):
+        """
+        Close the idle connections, connections in use are closed when they are released
+        """
+        with self.condition:
+            idle, self.idle = self.idle, []
+            self.size -= len(idle)
+        for connection, _ in idle:
+            connection.close()
+
+    def stats(self):
+        with self.condition:
+            return {'size': self.size, 'idle': len(self.idle), 'max_size': self.max_size, 'timeout': self.timeout}
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(alias, options):
+    with pools_lock:
+        if alias not in pools:
+            options = options if isinstance(options, dict) else {}
+            pools[alias] = ConnectionPool(alias, **options)
+        return pools[alias]
@@ -0,0 +1,212 @@
+"""
+Read replica routing.
+
+Requests with a safe method read from one of the DATABASE_REPLICAS, everything else uses the primary
+("default"). A replica is skipped while its replication lag is above REPLICA_MAX_LAG_SECONDS. After a write,
+the client (by cookie, and its user once authenticated) keeps reading from the primary for
+REPLICA_STICKY_SECONDS so it sees its own writes. Outside of requests (commands, shell) and inside use_primary()
+the primary is used, the response cache fills its shared entries that way.
+The lag is measured in a background thread, requests only read the last measurement.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import LazyObject, empty
+
+STICKY_COOKIE = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_request = ContextVar('db_routing_request', default=None)
+_primary_only = ContextVar('db_routing_primary_only', default=False)
+
+# Position of the primary's WAL when the check starts
+PRIMARY_LSN_SQL = "SELECT pg_current_wal_lsn()"
+
+# Seconds since the replica last replayed a transaction, 0 once it replayed the primary's position (%s).
+# A replica whose WAL receiver stopped does not catch up, so its lag keeps growing until it is skipped.
+# NULL when it is behind but replayed nothing since it started.
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_replay_lsn() >= %s::pg_lsn THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+@contextmanager
+def use_primary():
+    """
+    Read from the primary inside this block, e.g. to fill a shared cache
+    """
+    token = _primary_only.set(True)
+    try:
+        yield
+    finally:
+        _primary_only.reset(token)
+
+
+class ReplicaHealth:
+    """
+    Process-local replication lag of each replica. Once the last measurement is older than
+    REPLICA_LAG_CHECK_SECONDS, one background thread measures again while requests keep using the old one.
+    Until the first measurement finishes, every read goes to the primary.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.refresh_thread = None
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.lags = {}  # alias -> lag in seconds, None when unreachable
+            self.checked_at = None
+
+    def measure(self, alias, primary_lsn):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(LAG_SQL, [primary_lsn])
+                return float(cursor.fetchone()[0])
+        except Exception:
+            return None
+
+    def primary_lsn(self):
+        try:
+            with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+                cursor.execute(PRIMARY_LSN_SQL)
+                return cursor.fetchone()[0]
+        except Exception:
+            return None
+
+    def refresh(self):
+        try:
+            # Without the primary's position no replica can be shown to be current
+            primary_lsn = self.primary_lsn()
+            lags = {}
+            for alias in replicas():
+                lags[alias] = self.measure(alias, primary_lsn) if primary_lsn is not None else None
+            for alias in (DEFAULT_DB_ALIAS, *replicas()):
+                try:
+                    connections[alias].close()  # The thread's own connections
+                except Exception:
+                    pass
+            with self.lock:
+                self.lags, self.checked_at = lags, time.monotonic()
+        finally:
+            self.refresh_lock.release()
+
+    def healthy(self):
+        """
+        Aliases of the replicas close enough to the primary to read from, as of the last measurement
+        """
+        with self.lock:
+            lags, checked_at = self.lags, self.checked_at
+        max_age = getattr(settings, 'REPLICA_LAG_CHECK_SECONDS', 5)
+        if (checked_at is None or time.monotonic() - checked_at > max_age) and self.refresh_lock.acquire(blocking=False):
+            self.refresh_thread = threading.Thread(target=self.refresh, name='replica-lag-check', daemon=True)
+            self.refresh_thread.start()
+        max_lag = getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 5)
+        return [alias for alias, lag in lags.items() if lag is not None and lag <= max_lag]
+
+
+replica_health = ReplicaHealth()
+
+
+def sticky_key(user_id):
+    return f'db_routing:sticky:{user_id}'
+
+
+def get_cache():
+    # The response cache's backend, shared by every worker when it is Redis or Memcached
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def authenticated_user(request):
+    # AuthenticationMiddleware's lazy user is not evaluated here: loading it is itself a routed read
+    user = request.__dict__.get('user')
+    if isinstance(user, LazyObject) and user._wrapped is empty:
+        return None
+    return user if user is not None and user.is_authenticated else None
+
+
+def reads_from_primary(request):
+    """
+    Whether this request must not read from a replica: a write, or a client that wrote recently
+    """
+    if request.method not in SAFE_METHODS:
+        return True
+    try:
+        if float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time():
+            return True
+    except ValueError:
+        pass
+    user = authenticated_user(request)
+    if user is None:
+        return False
+    # The user is only known once the view authenticated it, look the marker up once per request
+    if getattr(request, '_db_routing_user', None) != user.pk:
+        request._db_routing_user = user.pk
+        request._db_routing_sticky = get_cache().get(sticky_key(user.pk)) is not None
+    return request._db_routing_sticky
+
+
+class ReplicaRouter:
+    """
+    Reads go to a healthy replica when the current request allows it, writes and migrations to the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        request = _request.get()
+        if request is None or not replicas() or _primary_only.get() or reads_from_primary(request):
+            return DEFAULT_DB_ALIAS
+        healthy = replica_health.healthy()
+        return random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Makes the request visible to ReplicaRouter and marks clients that wrote as sticky to the primary
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _request.set(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            sticky = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+            response.set_cookie(STICKY_COOKIE, str(time.time() + sticky), max_age=sticky, httponly=True, samesite='Lax')
+            user = authenticated_user(request)
+            if user is not None:
+                get_cache().set(sticky_key(user.pk), 1, sticky)
+        return response
@@ -0,0 +1,126 @@
+"""
+Cache of serialized API responses, invalidated by version keys.
+
+Every cached response belongs to one or more namespaces ("questions", "question:12", ...). Each namespace has
+a version number in the cache and the versions are part of the response key, so bumping a namespace makes
+every response built from it unreachable at once, without knowing their keys. Writes bump through signals
+(see questions.signals and users.signals) or explicitly where the ORM sends none (raw SQL, bulk operations).
+
+The cache alias is RESPONSE_CACHE_ALIAS: the default local memory cache is per process, a shared backend
+(Redis, Memcached) configured under that alias is shared by every worker.
+"""
+import hashlib
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from rest_framework import status
+from rest_framework.response import Response
+from DjangoCoreAPI.db_routing import use_primary
+
+KEY_PREFIX = 'response'
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def version_key(namespace):
+    return f'{KEY_PREFIX}:version:{namespace}'
+
+
+def initial_version():
+    # A fresh namespace, or one evicted from the cache, must not meet responses cached under an old version
+    return int(time.time() * 1000)
+
+
+def get_versions(namespaces):
+    cache = get_cache()
+    keys = [version_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, initial_version())
+            versions[key] = cache.get(key)
+    return [str(versions[key]) for key in keys]
+
+
+def _bump(namespaces):
+    cache = get_cache()
+    for namespace in namespaces:
+        try:
+            cache.incr(version_key(namespace))
+        except ValueError:
+            cache.set(version_key(namespace), initial_version())
+
+
+def bump(*namespaces):
+    """
+    Invalidate every response of these namespaces. Inside a transaction the versions are bumped again
+    when it commits, so a response cached from a read in between is not kept.
+    """
+    _bump(namespaces)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _bump(namespaces))
+
+
+def get_or_set(key, namespaces, compute, timeout=None):
+    """
+    Cached value of compute() for `key` under the current versions of `namespaces`. compute() returns
+    (value, cacheable). Only one caller recomputes a missing value, the others wait for it for up to
+    RESPONSE_CACHE_LOCK_WAIT seconds and then compute it themselves.
+    """
+    cache = get_cache()
+    if timeout is None:
+        timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+    full_key = f'{KEY_PREFIX}:{key}:{".".join(get_versions(namespaces))}'
+    value = cache.get(full_key)
+    if value is not None:
+        return value
+
+    lock_wait = getattr(settings, 'RESPONSE_CACHE_LOCK_WAIT', 2)
+    lock_key = f'{full_key}:lock'
+    if not cache.add(lock_key, 1, timeout=lock_wait):
+        deadline = time.monotonic() + lock_wait
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            value = cache.get(full_key)
+            if value is not None:
+                return value
+        return compute()[0]
+    try:
+        value, cacheable = compute()
+        if cacheable:
+            cache.set(full_key, value, timeout)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+def cache_response(namespaces, timeout=None, per_user=False):
+    """
+    Cache the data of a view's successful GET responses per absolute URL (pagination links contain the host).
+    `namespaces` is a list, or a function of (request, *args, **kwargs) returning one.
+    per_user keeps a separate entry for every user, for responses carrying the requesting user's flags.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            names = namespaces(request, *args, **kwargs) if callable(namespaces) else namespaces
+            path = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+            key = f'{view.__class__.__name__}:{path}'
+            if per_user:
+                key = f'{key}:{request.user.pk if request.user.is_authenticated else "anon"}'
+
+            def compute():
+                # Entries are stored under the versions bumped by the last write, so they are filled from the
+                # primary: a lagging replica would keep serving the data from before that write until they expire
+                with use_primary():
+                    response = method(view, request, *args, **kwargs)
+                return (response.status_code, response.data), response.status_code == status.HTTP_200_OK
+
+            status_code, data = get_or_set(key, names, compute, timeout)
+            return Response(data, status=status_code)
+        return wrapper
+    return decorator
@@ -26,11 +26,13 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'drf_yasg',
     'users',
     'questions',
+    'ai',
     'corsheaders',
     'django_filters',
 ]
@@ -41,6 +43,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'DjangoCoreAPI.db_routing.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -73,16 +76,50 @@ WSGI_APPLICATION = 'DjangoCoreAPI.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# Connections (DjangoCoreAPI/db_backend) stay open for DATABASE_CONN_MAX_AGE seconds and are health checked
+# before they are reused. DATABASE_POOL_SIZE switches to a process-wide pool instead, for ASGI workers whose
+# thread-bound persistent connections are not reused; a request waits up to DATABASE_POOL_TIMEOUT seconds for
+# a free connection. Behind a transaction pooling proxy (PgBouncer pool_mode = transaction) set
+# DATABASE_TRANSACTION_POOLING=1: server-side cursors do not survive the end of a transaction there.
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "DjangoCoreAPI.db_backend",
         "NAME": "solinher",
         "USER": "postgres",
         "PASSWORD": "123456",
         "HOST": "127.0.0.1",
         "PORT": "5432",
+        "CONN_MAX_AGE": int(os.environ.get("DATABASE_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
+        "DISABLE_SERVER_SIDE_CURSORS": os.environ.get("DATABASE_TRANSACTION_POOLING") == "1",
+        "OPTIONS": {},
     }
 }
+if os.environ.get("DATABASE_POOL_SIZE"):
+    DATABASES["default"]["CONN_MAX_AGE"] = 0  # Connections go back to the pool at the end of each request
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "max_size": int(os.environ["DATABASE_POOL_SIZE"]),
+        "timeout": float(os.environ.get("DATABASE_POOL_TIMEOUT", 5)),
+    }
+
+# Read replicas (DjangoCoreAPI/db_routing.py): safe method requests read from a replica listed in
+# DATABASE_REPLICAS whose lag is at most REPLICA_MAX_LAG_SECONDS, measured every REPLICA_LAG_CHECK_SECONDS.
+# A client that wrote reads from the primary for REPLICA_STICKY_SECONDS. Without replicas everything uses default.
+DATABASE_REPLICAS = []
+if os.environ.get("DATABASE_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.environ["DATABASE_REPLICA_HOST"],
+        "PORT": os.environ.get("DATABASE_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        # An unreachable replica fails its lag check quickly instead of after the TCP timeout
+        "OPTIONS": {**DATABASES["default"]["OPTIONS"], "connect_timeout": 2},
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append("replica")
+DATABASE_ROUTERS = ['DjangoCoreAPI.db_routing.ReplicaRouter']
+REPLICA_MAX_LAG_SECONDS = 5
+REPLICA_LAG_CHECK_SECONDS = 5
+REPLICA_STICKY_SECONDS = 10
 
 
 # Password validation
@@ -125,6 +162,9 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Knowledge base documents for the RAG search (pdf_files/ and txt_files/ sub directories)
+AI_DOCUMENTS_ROOT = os.path.join(BASE_DIR, 'static')
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -144,6 +184,59 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Response cache (DjangoCoreAPI.response_cache). The local memory cache is per process; for several
+# workers point RESPONSE_CACHE_ALIAS at a shared backend, e.g.
+# 'shared': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379'}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300 # Seconds, writes invalidate earlier
+RESPONSE_CACHE_LOCK_WAIT = 2 # Seconds a request waits for another one recomputing the same response
+
+# Keyset pagination of the question lists (?page_size= is capped by the max)
+QUESTIONS_PAGE_SIZE = 20
+QUESTIONS_MAX_PAGE_SIZE = 100
+QUESTION_EXCERPT_LENGTH = 200 # Characters of the body in list items
+
+# Keyset pagination of a question's comments, the question detail embeds the first page
+COMMENTS_PAGE_SIZE = 20
+COMMENTS_MAX_PAGE_SIZE = 100
+
+# Rows fetched per server-side cursor round trip by the NDJSON export (questions/export.py)
+EXPORT_CHUNK_SIZE = 2000
+
+# Records loaded per transaction by manage.py import_questions
+IMPORT_BATCH_SIZE = 1000
+
+# Hours after which a question's trending score has halved, applied by manage.py decay_trending_scores
+TRENDING_HALF_LIFE_HOURS = 6
+
+# Search falls back to trigram matching below this many full text hits (1: only when nothing matches),
+# with this similarity threshold (0 to 1)
+SEARCH_FUZZY_MIN_HITS = 1
+SEARCH_FUZZY_THRESHOLD = 0.4
+
+# Autocomplete prefix index: rebuilt from the database in the background after this many seconds (0: never)
+SUGGESTIONS_REFRESH_SECONDS = 300
+
+# The process-local tag name -> id registry is dropped after this many seconds
+TAG_REGISTRY_SECONDS = 300
+
+# Number of co-occurring tags kept in each tag's statistics
+TAG_STATS_RELATED = 5
+
+# Changes feed: rows per stream and response, seconds recent writes are held back until earlier
+# transactions have committed, and days deletions are remembered (prune_tombstones)
+SYNC_PAGE_SIZE = 200
+SYNC_SETTLE_SECONDS = 2
+SYNC_TOMBSTONE_DAYS = 30
+
+# Most operations accepted by one bulk-reactions/ request
+BULK_REACTIONS_MAX_BATCH = 500
+
 
 # SimpleJWT settings (optional)
 SIMPLE_JWT = {
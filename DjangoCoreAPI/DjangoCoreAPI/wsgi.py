@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DjangoCoreAPI.settings')
 
 application = get_wsgi_application()
+
+# Build the autocomplete index while the server starts instead of on the first request
+from questions.suggestions import suggestion_index  # noqa: E402 Needs the app registry loaded above
+suggestion_index.start_build()
@@ -1,3 +1,4 @@
 from django.contrib import admin
+from ai.models import Document
 
-# Register your models here.
+admin.site.register(Document)
@@ -0,0 +1,76 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from ai.models import Document
+
+logger = logging.getLogger(__name__)
+
+# Single worker so uploads are indexed one after another and never block a request thread
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="document-indexing")
+
+PROGRESS_INTERVAL = 1.0  # Seconds between progress writes
+
+
+def save_upload(uploaded_file):
+    """
+    Store an uploaded file next to the documents RAGManager loads at startup
+    and return its path relative to AI_DOCUMENTS_ROOT
+    """
+    storage = FileSystemStorage(location=settings.AI_DOCUMENTS_ROOT)
+    subdir = "pdf_files" if uploaded_file.name.lower().endswith(".pdf") else "txt_files"
+    return storage.save(os.path.join(subdir, os.path.basename(uploaded_file.name)), uploaded_file)
+
+
+def queue_document(document):
+    """
+    Queue the indexing job once the document row is committed
+    """
+    transaction.on_commit(lambda: executor.submit(run_job, index_document, document.pk))
+
+
+def run_job(job, *args):
+    """
+    Run a job on the worker thread, which keeps its own database connection
+    """
+    close_old_connections()
+    try:
+        job(*args)
+    finally:
+        connection.close()
+
+
+def index_document(document_id):
+    """
+    Background job: extract, chunk and embed a document into the FAISS index of this process
+    """
+    # Imported here so the embedding model is only loaded by the worker
+    from ai.rag_manager import RAGManager
+
+    documents = Document.objects.filter(pk=document_id)
+    documents.update(status='processing', started_at=timezone.now())
+    last_report = [0.0]
+
+    def on_progress(pages_done, pages_total, chunks_done, chunks_total):
+        now = time.monotonic()
+        finished = chunks_total and chunks_done == chunks_total
+        if now - last_report[0] < PROGRESS_INTERVAL and not finished:
+            return
+        last_report[0] = now
+        documents.update(
+            pages_processed=pages_done, pages_total=pages_total,
+            chunks_indexed=chunks_done, chunks_total=chunks_total,
+        )
+
+    try:
+        document = documents.get()
+        path = os.path.join(settings.AI_DOCUMENTS_ROOT, document.path)
+        chunks = RAGManager().add_document(path, on_progress=on_progress)
+        documents.update(status='completed', chunks_indexed=chunks, chunks_total=chunks, finished_at=timezone.now())
+    except Exception as e:
+        logger.exception("Indexing document %s failed", document_id)
+        documents.update(status='failed', error=str(e), finished_at=timezone.now())
@@ -1,3 +1,50 @@
 from django.db import models
+from django.conf import settings
+from django.utils import timezone
 
-# Create your models here.
+
+class Document(models.Model):
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+
+    uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='documents')
+    name = models.CharField(max_length=255)
+    path = models.CharField(max_length=500) # Relative to AI_DOCUMENTS_ROOT
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='queued')
+    pages_total = models.PositiveIntegerField(default=0)
+    pages_processed = models.PositiveIntegerField(default=0)
+    chunks_total = models.PositiveIntegerField(default=0)
+    chunks_indexed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def progress(self):
+        """
+        Fraction of the job that is done. Extraction and embedding are weighted equally.
+        """
+        if self.status == 'completed':
+            return 1.0
+        pages = self.pages_processed / self.pages_total if self.pages_total else 0
+        chunks = self.chunks_indexed / self.chunks_total if self.chunks_total else 0
+        return (pages + chunks) / 2
+
+    def eta_seconds(self):
+        """
+        Remaining seconds estimated from the elapsed time and the progress so far
+        """
+        if self.status != 'processing' or not self.started_at:
+            return None
+        progress = self.progress()
+        if progress <= 0:
+            return None
+        elapsed = (timezone.now() - self.started_at).total_seconds()
+        return round(elapsed * (1 - progress) / progress, 1)
+
+    def __str__(self):
+        return f"{self.name} - {self.status}"
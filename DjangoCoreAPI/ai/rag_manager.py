@@ -1,4 +1,6 @@
 import os
+import threading
+from functools import wraps
 import fitz  # PyMuPDF
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_huggingface import HuggingFaceEmbeddings
@@ -11,6 +13,7 @@ from django.core.exceptions import ImproperlyConfigured
 
 def singleton(class_):
     instances = {}
+    @wraps(class_, updated=())  # __wrapped__ is the class itself
     def getinstance(*args, **kwargs):
         if class_ not in instances:
             instances[class_] = class_(*args, **kwargs)
@@ -27,26 +30,30 @@ class RAGManager:
         try:
             self.embedding_model = HuggingFaceEmbeddings(model_name=embedding_model_name)
             self.vectorstore = None
+            # FAISS is not safe for concurrent add/search, uploads are indexed from a worker thread
+            self.lock = threading.RLock()
             
             # Get directory paths from Django settings
-            self.pdf_dir = "static/pdf_files/"
-            self.txt_dir = "static/txt_files/"
+            self.pdf_dir = os.path.join(settings.AI_DOCUMENTS_ROOT, "pdf_files")
+            self.txt_dir = os.path.join(settings.AI_DOCUMENTS_ROOT, "txt_files")
             
             # Load and process documents
             pdf_texts = self.get_pdf_text_from_path(self.pdf_dir)
             txt_texts = self.get_txt_from_path(self.txt_dir)
             all_texts = {**pdf_texts, **txt_texts}
-            
-            if not all_texts:
-                raise ValueError("No documents found in specified directories")
+            # Files already in the index, so a queued upload is not embedded twice
+            self.indexed_paths = {os.path.abspath(os.path.join(self.pdf_dir, f)) for f in pdf_texts}
+            self.indexed_paths |= {os.path.abspath(os.path.join(self.txt_dir, f)) for f in txt_texts}
             
             # Process all texts into chunks
             all_chunks = []
             for text in all_texts.values():
                 chunks = self.divide_text(text)
                 all_chunks.extend(chunks)
-                
-            self.initialize_faiss(all_chunks)
+            
+            # Without documents the index is created by the first upload (see add_document)
+            if all_chunks:
+                self.initialize_faiss(all_chunks)
             
         except Exception as e:
             raise ImproperlyConfigured(f"Failed to initialize RAG Manager: {str(e)}")
@@ -64,8 +71,10 @@ class RAGManager:
         Extract text from all PDF files in directory
         """
         pdf_texts = {}
+        if not os.path.isdir(directory_path):  # Nothing uploaded yet
+            return pdf_texts
         try:
-            pdf_files = [f for f in os.listdir(directory_path) if f.endswith('.pdf')]
+            pdf_files = [f for f in os.listdir(directory_path) if f.lower().endswith('.pdf')]
             for pdf_file in pdf_files:
                 pdf_path = os.path.join(directory_path, pdf_file)
                 pdf_texts[pdf_file] = self.extract_text_from_pdf(pdf_path)
@@ -77,13 +86,27 @@ class RAGManager:
         """
         Extract text from a single PDF file
         """
+        return "".join(self.iter_pdf_pages(pdf_path))
+
+    def count_pdf_pages(self, pdf_path):
+        """
+        Return the number of pages of a single PDF file
+        """
         try:
-            doc = fitz.open(pdf_path)
-            text = ""
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text += page.get_text()
-            return text
+            with fitz.open(pdf_path) as doc:
+                return len(doc)
+        except Exception as e:
+            raise IOError(f"Error opening PDF {pdf_path}: {str(e)}")
+
+    def iter_pdf_pages(self, pdf_path):
+        """
+        Yield the text of a single PDF file page by page
+        """
+        try:
+            with fitz.open(pdf_path) as doc:
+                for page_num in range(len(doc)):
+                    page = doc.load_page(page_num)
+                    yield page.get_text()
         except Exception as e:
             raise IOError(f"Error extracting text from PDF {pdf_path}: {str(e)}")
     
@@ -102,8 +125,10 @@ class RAGManager:
         Extract text from all TXT files in directory
         """
         txt_texts = {}
+        if not os.path.isdir(directory):
+            return txt_texts
         try:
-            txt_files = [f for f in os.listdir(directory) if f.endswith('.txt')]
+            txt_files = [f for f in os.listdir(directory) if f.lower().endswith('.txt')]
             for txt_file in txt_files:
                 txt_path = os.path.join(directory, txt_file)
                 txt_texts[txt_file] = self.extract_text_from_txt(txt_path)
@@ -127,11 +152,55 @@ class RAGManager:
         """
         Search for similar text chunks in FAISS database
         """
-        if self.vectorstore is None:
-            raise ValueError("FAISS database not initialized")
         if not query:
             raise ValueError("Query cannot be empty")
-        return self.vectorstore.similarity_search(query, k=top_k)
+        with self.lock:
+            if self.vectorstore is None:  # Empty knowledge base
+                return []
+            return self.vectorstore.similarity_search(query, k=top_k)
+
+    def add_document(self, path, on_progress=None, batch_size=32):
+        """
+        Extract, chunk and embed a single PDF/TXT file into the running FAISS index.
+        on_progress is called as on_progress(pages_done, pages_total, chunks_done, chunks_total)
+        The index lives in this process only: other worker processes pick the file up from
+        AI_DOCUMENTS_ROOT when they start, so a new document is answered by every worker after a restart.
+        """
+        def report(pages_done, pages_total, chunks_done, chunks_total):
+            if on_progress is not None:
+                on_progress(pages_done, pages_total, chunks_done, chunks_total)
+
+        if path.lower().endswith('.pdf'):
+            pages_total = self.count_pdf_pages(path)
+            pages = []
+            for page_text in self.iter_pdf_pages(path):
+                pages.append(page_text)
+                report(len(pages), pages_total, 0, 0)
+            text = "".join(pages)
+        else:
+            pages_total = 1
+            text = self.extract_text_from_txt(path)
+            report(1, pages_total, 0, 0)
+
+        chunks = self.divide_text(text)
+        chunks_total = len(chunks)
+        if os.path.abspath(path) in self.indexed_paths:
+            report(pages_total, pages_total, chunks_total, chunks_total)
+            return chunks_total
+        report(pages_total, pages_total, 0, chunks_total)
+
+        # Embedding is the slow part, so it runs outside the lock and only the FAISS insert is serialized
+        for start in range(0, chunks_total, batch_size):
+            batch = chunks[start:start + batch_size]
+            embeddings = self.embedding_model.embed_documents(batch)
+            with self.lock:
+                if self.vectorstore is None:
+                    self.vectorstore = FAISS.from_embeddings(list(zip(batch, embeddings)), self.embedding_model)
+                else:
+                    self.vectorstore.add_embeddings(list(zip(batch, embeddings)))
+            report(pages_total, pages_total, start + len(batch), chunks_total)
+        self.indexed_paths.add(os.path.abspath(path))
+        return chunks_total
     
     def send_query_to_gemini(self, final_prompt):
         """
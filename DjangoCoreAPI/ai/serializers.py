@@ -0,0 +1,22 @@
+from rest_framework import serializers
+from ai.models import Document
+
+
+class DocumentUploadSerializer(serializers.Serializer):
+    file = serializers.FileField()
+
+    def validate_file(self, value):
+        if not value.name.lower().endswith(('.pdf', '.txt')):
+            raise serializers.ValidationError("Only PDF and TXT files are supported.")
+        return value
+
+
+class DocumentSerializer(serializers.ModelSerializer):
+    progress = serializers.FloatField(read_only=True)
+    eta_seconds = serializers.FloatField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = Document
+        fields = ['id', 'name', 'status', 'pages_total', 'pages_processed', 'chunks_total', 'chunks_indexed',
+                  'progress', 'eta_seconds', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
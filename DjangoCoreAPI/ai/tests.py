@@ -1,7 +1,19 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
+from rest_framework import status
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from .models import Document
+from .rag_manager import RAGManager
+from . import indexing
+from django.utils import timezone
+from datetime import timedelta
+from unittest import mock
+from langchain_community.embeddings import FakeEmbeddings
+import os
+import shutil
+import tempfile
 import time
 
 CustomUser = get_user_model()
@@ -36,4 +48,154 @@ class UserAPITestCase(TestCase):
         start = time.time()
         self.client.post(reverse("rag_search"),query_data)
         end = time.time() 
-        print(f"AI answer time: {(end-start):.5f} second")
\ No newline at end of file
+        print(f"AI answer time: {(end-start):.5f} second")
+
+
+class DocumentUploadTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(
+            email="testuser@example.com", 
+            password="Password123!",
+            first_name="Test",
+            last_name="User",
+            role="employee"
+        )
+        self.documents_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.documents_root)
+        
+    
+    def test_upload_document(self):
+        """
+        Test for uploading a document, it should be stored and queued for indexing
+        """
+        self.client.force_authenticate(user=self.user)
+        with override_settings(AI_DOCUMENTS_ROOT=self.documents_root):
+            upload = SimpleUploadedFile("manual.txt", b"Machine manual content")
+            response = self.client.post(reverse("upload_document"), {"file": upload}, format="multipart")
+        
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, 'Expected status code not returned')
+        self.assertEqual(response.data["status"], "queued", "Document is not queued.")
+        document = Document.objects.get(pk=response.data["id"])
+        self.assertTrue(os.path.exists(os.path.join(self.documents_root, document.path)), "Uploaded file is not stored.")
+        
+        response = self.client.get(reverse("document_status", kwargs={"pk": document.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        self.assertEqual(response.data["progress"], 0, "Queued document should not have progress.")
+    
+    
+    def test_upload_document_upper_case_extension(self):
+        """
+        Test for storing uploads with an upper-case extension next to the documents of their type
+        """
+        self.client.force_authenticate(user=self.user)
+        with override_settings(AI_DOCUMENTS_ROOT=self.documents_root):
+            for name, subdir in (("MANUAL.PDF", "pdf_files"), ("Notes.TXT", "txt_files")):
+                upload = SimpleUploadedFile(name, b"Machine manual content")
+                response = self.client.post(reverse("upload_document"), {"file": upload}, format="multipart")
+                self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, 'Expected status code not returned')
+                document = Document.objects.get(pk=response.data["id"])
+                self.assertEqual(os.path.dirname(document.path), subdir, "Upload is stored with the wrong type.")
+    
+    
+    def test_upload_document_unsuccessfully(self):
+        """
+        Test for rejecting unsupported files and anonymous uploads
+        """
+        with override_settings(AI_DOCUMENTS_ROOT=self.documents_root):
+            upload = SimpleUploadedFile("manual.txt", b"Machine manual content")
+            response = self.client.post(reverse("upload_document"), {"file": upload}, format="multipart")
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED, 'Expected status code not returned')
+            
+            self.client.force_authenticate(user=self.user)
+            upload = SimpleUploadedFile("manual.docx", b"Machine manual content")
+            response = self.client.post(reverse("upload_document"), {"file": upload}, format="multipart")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, 'Expected status code not returned')
+
+
+class DocumentIndexingTestCase(TestCase):
+    """
+    Indexing jobs run synchronously here, with a small fake embedding model instead of the real one
+    """
+    def setUp(self):
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(email="indexer@example.com", password="Password123!")
+        self.client.force_authenticate(user=self.user)
+        self.documents_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.documents_root)
+        
+        with override_settings(AI_DOCUMENTS_ROOT=self.documents_root), \
+                mock.patch("ai.rag_manager.HuggingFaceEmbeddings", lambda model_name: FakeEmbeddings(size=16)):
+            self.manager = RAGManager.__wrapped__()  # A fresh manager over the empty documents root
+        for patcher in (
+            mock.patch("ai.rag_manager.RAGManager", lambda: self.manager),
+            # The job runs in the test's transaction instead of on the worker thread
+            mock.patch.object(indexing.executor, "submit", lambda job, function, *args: function(*args)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def upload(self, name, content):
+        with override_settings(AI_DOCUMENTS_ROOT=self.documents_root), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("upload_document"), {"file": SimpleUploadedFile(name, content)}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, 'Expected status code not returned')
+        return Document.objects.get(pk=response.data["id"])
+    
+    
+    def test_index_document(self):
+        """
+        Test for indexing an upload into an empty knowledge base and searching it
+        """
+        self.assertEqual(self.manager.search_in_faiss("pump"), [], "Empty knowledge base should find nothing.")
+        
+        document = self.upload("Manual.TXT", b"Hydraulic pump maintenance manual. " * 100)
+        self.assertEqual(document.status, "completed", document.error)
+        self.assertEqual((document.pages_processed, document.pages_total), (1, 1), "Page progress does not match.")
+        self.assertGreater(document.chunks_indexed, 1, "Chunks are not indexed.")
+        self.assertEqual(document.chunks_indexed, document.chunks_total, "Chunk progress does not match.")
+        self.assertIsNotNone(document.finished_at, "Finish time is not set.")
+        self.assertEqual(document.progress(), 1.0, "Completed document should be done.")
+        
+        results = self.manager.search_in_faiss("pump", top_k=2)
+        self.assertEqual(len(results), 2, "Indexed chunks are not searchable.")
+        self.assertIn("Hydraulic pump", results[0].page_content, "Indexed chunk does not match.")
+        
+        response = self.client.get(reverse("document_status", kwargs={"pk": document.id}))
+        self.assertEqual(response.data["progress"], 1.0, "Completed document should report full progress.")
+        self.assertIsNone(response.data["eta_seconds"], "Completed document should not have an ETA.")
+    
+    
+    def test_index_document_unsuccessfully(self):
+        """
+        Test for marking a document failed when it cannot be indexed
+        """
+        with self.assertLogs("ai.indexing", level="ERROR"):
+            document = self.upload("broken.pdf", b"not a pdf")
+        self.assertEqual(document.status, "failed", "Broken document is not marked failed.")
+        self.assertIn("broken.pdf", document.error, "Error is not recorded.")
+        self.assertIsNone(self.manager.vectorstore, "Broken document must not be indexed.")
+    
+    
+    def test_progress_and_eta(self):
+        """
+        Test for the progress and remaining time of a running job
+        """
+        progress = []
+        add_document = self.manager.add_document
+        def recording(path, on_progress=None):
+            def on_progress_recorded(*state):
+                progress.append(state)
+                on_progress(*state)
+            return add_document(path, on_progress=on_progress_recorded, batch_size=1)
+        with mock.patch.object(self.manager, "add_document", recording):
+            document = self.upload("notes.txt", b"Seal replacement steps. " * 100)
+        chunks = document.chunks_total
+        self.assertEqual(progress[0], (1, 1, 0, 0), "Extraction progress is not reported.")
+        self.assertEqual(progress[-1], (1, 1, chunks, chunks), "Embedding progress is not reported.")
+        self.assertEqual(len(progress), chunks + 2, "Every embedded batch should report progress.")
+        
+        # Half way (pages done, no chunks yet) after 10 seconds leaves 10 more
+        document.status, document.started_at = "processing", timezone.now() - timedelta(seconds=10)
+        document.chunks_indexed = 0
+        self.assertEqual(document.progress(), 0.5, "Progress does not weigh pages and chunks equally.")
+        self.assertAlmostEqual(document.eta_seconds(), 10.0, delta=0.5, msg="ETA does not match.")
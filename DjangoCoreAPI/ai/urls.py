@@ -1,6 +1,8 @@
 from django.urls import path
-from .views import RAGSearchView
+from .views import RAGSearchView, DocumentUploadView, DocumentStatusView
 
 urlpatterns = [
     path("rag-search/", RAGSearchView.as_view(), name="rag_search"),
+    path("upload-document/", DocumentUploadView.as_view(), name="upload_document"),
+    path("document/<int:pk>", DocumentStatusView.as_view(), name="document_status"),
 ]
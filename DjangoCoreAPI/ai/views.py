@@ -1,9 +1,17 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.generics import get_object_or_404
 from django.conf import settings
+from django.db import transaction
+from drf_yasg.utils import swagger_auto_schema
 import os
 from .rag_manager import RAGManager
+from .models import Document
+from .serializers import DocumentUploadSerializer, DocumentSerializer
+from .indexing import save_upload, queue_document
 
 class RAGSearchView(APIView):
     def __init__(self, *args, **kwargs):
@@ -35,4 +43,39 @@ class RAGSearchView(APIView):
             return Response(
                 {'error': str(e)}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+class DocumentUploadView(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    @swagger_auto_schema(
+        request_body=DocumentUploadSerializer,
+        responses={202: DocumentSerializer(), 400: 'Invalid file'}
+    )
+    def post(self, request):
+        serializer = DocumentUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        uploaded_file = serializer.validated_data['file']
+        with transaction.atomic():
+            document = Document.objects.create(
+                uploaded_by=request.user,
+                name=uploaded_file.name,
+                path=save_upload(uploaded_file),
+            )
+            queue_document(document) # Runs in the background after commit
+        return Response(DocumentSerializer(document).data, status=status.HTTP_202_ACCEPTED)
+
+
+class DocumentStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        responses={200: DocumentSerializer()}
+    )
+    def get(self, request, pk):
+        document = get_object_or_404(Document, pk=pk)
+        serializer = DocumentSerializer(document)
+        return Response(serializer.data, status=status.HTTP_200_OK)
@@ -1,6 +1,8 @@
 from django.contrib import admin
-from questions.models import Question, Comment,Tag
+from questions.models import Question, Comment,Tag, TagStat, ImportCheckpoint
 
 admin.site.register(Question)
 admin.site.register(Comment)
-admin.site.register(Tag)
\ No newline at end of file
+admin.site.register(Tag)
+admin.site.register(TagStat)
+admin.site.register(ImportCheckpoint)
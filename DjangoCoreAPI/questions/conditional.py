@@ -0,0 +1,58 @@
+import hashlib
+from django.db import connection, connections, router
+from questions.models import Question, Comment, Reaction, Tag
+
+qn = connection.ops.quote_name
+
+# Everything QuestionSerializer shows of a question, reduced to its edit times, counters, relations
+# and the flags of the requesting user (NULL for anonymous users, whose flags are always false)
+QUESTION_STATE_SQL = f"""
+    SELECT q.updated_at, q.like_count, q.dislike_count, q.favorite_count,
+        c.last_update, c.total, c.likes, c.dislikes,
+        (SELECT array_agg(t.name ORDER BY t.name)
+            FROM {qn(Question.tags.through._meta.db_table)} qt JOIN {qn(Tag._meta.db_table)} t ON t.id = qt.tag_id
+            WHERE qt.question_id = q.id),
+        EXISTS (SELECT 1 FROM {qn(Question.favorited_by.through._meta.db_table)} f
+            WHERE f.question_id = q.id AND f.customuser_id = %(user)s),
+        (SELECT array_agg(r.kind) FROM {qn(Reaction._meta.db_table)} r
+            WHERE r.question_id = q.id AND r.user_id = %(user)s)
+    FROM {qn(Question._meta.db_table)} q, LATERAL (
+        SELECT MAX(updated_at) AS last_update, COUNT(*) AS total, SUM(like_count) AS likes, SUM(dislike_count) AS dislikes
+        FROM {qn(Comment._meta.db_table)} WHERE question_id = q.id
+    ) c
+    WHERE q.id = %(pk)s
+"""
+
+
+def make_etag(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def question_state(pk, user=None):
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    # Same database as the rest of the request's reads, a replica for safe requests
+    with connections[router.db_for_read(Question)].cursor() as cursor:
+        cursor.execute(QUESTION_STATE_SQL, {'pk': pk, 'user': user_id})
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return make_etag('question', pk, user_id, *row)
+
+
+def comment_state(pk, user=None):
+    row = Comment.objects.filter(pk=pk).values_list('updated_at', 'like_count', 'dislike_count').first()
+    if row is None:
+        return None
+    return make_etag('comment', pk, *row)
+
+
+# Helpers in the shape django.views.decorators.http.etag expects.
+# No Last-Modified is sent: reactions, favorites and their removal do not move updated_at and
+# leave no timestamp behind, so only the ETag can tell that the counters or the user's flags changed.
+# The question ETag differs per user, as the response carries the user's own flags.
+def question_etag(request, pk):
+    return question_state(pk, request.user)
+
+
+def comment_etag(request, pk):
+    return comment_state(pk, request.user)
@@ -0,0 +1,94 @@
+import json
+import zlib
+from django.conf import settings
+from django.contrib.postgres.expressions import ArraySubquery
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, OuterRef
+from questions.models import Question, Comment, Reaction, Tag
+
+# Lines are collected into blocks of about this many bytes before they are written or compressed
+BLOCK_SIZE = 64 * 1024
+
+
+def chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def iterate(rows):
+    """
+    Rows of a values() queryset in primary key order, `EXPORT_CHUNK_SIZE` at a time
+    """
+    rows = rows.order_by('pk')
+    if not connections[rows.db].settings_dict['DISABLE_SERVER_SIDE_CURSORS']:
+        yield from rows.iterator(chunk_size=chunk_size())
+        return
+    # Without server-side cursors (transaction pooling) iterator() would fetch every row at once, read keyset batches
+    rows = rows.annotate(export_pk=F('pk'))
+    last = None
+    while True:
+        batch = list((rows if last is None else rows.filter(pk__gt=last))[:chunk_size()])
+        for row in batch:
+            last = row.pop('export_pk')
+            yield row
+        if len(batch) < chunk_size():
+            return
+
+
+def export_records(updated_since=None):
+    """
+    Every question, comment, reaction and favorite as plain dicts with a "type" key, read through server-side
+    cursors (or keyset batches) `EXPORT_CHUNK_SIZE` rows at a time, so memory does not depend on the size of the tables.
+    With `updated_since`, only questions and comments changed since then (edits, counters, tags and favorites
+    all move changed_at), the favorites of those questions and the reactions given since then.
+    """
+    questions = Question.objects.annotate(
+        tag_names=ArraySubquery(Tag.objects.filter(questions=OuterRef('pk')).order_by('name').values('name')),
+    )
+    comments = Comment.objects.all()
+    reactions = Reaction.objects.all()
+    favorites = Question.favorited_by.through.objects.all()
+    if updated_since is not None:
+        questions = questions.filter(changed_at__gte=updated_since)
+        comments = comments.filter(changed_at__gte=updated_since)
+        reactions = reactions.filter(created_at__gte=updated_since)
+        favorites = favorites.filter(question__changed_at__gte=updated_since)
+
+    streams = (
+        ('question', questions.values(
+            'id', 'user_id', 'title', 'body', 'tag_names', 'like_count', 'dislike_count', 'favorite_count',
+            'created_at', 'updated_at',
+        )),
+        ('comment', comments.values(
+            'id', 'user_id', 'question_id', 'body', 'like_count', 'dislike_count', 'created_at', 'updated_at',
+        )),
+        ('reaction', reactions.values('id', 'user_id', 'question_id', 'comment_id', 'kind', 'created_at')),
+        ('favorite', favorites.values('question_id', user_id=F('customuser_id'))),
+    )
+    for kind, rows in streams:
+        for row in iterate(rows):
+            yield {'type': kind, **row}
+
+
+def export_ndjson(updated_since=None, compress=False):
+    """
+    The export as NDJSON, yielded as byte blocks, optionally as one gzip stream
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None  # 31: gzip header and trailer
+    block = []
+    size = 0
+    for record in export_records(updated_since):
+        line = (json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n').encode()
+        block.append(line)
+        size += len(line)
+        if size >= BLOCK_SIZE:
+            data = b''.join(block)
+            block, size = [], 0
+            data = compressor.compress(data) if compressor else data
+            if data:
+                yield data
+    data = b''.join(block)
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
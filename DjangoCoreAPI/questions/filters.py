@@ -0,0 +1,115 @@
+import re
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Case, Count, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast
+from rest_framework.filters import BaseFilterBackend
+
+SEARCH_CONFIG = 'english' # Must match the text search configuration of the search_vector trigger
+
+
+def build_search_query(text):
+    """
+    Web search syntax ("exact phrase", or, -exclude) plus prefix terms written as `mach*`
+    """
+    terms = text.split()
+    words = ' '.join(term for term in terms if not term.endswith('*'))
+    query = SearchQuery(words, search_type='websearch', config=SEARCH_CONFIG) if words else None
+    for term in terms:
+        prefix = re.sub(r'\W', '', term[:-1]) if term.endswith('*') else ''
+        if prefix:
+            prefix_query = SearchQuery(f'{prefix}:*', search_type='raw', config=SEARCH_CONFIG)
+            query = prefix_query if query is None else query & prefix_query
+    return query
+
+
+def build_fuzzy_text(text):
+    """
+    The plain words of a search, without operators, quotes, prefixes or excluded terms
+    """
+    words = [re.sub(r'\W', '', term) for term in text.split() if not term.startswith('-')]
+    return ' '.join(word for word in words if word.lower() != 'or' and word)
+
+
+class TagFilterBackend(BaseFilterBackend):
+    """
+    ?tags=a,b,c with ?tag_mode=all (every tag, the default) or any (at least one tag).
+    Matches come from one grouped subquery on the tag through table, so questions are never duplicated
+    by the join and the (tag_id, question_id) index answers it without touching the questions.
+    """
+    tags_param = 'tags'
+    mode_param = 'tag_mode'
+    max_tags = 20
+
+    def filter_queryset(self, request, queryset, view):
+        names = request.query_params.get(self.tags_param, '').split(',')
+        names = list(dict.fromkeys(name.strip() for name in names if name.strip()))[:self.max_tags]
+        if not names:
+            return queryset
+        matches = queryset.model.tags.through.objects.filter(tag__name__in=names).values('question_id')
+        if request.query_params.get(self.mode_param) != 'any':
+            matches = matches.annotate(matched=Count('tag_id')).filter(matched=len(names)).values('question_id')
+        return queryset.filter(pk__in=matches)
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    Match ?search= against the stored, GIN indexed Question.search_vector and annotate a ts_rank `rank`
+    (title weighs more than body, body more than the author's name).
+    When full text search finds fewer than SEARCH_FUZZY_MIN_HITS questions, add trigram matches of titles
+    and tag names, so misspelled words still find something.
+    Fuzzy results are ranked by their title word similarity, still as `rank`, after the full text hits.
+    Sets `search_ranked` on the view when it annotated `rank`, searches without terms are not filtered.
+    """
+    search_param = 'search'
+
+    def get_search_text(self, request):
+        return request.query_params.get(self.search_param, '').replace('\x00', '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        text = self.get_search_text(request)
+        query = build_search_query(text)
+        if query is None:
+            return queryset
+        matches = queryset.filter(search_vector=query)
+        view.search_ranked = True
+
+        # Cheap probe on the GIN index, bounded by the minimum, before paying for a trigram scan
+        min_hits = getattr(settings, 'SEARCH_FUZZY_MIN_HITS', 1)
+        fuzzy_text = build_fuzzy_text(text)
+        if min_hits and fuzzy_text:
+            hits = len(matches.order_by().prefetch_related(None).values_list('pk', flat=True)[:min_hits])
+            if hits < min_hits:
+                return self.fuzzy_queryset(queryset, fuzzy_text, query)
+
+        return matches.annotate(rank=self.search_rank(query))
+
+    @staticmethod
+    def search_rank(query):
+        # ts_rank is a real, as double precision it survives the keyset cursor round trip exactly
+        return Cast(SearchRank(F('search_vector'), query), FloatField())
+
+    def fuzzy_queryset(self, queryset, text, query):
+        """
+        The full text matches of `query` plus the questions whose title contains a word similar to `text`,
+        or with a tag name similar to it. Full text matches rank first: 1 + ts_rank, above any similarity.
+        Both % operators use the gin_trgm_ops indexes and read their threshold from the configuration. It is set
+        for the current transaction only, so the caller must evaluate the queryset in the same transaction
+        (behind a transaction pooling proxy, statements outside of it may run on another server session).
+        """
+        threshold = str(getattr(settings, 'SEARCH_FUZZY_THRESHOLD', 0.4))
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true), "
+                "set_config('pg_trgm.similarity_threshold', %s, true)",
+                [threshold, threshold],
+            )
+        tagged = queryset.model.tags.through.objects.filter(tag__name__trigram_similar=text).values('question_id')
+        rank = Case(
+            When(search_vector=query, then=Value(1.0) + self.search_rank(query)),
+            default=Cast(TrigramWordSimilarity(text, 'title'), FloatField()),
+            output_field=FloatField(),
+        )
+        matches = Q(search_vector=query) | Q(title__trigram_word_similar=text) | Q(pk__in=tagged)
+        return queryset.filter(matches).annotate(rank=rank)
@@ -0,0 +1,228 @@
+import csv
+import json
+from collections import Counter
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from DjangoCoreAPI.response_cache import bump
+from questions.models import Question, Comment, ImportCheckpoint, LegacyComment, LegacyQuestion, Tag
+from questions.suggestions import suggestion_index
+from questions.tag_stats import rebuild_tag_stats
+from questions.tags import write_tags
+from questions.user_counters import ANSWERS_GIVEN, QUESTIONS_ASKED, adjust_user_counters
+
+QUESTION = 'question'
+COMMENT = 'comment'
+CSV_TAG_SEPARATOR = '|'
+COMMENT_ENGAGEMENT = 2  # Weight of a comment in questions_question_scores (migration 0018)
+
+
+def batch_size():
+    return getattr(settings, 'IMPORT_BATCH_SIZE', 1000)
+
+
+def read_records(path, format=None):
+    """
+    Records of a JSONL file (one object per line) or a CSV file with a header, read one at a time.
+    Every record has a "type": question records have id, user_email, title, body, tag_names and created_at,
+    comment records have id, question_id (the legacy id of their question), user_email, body and created_at.
+    CSV tag_names are separated by "|". A line that is not valid JSON is read as None.
+    """
+    format = format or ('csv' if path.endswith('.csv') else 'jsonl')
+    with open(path, newline='', encoding='utf-8') as file:
+        if format == 'csv':
+            for row in csv.DictReader(file):
+                tags = row.get('tag_names') or ''
+                row['tag_names'] = [name for name in tags.split(CSV_TAG_SEPARATOR) if name]
+                yield row
+        else:
+            for line in file:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        yield None  # Counted as skipped, the position still moves past it
+
+
+def is_text(value, field):
+    return isinstance(value, str) and bool(value.strip()) and (field.max_length is None or len(value) <= field.max_length)
+
+
+def is_legacy_id(value):
+    return isinstance(value, (str, int)) and not isinstance(value, bool) and 0 < len(str(value)) <= 64
+
+
+def clean_record(record):
+    """
+    The record with its created_at parsed, or None when it is malformed and has to be skipped
+    """
+    if not isinstance(record, dict) or record.get('type') not in (QUESTION, COMMENT):
+        return None
+    email_field = get_user_model()._meta.get_field('email')
+    if not is_legacy_id(record.get('id')) or not is_text(record.get('user_email'), email_field):
+        return None
+    if record['type'] == QUESTION:
+        tag_field = Tag._meta.get_field('name')
+        tag_names = record.get('tag_names') or []
+        if not is_text(record.get('title'), Question._meta.get_field('title')) or not isinstance(tag_names, list):
+            return None
+        if not all(is_text(name, tag_field) for name in tag_names):
+            return None
+    elif not is_legacy_id(record.get('question_id')):
+        return None
+    if not isinstance(record.get('body'), str):
+        return None
+    try:
+        created_at = parse_timestamp(record.get('created_at'))
+    except (TypeError, ValueError):
+        return None
+    if record.get('created_at') and created_at is None:
+        return None  # Not a date at all
+    return {**record, 'created_at': created_at}
+
+
+def new_records(model, source, records):
+    """
+    Records whose legacy id was not imported from `source` yet, each legacy id once
+    """
+    ids = {str(record['id']) for record in records}
+    seen = set(model.objects.filter(source=source, legacy_id__in=ids).values_list('legacy_id', flat=True))
+    fresh = []
+    for record in records:
+        if str(record['id']) not in seen:
+            seen.add(str(record['id']))
+            fresh.append(record)
+    return fresh
+
+
+def resolve_users(emails):
+    """
+    Ids of the users with these emails, authors missing from this system are created in bulk as inactive
+    users without a usable password
+    """
+    User = get_user_model()
+    ids = dict(User.objects.filter(email__in=emails).values_list('email', 'id'))
+    missing = set(emails) - ids.keys()
+    if missing:
+        password = make_password(None)
+        User.objects.bulk_create(
+            [User(email=email, password=password, is_active=False) for email in missing], ignore_conflicts=True,
+        )
+        ids.update(User.objects.filter(email__in=missing).values_list('email', 'id'))
+    return ids
+
+
+def restore_timestamps(model, rows):
+    """
+    auto_now_add/auto_now overwrite the timestamps on insert, the legacy ones are written back in one UPDATE.
+    `rows` are (pk, created_at) pairs.
+    """
+    rows = [(pk, created_at) for pk, created_at in rows if created_at is not None]
+    if not rows:
+        return
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            UPDATE {table} t SET created_at = v.created_at, updated_at = v.created_at
+            FROM unnest(%s::bigint[], %s::timestamptz[]) v(id, created_at)
+            WHERE t.id = v.id
+        """, [[pk for pk, _ in rows], [created_at for _, created_at in rows]])
+
+
+def discount_trending(comment_counts):
+    """
+    Imported comments are history, not recent engagement: take back what the comment count trigger added to
+    the trending_score of their questions. `comment_counts` maps question ids to imported comments.
+    """
+    if not comment_counts:
+        return
+    table = connection.ops.quote_name(Question._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            UPDATE {table} t SET trending_score = t.trending_score - %s * v.total
+            FROM unnest(%s::bigint[], %s::int[]) v(id, total)
+            WHERE t.id = v.id
+        """, [COMMENT_ENGAGEMENT, list(comment_counts), list(comment_counts.values())])
+
+
+def parse_timestamp(value):
+    moment = parse_datetime(value) if value else None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def import_batch(source, records, position):
+    """
+    Load one batch in one transaction with a constant number of statements and move the source's checkpoint
+    to `position`. Malformed records and records already imported from the source are skipped, so a restarted
+    import continues past them. Returns the number of imported and skipped records.
+    """
+    read = len(records)
+    records = [record for record in map(clean_record, records) if record is not None]
+
+    with transaction.atomic():
+        questions = new_records(LegacyQuestion, source, [record for record in records if record['type'] == QUESTION])
+        comments = new_records(LegacyComment, source, [record for record in records if record['type'] == COMMENT])
+        users = resolve_users({record['user_email'] for record in questions + comments})
+
+        created = Question.objects.bulk_create([
+            Question(user_id=users[record['user_email']], title=record['title'], body=record['body'])
+            for record in questions
+        ])
+        restore_timestamps(Question, [
+            (question.pk, record['created_at']) for question, record in zip(created, questions)
+        ])
+        LegacyQuestion.objects.bulk_create([
+            LegacyQuestion(source=source, legacy_id=str(record['id']), question=question)
+            for question, record in zip(created, questions)
+        ])
+        through = Question.tags.through
+
+        def attach_tags(tag_ids):
+            through.objects.bulk_create([
+                through(question_id=question.pk, tag_id=tag_ids[name])
+                for question, record in zip(created, questions) for name in set(record.get('tag_names') or [])
+            ], ignore_conflicts=True)
+
+        write_tags({name for record in questions for name in record.get('tag_names') or []}, attach_tags)
+
+        # Questions of earlier batches and runs included
+        parents = dict(
+            LegacyQuestion.objects.filter(source=source, legacy_id__in={str(record['question_id']) for record in comments})
+            .values_list('legacy_id', 'question_id')
+        )
+        comments = [record for record in comments if str(record['question_id']) in parents]
+        created = Comment.objects.bulk_create([
+            Comment(user_id=users[record['user_email']], question_id=parents[str(record['question_id'])], body=record['body'])
+            for record in comments
+        ])
+        restore_timestamps(Comment, [
+            (comment.pk, record['created_at']) for comment, record in zip(created, comments)
+        ])
+        LegacyComment.objects.bulk_create([
+            LegacyComment(source=source, legacy_id=str(record['id']), comment=comment)
+            for comment, record in zip(created, comments)
+        ])
+        discount_trending(Counter(comment.question_id for comment in created))
+
+        # bulk_create sends no post_save, the authors' counters are moved per batch
+        adjust_user_counters(QUESTIONS_ASKED, Counter(users[record['user_email']] for record in questions))
+        adjust_user_counters(ANSWERS_GIVEN, Counter(users[record['user_email']] for record in comments))
+
+        ImportCheckpoint.objects.update_or_create(source=source, defaults={'position': position})
+    imported = len(questions) + len(comments)
+    return imported, read - imported
+
+
+def finish_import():
+    """
+    bulk_create sends no signals: rebuild what the signals keep up to date on single writes
+    """
+    with transaction.atomic():
+        rebuild_tag_stats()
+    suggestion_index.reset()
+    bump('questions', 'tags')
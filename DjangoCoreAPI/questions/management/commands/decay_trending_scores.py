@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from DjangoCoreAPI.response_cache import bump
+from questions.models import Question
+
+
+class Command(BaseCommand):
+    help = (
+        "Decay the trending scores of questions by the time passed since the last run (TRENDING_HALF_LIFE_HOURS "
+        "half-life). Meant to run periodically, hourly by default."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=1, help="Hours since the previous run")
+        parser.add_argument('--floor', type=float, default=0.01, help="Scores closer to zero are cleared")
+
+    def handle(self, *args, **options):
+        half_life = getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 6)
+        factor = 0.5 ** (options['hours'] / half_life)
+        table = connection.ops.quote_name(Question._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Only trending_score is written, the changed_at trigger ignores it
+            cursor.execute(f"""
+                UPDATE {table}
+                SET trending_score = CASE WHEN abs(trending_score * %s) < %s THEN 0 ELSE trending_score * %s END
+                WHERE trending_score <> 0
+            """, [factor, options['floor'], factor])
+            count = cursor.rowcount
+            if count:
+                bump('questions')
+        self.stdout.write(f"{count} trending score(s) decayed by {factor:.4f}")
@@ -0,0 +1,38 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from questions.export import export_ndjson
+
+
+class Command(BaseCommand):
+    help = "Write every question, comment, reaction and favorite as NDJSON, streamed with constant memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help="File to write, standard output by default")
+        parser.add_argument('--gzip', action='store_true', help="Compress the output with gzip")
+        parser.add_argument('--updated-since', help="Only rows changed since this ISO 8601 date and time")
+
+    def handle(self, *args, **options):
+        updated_since = None
+        if options['updated_since']:
+            try:
+                updated_since = parse_datetime(options['updated_since'])
+            except ValueError:  # Well formed but impossible, e.g. month 13
+                updated_since = None
+            if updated_since is None:
+                raise CommandError("--updated-since must be an ISO 8601 date and time")
+            if timezone.is_naive(updated_since):
+                updated_since = timezone.make_aware(updated_since)
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        written = 0
+        try:
+            for block in export_ndjson(updated_since, options['gzip']):
+                output.write(block)
+                written += len(block)
+        finally:
+            if options['output']:
+                output.close()
+        if options['output']:
+            self.stdout.write(f"{written} byte(s) written to {options['output']}")
@@ -0,0 +1,46 @@
+import os
+import time
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from questions.importer import batch_size, finish_import, import_batch, read_records
+from questions.models import ImportCheckpoint
+
+
+class Command(BaseCommand):
+    help = (
+        "Load legacy questions and comments from a JSONL or CSV file in batches. Progress is checkpointed with "
+        "every batch, running the command again resumes after the last loaded batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="JSONL or CSV file, see questions.importer.read_records for the fields")
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help="Taken from the file extension by default")
+        parser.add_argument('--source', help="Name of the checkpoint, the absolute path of the file by default")
+        parser.add_argument('--batch-size', type=int, default=batch_size())
+        parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint and read from the start, records loaded before are skipped")
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['path']):
+            raise CommandError(f"{options['path']} does not exist")
+        source = options['source'] or os.path.abspath(options['path'])
+        checkpoint = ImportCheckpoint.objects.filter(source=source).first()
+        start = checkpoint.position if checkpoint and not options['restart'] else 0
+        if start:
+            self.stdout.write(f"Resuming {source} after {start} record(s)")
+
+        records = islice(read_records(options['path'], options['format']), start, None)
+        position, imported, skipped = start, 0, 0
+        started = time.monotonic()
+        while True:
+            batch = list(islice(records, options['batch_size']))
+            if not batch:
+                break
+            position += len(batch)
+            loaded, ignored = import_batch(source, batch, position)
+            imported += loaded
+            skipped += ignored
+            rate = (position - start) / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(f"{position} record(s) read, {imported} imported, {skipped} skipped, {rate:.0f} records/s")
+
+        finish_import()
+        self.stdout.write(f"Import of {source} finished: {imported} imported, {skipped} skipped")
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from questions.tag_stats import rebuild_tag_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the tag statistics (question counts, last activity, related tags) from the question tags"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_tag_stats()
+        self.stdout.write(f"Tag statistics rebuilt for {count} tag(s)")
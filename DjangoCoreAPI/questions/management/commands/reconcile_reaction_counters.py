@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from DjangoCoreAPI.response_cache import bump
+from questions.models import Question, Comment, Reaction, count_subquery
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored like/dislike counters of questions and comments, and the favorite and comment counters of questions, where they drifted"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report the drifted rows")
+
+    def handle(self, *args, **options):
+        for model, field, question_field in ((Question, 'question', 'pk'), (Comment, 'comment', 'question_id')):
+            actual_likes = count_subquery(Reaction.objects.filter(kind=Reaction.LIKE), field)
+            actual_dislikes = count_subquery(Reaction.objects.filter(kind=Reaction.DISLIKE), field)
+            
+            with transaction.atomic():
+                drifted = (
+                    model.objects.select_for_update()
+                    .annotate(actual_likes=actual_likes, actual_dislikes=actual_dislikes)
+                    .filter(~Q(like_count=F('actual_likes')) | ~Q(dislike_count=F('actual_dislikes')))
+                )
+                rows = list(drifted.values_list('pk', question_field))
+                ids = [pk for pk, question_id in rows]
+                if ids and not options['dry_run']:
+                    model.objects.filter(pk__in=ids).update(like_count=actual_likes, dislike_count=actual_dislikes)
+                    bump('questions', *{f'question:{question_id}' for pk, question_id in rows})
+            
+            self.stdout.write(f"{model.__name__}: {len(ids)} drifted row(s)" + (" (dry run)" if options['dry_run'] else " repaired"))
+
+        actual_favorites = count_subquery(Question.favorited_by.through.objects.all(), 'question')
+        actual_comments = count_subquery(Comment.objects.all(), 'question')
+        with transaction.atomic():
+            drifted = (
+                Question.objects.select_for_update()
+                .annotate(actual_favorites=actual_favorites, actual_comments=actual_comments)
+                .filter(~Q(favorite_count=F('actual_favorites')) | ~Q(comment_count=F('actual_comments')))
+            )
+            ids = list(drifted.values_list('pk', flat=True))
+            if ids and not options['dry_run']:
+                Question.objects.filter(pk__in=ids).update(favorite_count=actual_favorites, comment_count=actual_comments)
+                bump('questions', *(f'question:{pk}' for pk in ids))
+        
+        self.stdout.write(f"Question favorites and comments: {len(ids)} drifted row(s)" + (" (dry run)" if options['dry_run'] else " repaired"))
@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from DjangoCoreAPI.response_cache import bump
+from questions.models import Question, Comment, count_subquery
+
+
+class Command(BaseCommand):
+    help = "Recompute questions_asked and answers_given of the users where they drifted from their questions and comments"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report the drifted rows")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        actual_questions = count_subquery(Question.objects.all(), 'user')
+        actual_answers = count_subquery(Comment.objects.all(), 'user')
+
+        with transaction.atomic():
+            drifted = (
+                User.objects.select_for_update()
+                .annotate(actual_questions=actual_questions, actual_answers=actual_answers)
+                .filter(~Q(questions_asked=F('actual_questions')) | ~Q(answers_given=F('actual_answers')))
+            )
+            ids = list(drifted.values_list('pk', flat=True))
+            if ids and not options['dry_run']:
+                User.objects.filter(pk__in=ids).update(questions_asked=actual_questions, answers_given=actual_answers)
+                bump(*(f'user:{pk}' for pk in ids))
+
+        self.stdout.write(f"Users: {len(ids)} drifted row(s)" + (" (dry run)" if options['dry_run'] else " repaired"))
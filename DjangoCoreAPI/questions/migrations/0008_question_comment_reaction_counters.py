@@ -0,0 +1,60 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:38
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_users(through, field):
+    counts = (
+        through.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('*'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def populate_counters(apps, schema_editor):
+    for model_name, field in (('Question', 'question'), ('Comment', 'comment')):
+        model = apps.get_model('questions', model_name)
+        model.objects.update(
+            like_count=count_users(model.liked_users.through, field),
+            dislike_count=count_users(model.disliked_users.through, field),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0007_question_favorited_by'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='dislike_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='like_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='dislike_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='like_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-like_count', '-id'], name='question_like_count_idx'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
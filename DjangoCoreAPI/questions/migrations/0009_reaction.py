@@ -0,0 +1,107 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# (model, target column, reaction kind, old ManyToMany field)
+REACTION_SOURCES = (
+    ('Question', 'question_id', 'like', 'liked_users'),
+    ('Question', 'question_id', 'dislike', 'disliked_users'),
+    ('Comment', 'comment_id', 'like', 'liked_users'),
+    ('Comment', 'comment_id', 'dislike', 'disliked_users'),
+)
+
+
+def copy_reactions(apps, schema_editor):
+    """
+    Move the four ManyToMany tables into the reaction table with set-based INSERT ... SELECT.
+    A user that was in both the liked and disliked table keeps the like.
+    """
+    reaction_table = apps.get_model('questions', 'Reaction')._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        for model_name, target_column, kind, field_name in REACTION_SOURCES:
+            model = apps.get_model('questions', model_name)
+            through = model._meta.get_field(field_name).remote_field.through._meta
+            source_column = through.get_field(model._meta.model_name).column
+            user_column = through.get_field('customuser').column
+            cursor.execute(f"""
+                INSERT INTO {reaction_table} (user_id, {target_column}, kind, created_at)
+                SELECT {user_column}, {source_column}, %s, NOW() FROM {through.db_table}
+                ON CONFLICT DO NOTHING
+            """, [kind])
+    
+        # Counters follow the migrated rows
+        for model_name, target_column in (('Question', 'question_id'), ('Comment', 'comment_id')):
+            table = apps.get_model('questions', model_name)._meta.db_table
+            cursor.execute(f"""
+                UPDATE {table} SET
+                    like_count = (SELECT COUNT(*) FROM {reaction_table} r WHERE r.{target_column} = {table}.id AND r.kind = 'like'),
+                    dislike_count = (SELECT COUNT(*) FROM {reaction_table} r WHERE r.{target_column} = {table}.id AND r.kind = 'dislike')
+            """)
+
+
+def restore_reactions(apps, schema_editor):
+    reaction_table = apps.get_model('questions', 'Reaction')._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        for model_name, target_column, kind, field_name in REACTION_SOURCES:
+            model = apps.get_model('questions', model_name)
+            through = model._meta.get_field(field_name).remote_field.through._meta
+            source_column = through.get_field(model._meta.model_name).column
+            user_column = through.get_field('customuser').column
+            cursor.execute(f"""
+                INSERT INTO {through.db_table} ({source_column}, {user_column})
+                SELECT {target_column}, user_id FROM {reaction_table}
+                WHERE {target_column} IS NOT NULL AND kind = %s
+            """, [kind])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('questions', '0008_question_comment_reaction_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('like', 'Like'), ('dislike', 'Dislike')], max_length=7)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('comment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to='questions.comment')),
+                ('question', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to='questions.question')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='reaction',
+            constraint=models.UniqueConstraint(fields=('user', 'question'), name='unique_question_reaction'),
+        ),
+        migrations.AddConstraint(
+            model_name='reaction',
+            constraint=models.UniqueConstraint(fields=('user', 'comment'), name='unique_comment_reaction'),
+        ),
+        migrations.AddConstraint(
+            model_name='reaction',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('comment__isnull', True), ('question__isnull', False)), models.Q(('comment__isnull', False), ('question__isnull', True)), _connector='OR'), name='reaction_has_single_target'),
+        ),
+        migrations.RunPython(copy_reactions, restore_reactions),
+        migrations.RemoveField(
+            model_name='comment',
+            name='disliked_users',
+        ),
+        migrations.RemoveField(
+            model_name='comment',
+            name='liked_users',
+        ),
+        migrations.RemoveField(
+            model_name='question',
+            name='disliked_users',
+        ),
+        migrations.RemoveField(
+            model_name='question',
+            name='liked_users',
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:44
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Title weighs A, body B and the author's name C. The author part is refreshed when the user is renamed.
+SEARCH_VECTOR_SQL = """
+CREATE FUNCTION questions_question_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.body, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(
+            (SELECT first_name || ' ' || last_name FROM users_customuser WHERE id = NEW.user_id), ''
+        )), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER questions_question_search_vector_trigger
+BEFORE INSERT OR UPDATE OF title, body, user_id ON questions_question
+FOR EACH ROW EXECUTE FUNCTION questions_question_search_vector();
+
+CREATE FUNCTION users_customuser_refresh_question_search() RETURNS trigger AS $$
+BEGIN
+    UPDATE questions_question SET user_id = user_id WHERE user_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER users_customuser_refresh_question_search_trigger
+AFTER UPDATE OF first_name, last_name ON users_customuser
+FOR EACH ROW WHEN (OLD.first_name IS DISTINCT FROM NEW.first_name OR OLD.last_name IS DISTINCT FROM NEW.last_name)
+EXECUTE FUNCTION users_customuser_refresh_question_search();
+
+UPDATE questions_question SET title = title;
+"""
+
+DROP_SEARCH_VECTOR_SQL = """
+DROP TRIGGER IF EXISTS users_customuser_refresh_question_search_trigger ON users_customuser;
+DROP FUNCTION IF EXISTS users_customuser_refresh_question_search();
+DROP TRIGGER IF EXISTS questions_question_search_vector_trigger ON questions_question;
+DROP FUNCTION IF EXISTS questions_question_search_vector();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0009_reaction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='question_search_vector_idx'),
+        ),
+        migrations.RunSQL(SEARCH_VECTOR_SQL, DROP_SEARCH_VECTOR_SQL),
+    ]
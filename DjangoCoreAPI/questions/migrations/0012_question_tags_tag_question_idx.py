@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0011_trigram_indexes'),
+    ]
+
+    # The auto created through table only has (question_id, tag_id) and tag_id indexes;
+    # tag first with the question id lets tag filters run as index only scans
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX questions_question_tags_tag_question_idx ON questions_question_tags (tag_id, question_id);',
+            'DROP INDEX questions_question_tags_tag_question_idx;',
+        ),
+    ]
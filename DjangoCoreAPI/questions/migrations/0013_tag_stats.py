@@ -0,0 +1,69 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Same as questions.tag_stats.rebuild_tag_stats, for the existing questions
+BACKFILL_SQL = """
+INSERT INTO questions_tagstat (tag_id, question_count, last_activity, related)
+SELECT t.id, COUNT(q.id), MAX(q.updated_at), '[]'::jsonb
+FROM questions_tag t
+LEFT JOIN questions_question_tags qt ON qt.tag_id = t.id
+LEFT JOIN questions_question q ON q.id = qt.question_id
+GROUP BY t.id;
+
+INSERT INTO questions_tagpair (tag_id, other_id, count)
+SELECT a.tag_id, b.tag_id, COUNT(*)
+FROM questions_question_tags a JOIN questions_question_tags b ON a.question_id = b.question_id AND a.tag_id <> b.tag_id
+GROUP BY a.tag_id, b.tag_id;
+
+UPDATE questions_tagstat s SET related = COALESCE((
+    SELECT jsonb_agg(jsonb_build_object('name', top.name, 'count', top.count) ORDER BY top.count DESC, top.name)
+    FROM (
+        SELECT t.name, p.count
+        FROM questions_tagpair p JOIN questions_tag t ON t.id = p.other_id
+        WHERE p.tag_id = s.tag_id
+        ORDER BY p.count DESC, t.name
+        LIMIT 5
+    ) top
+), '[]'::jsonb);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0012_question_tags_tag_question_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagStat',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stat', serialize=False, to='questions.tag')),
+                ('question_count', models.IntegerField(default=0)),
+                ('last_activity', models.DateTimeField(blank=True, null=True)),
+                ('related', models.JSONField(blank=True, default=list)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-question_count', 'tag'], name='tagstat_question_count_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TagPair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='questions.tag')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='questions.tag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', '-count'], name='tagpair_tag_count_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tagpair',
+            constraint=models.UniqueConstraint(fields=('tag', 'other'), name='unique_tag_pair'),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
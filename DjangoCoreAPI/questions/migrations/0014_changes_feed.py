@@ -0,0 +1,113 @@
+# Generated by Django 4.2.16 on 2026-10-19 16:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+# changed_at follows every write of a question or comment row, including raw counter updates, and
+# tag or favorite changes of a question. Deletions leave a tombstone, also for cascades.
+CHANGES_FEED_SQL = """
+UPDATE questions_question SET changed_at = updated_at;
+UPDATE questions_comment SET changed_at = updated_at;
+
+CREATE FUNCTION questions_set_changed_at() RETURNS trigger AS $$
+BEGIN
+    NEW.changed_at := clock_timestamp();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER questions_question_changed_at_trigger
+BEFORE INSERT OR UPDATE ON questions_question
+FOR EACH ROW EXECUTE FUNCTION questions_set_changed_at();
+
+CREATE TRIGGER questions_comment_changed_at_trigger
+BEFORE INSERT OR UPDATE ON questions_comment
+FOR EACH ROW EXECUTE FUNCTION questions_set_changed_at();
+
+CREATE FUNCTION questions_touch_question() RETURNS trigger AS $$
+BEGIN
+    UPDATE questions_question SET changed_at = clock_timestamp()
+    WHERE id = (CASE WHEN TG_OP = 'DELETE' THEN OLD.question_id ELSE NEW.question_id END);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER questions_question_tags_touch_trigger
+AFTER INSERT OR DELETE ON questions_question_tags
+FOR EACH ROW EXECUTE FUNCTION questions_touch_question();
+
+CREATE TRIGGER questions_question_favorited_by_touch_trigger
+AFTER INSERT OR DELETE ON questions_question_favorited_by
+FOR EACH ROW EXECUTE FUNCTION questions_touch_question();
+
+CREATE FUNCTION questions_record_tombstone() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO questions_tombstone (kind, object_id, question_id, deleted_at)
+    VALUES (TG_ARGV[0], OLD.id, (to_jsonb(OLD) ->> 'question_id')::bigint, clock_timestamp());
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER questions_question_tombstone_trigger
+AFTER DELETE ON questions_question
+FOR EACH ROW EXECUTE FUNCTION questions_record_tombstone('question');
+
+CREATE TRIGGER questions_comment_tombstone_trigger
+AFTER DELETE ON questions_comment
+FOR EACH ROW EXECUTE FUNCTION questions_record_tombstone('comment');
+"""
+
+DROP_CHANGES_FEED_SQL = """
+DROP TRIGGER questions_comment_tombstone_trigger ON questions_comment;
+DROP TRIGGER questions_question_tombstone_trigger ON questions_question;
+DROP FUNCTION questions_record_tombstone();
+DROP TRIGGER questions_question_favorited_by_touch_trigger ON questions_question_favorited_by;
+DROP TRIGGER questions_question_tags_touch_trigger ON questions_question_tags;
+DROP FUNCTION questions_touch_question();
+DROP TRIGGER questions_comment_changed_at_trigger ON questions_comment;
+DROP TRIGGER questions_question_changed_at_trigger ON questions_question;
+DROP FUNCTION questions_set_changed_at();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0013_tag_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('question', 'Question'), ('comment', 'Comment')], max_length=8)),
+                ('object_id', models.BigIntegerField()),
+                ('question_id', models.BigIntegerField(blank=True, null=True)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['changed_at', 'id'], name='comment_changed_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['changed_at', 'id'], name='question_changed_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_at_idx'),
+        ),
+        migrations.RunSQL(CHANGES_FEED_SQL, DROP_CHANGES_FEED_SQL),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.16 on 2026-10-19 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0014_changes_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='favorite_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE questions_question q SET favorite_count = f.total
+            FROM (SELECT question_id, COUNT(*) AS total FROM questions_question_favorited_by GROUP BY question_id) f
+            WHERE q.id = f.question_id
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
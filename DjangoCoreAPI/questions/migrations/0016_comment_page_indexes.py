@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-19 16:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0015_question_favorite_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['question', 'created_at', 'id'], name='comment_question_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['question', 'like_count', 'id'], name='comment_question_liked_idx'),
+        ),
+    ]
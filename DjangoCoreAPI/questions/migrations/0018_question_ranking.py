@@ -0,0 +1,123 @@
+# Generated by Django 4.2.16 on 2026-10-19 16:21
+
+from django.db import migrations, models
+
+# Engagement: likes, favorites and (double weighted) comments minus dislikes.
+# hot_score is recomputed from the counters on every write, trending_score gains the change in engagement
+# and is decayed by the decay_trending_scores command. comment_count follows comment inserts and deletes
+# with statement level triggers, so bulk inserts update each question once.
+RANKING_SQL = """
+-- ALTER TABLE refuses to run while deferred foreign key checks of this transaction are still queued
+SET CONSTRAINTS ALL IMMEDIATE;
+
+ALTER TABLE questions_question DISABLE TRIGGER questions_question_changed_at_trigger;
+
+UPDATE questions_question q SET comment_count = c.total
+FROM (SELECT question_id, COUNT(*) AS total FROM questions_comment GROUP BY question_id) c
+WHERE q.id = c.question_id;
+
+CREATE FUNCTION questions_question_scores() RETURNS trigger AS $$
+DECLARE
+    engagement double precision := NEW.like_count + NEW.favorite_count + 2 * NEW.comment_count - NEW.dislike_count;
+BEGIN
+    NEW.hot_score := sign(engagement) * log(greatest(abs(engagement), 1)) + extract(epoch FROM NEW.created_at) / 45000;
+    IF TG_OP = 'UPDATE' THEN
+        NEW.trending_score := NEW.trending_score + engagement
+            - (OLD.like_count + OLD.favorite_count + 2 * OLD.comment_count - OLD.dislike_count);
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER questions_question_scores_trigger
+BEFORE INSERT OR UPDATE ON questions_question
+FOR EACH ROW EXECUTE FUNCTION questions_question_scores();
+
+UPDATE questions_question SET hot_score = 0;
+
+ALTER TABLE questions_question ENABLE TRIGGER questions_question_changed_at_trigger;
+
+CREATE FUNCTION questions_count_comments() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE questions_question q SET comment_count = q.comment_count + c.total
+        FROM (SELECT question_id, COUNT(*) AS total FROM new_comments GROUP BY question_id) c
+        WHERE q.id = c.question_id;
+    ELSE
+        UPDATE questions_question q SET comment_count = q.comment_count - c.total
+        FROM (SELECT question_id, COUNT(*) AS total FROM old_comments GROUP BY question_id) c
+        WHERE q.id = c.question_id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER questions_comment_insert_count_trigger
+AFTER INSERT ON questions_comment REFERENCING NEW TABLE AS new_comments
+FOR EACH STATEMENT EXECUTE FUNCTION questions_count_comments();
+
+CREATE TRIGGER questions_comment_delete_count_trigger
+AFTER DELETE ON questions_comment REFERENCING OLD TABLE AS old_comments
+FOR EACH STATEMENT EXECUTE FUNCTION questions_count_comments();
+
+-- Decaying the trending scores is not a change the changes feed has to report
+CREATE OR REPLACE FUNCTION questions_set_changed_at() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+        AND to_jsonb(NEW) - ARRAY['changed_at', 'hot_score', 'trending_score'] = to_jsonb(OLD) - ARRAY['changed_at', 'hot_score', 'trending_score'] THEN
+        RETURN NEW;
+    END IF;
+    NEW.changed_at := clock_timestamp();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+DROP_RANKING_SQL = """
+CREATE OR REPLACE FUNCTION questions_set_changed_at() RETURNS trigger AS $$
+BEGIN
+    NEW.changed_at := clock_timestamp();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER questions_comment_delete_count_trigger ON questions_comment;
+DROP TRIGGER questions_comment_insert_count_trigger ON questions_comment;
+DROP FUNCTION questions_count_comments();
+DROP TRIGGER questions_question_scores_trigger ON questions_question;
+DROP FUNCTION questions_question_scores();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0017_import_checkpoints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='comment_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='hot_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-hot_score', '-id'], name='question_hot_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-trending_score', '-id'], name='question_trending_score_idx'),
+        ),
+        migrations.RunSQL(RANKING_SQL, DROP_RANKING_SQL),
+    ]
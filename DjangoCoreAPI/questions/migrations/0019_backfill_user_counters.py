@@ -0,0 +1,20 @@
+from django.db import migrations
+
+# questions_asked and answers_given were never written before, start them from the actual counts
+BACKFILL_SQL = """
+UPDATE users_customuser u SET
+    questions_asked = (SELECT COUNT(*) FROM questions_question q WHERE q.user_id = u.id),
+    answers_given = (SELECT COUNT(*) FROM questions_comment c WHERE c.user_id = u.id);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0018_question_ranking'),
+        ('users', '0005_alter_customuser_profile_picture'),
+    ]
+
+    operations = [
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
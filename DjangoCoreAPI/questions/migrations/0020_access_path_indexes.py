@@ -0,0 +1,26 @@
+# Generated by Django 4.2.16 on 2026-10-19 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0019_backfill_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-created_at', '-id'], name='question_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='question_user_created_idx'),
+        ),
+        # favorited-questions/ walks a user's favorites: user first with the question id, like the tags table in 0012
+        migrations.RunSQL(
+            'CREATE INDEX questions_question_favorited_by_user_question_idx ON questions_question_favorited_by (customuser_id, question_id);',
+            'DROP INDEX questions_question_favorited_by_user_question_idx;',
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.16 on 2026-10-19 17:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0020_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LegacyComment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255)),
+                ('legacy_id', models.CharField(max_length=64)),
+                ('comment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='questions.comment')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='legacycomment',
+            constraint=models.UniqueConstraint(fields=('source', 'legacy_id'), name='unique_legacy_comment'),
+        ),
+    ]
@@ -1,14 +1,127 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connection, models, transaction
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q, Subquery, Value
+from django.http import Http404
+from django.utils import timezone
+from django.db.models.functions import Coalesce, Concat, Left
 from django.conf import settings  # To reference the User model
+from DjangoCoreAPI.response_cache import bump
+
+
+def count_subquery(queryset, field):
+    """
+    Correlated COUNT(*) of the rows of queryset pointing at each row of the outer query with `field`
+    """
+    counts = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('*'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts), 0)
 
 
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True)
 
+    class Meta:
+        indexes = [
+            # Trigram index for typo tolerant tag matching (see FullTextSearchFilter)
+            GinIndex(fields=['name'], name='tag_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
+
     def __str__(self):
         return self.name
 
 
+class QuestionQuerySet(models.QuerySet):
+    def with_viewer_flags(self, user):
+        """
+        is_favorited, is_liked and is_disliked of `user` as EXISTS subqueries, False for anonymous users
+        """
+        if user is None or not user.is_authenticated:
+            false = Value(False, output_field=models.BooleanField())
+            return self.annotate(is_favorited=false, is_liked=false, is_disliked=false)
+        reactions = Reaction.objects.filter(question=OuterRef('pk'), user=user)
+        favorites = Question.favorited_by.through.objects.filter(question=OuterRef('pk'), customuser=user)
+        return self.annotate(
+            is_favorited=Exists(favorites),
+            is_liked=Exists(reactions.filter(kind=Reaction.LIKE)),
+            is_disliked=Exists(reactions.filter(kind=Reaction.DISLIKE)),
+        )
+
+    def toggle_favorite(self, user, question_id):
+        """
+        Add or remove the user's favorite and move favorite_count in the same statement.
+        Returns whether the question is now a favorite, raises Http404 if it does not exist.
+        """
+        field = Question._meta.get_field('favorited_by')
+        qn = connection.ops.quote_name
+        through, question_table = qn(field.remote_field.through._meta.db_table), qn(Question._meta.db_table)
+        question_column, user_column = field.m2m_column_name(), field.m2m_reverse_name()
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            Reaction.objects.lock_user(cursor, user.pk)
+            cursor.execute(f"""
+                WITH added AS (
+                    INSERT INTO {through} ({question_column}, {user_column})
+                    SELECT id, %s FROM {question_table} WHERE id = %s
+                    ON CONFLICT ({question_column}, {user_column}) DO NOTHING
+                    RETURNING 1
+                )
+                UPDATE {question_table} SET favorite_count = favorite_count + (SELECT COUNT(*) FROM added)
+                WHERE id = %s
+                RETURNING (SELECT COUNT(*) FROM added)
+            """, [user.pk, question_id, question_id])
+            row = cursor.fetchone()
+            if row is None:
+                raise Http404("No Question matches the given query.")
+            if not row[0]:
+                # Already a favorite: toggle it off
+                cursor.execute(f"""
+                    WITH removed AS (
+                        DELETE FROM {through} WHERE {question_column} = %s AND {user_column} = %s
+                        RETURNING 1
+                    )
+                    UPDATE {question_table} SET favorite_count = favorite_count - (SELECT COUNT(*) FROM removed)
+                    WHERE id = %s
+                """, [question_id, user.pk, question_id])
+        bump('questions', f'question:{question_id}')
+        return bool(row[0])
+
+    def for_serializer(self, user=None):
+        """
+        Everything QuestionSerializer reads for `user`, loaded with a constant number of queries.
+        Only the first page of comments (newest first, one extra row to tell if there are more) is loaded.
+        """
+        first_page = getattr(settings, 'COMMENTS_PAGE_SIZE', 20) + 1
+        comments = Comment.objects.order_by('-created_at', '-id')[:first_page]
+        return self.defer('search_vector').with_viewer_flags(user).prefetch_related(
+            'tags',
+            Prefetch('comments', queryset=comments, to_attr='first_comments'),
+        )
+
+    def for_summary(self, fields, user=None):
+        """
+        What QuestionSummarySerializer reads for `fields`, and nothing else: the body is only loaded when
+        asked for, the excerpt is cut in the database and the tags and comments are only prefetched on request
+        """
+        queryset = self.defer('search_vector') if 'body' in fields else self.defer('body', 'search_vector')
+        if {'is_favorited', 'is_liked', 'is_disliked'} & set(fields):
+            queryset = queryset.with_viewer_flags(user)
+        if 'excerpt' in fields:
+            queryset = queryset.annotate(excerpt=Left('body', getattr(settings, 'QUESTION_EXCERPT_LENGTH', 200)))
+        if 'author' in fields:
+            queryset = queryset.annotate(author_name=Concat('user__first_name', Value(' '), 'user__last_name'))
+        if 'tag_names' in fields:
+            queryset = queryset.prefetch_related('tags')
+        if 'comments' in fields:
+            queryset = queryset.prefetch_related(Prefetch('comments', queryset=Comment.objects.order_by('created_at', 'id')))
+        return queryset
+
+
 class Question(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='questions')
     title = models.CharField(max_length=255)
@@ -16,15 +129,49 @@ class Question(models.Model):
     tags = models.ManyToManyField(Tag, related_name="questions",blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    liked_users = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='liked_questions', blank=True)
-    disliked_users = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='disliked_questions', blank=True)
     favorited_by = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='favorite_questions', blank=True)
+    # Denormalized reaction and favorite counters, updated with F() when toggled (see reconcile_reaction_counters)
+    like_count = models.IntegerField(default=0)
+    dislike_count = models.IntegerField(default=0)
+    favorite_count = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0, editable=False) # Maintained by a database trigger (migration 0018)
+    # Ranking of the hot/ and trending/ feeds, maintained by a database trigger from the counters (migration 0018).
+    # hot_score: log10 of the engagement plus the creation time in units of 12.5 hours, so it needs no decay.
+    # trending_score: engagement gained recently, decayed by the decay_trending_scores command.
+    hot_score = models.FloatField(default=0, editable=False)
+    trending_score = models.FloatField(default=0, editable=False)
+    # Weighted title/body/author tsvector, maintained by a database trigger (migration 0010)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Time of the last change of anything in the row, its tags or favorites, set by database triggers (migration 0014)
+    changed_at = models.DateTimeField(default=timezone.now, editable=False)
     
-    def like_count(self):
-        return self.liked_users.count()
+    objects = QuestionQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # Keyset pages of the default newest first ordering, overall and per author (own-questions/)
+            models.Index(fields=['-created_at', '-id'], name='question_created_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='question_user_created_idx'),
+            models.Index(fields=['-like_count', '-id'], name='question_like_count_idx'),
+            GinIndex(fields=['search_vector'], name='question_search_vector_idx'),
+            GinIndex(fields=['title'], name='question_title_trgm_idx', opclasses=['gin_trgm_ops']),
+            models.Index(fields=['changed_at', 'id'], name='question_changed_at_idx'),
+            models.Index(fields=['-hot_score', '-id'], name='question_hot_score_idx'),
+            models.Index(fields=['-trending_score', '-id'], name='question_trending_score_idx'),
+        ]
+
+    # Columns written only by database triggers, a full save() must not write back stale in-memory values
+    TRIGGER_FIELDS = ('comment_count', 'hot_score', 'trending_score', 'search_vector', 'changed_at')
+    # Moved in place by reaction and favorite toggles, which a full save() must not undo either
+    COUNTER_FIELDS = ('like_count', 'dislike_count', 'favorite_count')
 
-    def dislike_count(self):
-        return self.disliked_users.count()
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not args and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.TRIGGER_FIELDS + self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name} - {self.title}"
@@ -36,14 +183,233 @@ class Comment(models.Model):
     body = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    liked_users = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='liked_comments', blank=True)
-    disliked_users = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='disliked_comments', blank=True)
+    like_count = models.IntegerField(default=0)
+    dislike_count = models.IntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now, editable=False) # Set by a database trigger, see Question
 
-    def like_count(self):
-        return self.liked_users.count()
-
-    def dislike_count(self):
-        return self.disliked_users.count()
+    class Meta:
+        indexes = [
+            models.Index(fields=['changed_at', 'id'], name='comment_changed_at_idx'),
+            # Keyset pages of a question's comments (CommentPagination), read backwards for newest first
+            models.Index(fields=['question', 'created_at', 'id'], name='comment_question_created_idx'),
+            models.Index(fields=['question', 'like_count', 'id'], name='comment_question_liked_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.first_name} {self.user.last_name} - {self.question.title}'
+
+
+class ReactionManager(models.Manager):
+    LOCK_CLASS = 31 # First key of the advisory locks, so they do not collide with other users of pg_advisory_xact_lock
+
+    def lock_user(self, cursor, user_id):
+        """
+        Serialize the reaction and favorite writes of one user until the end of the current transaction.
+        Batches fold over a snapshot of the user's reactions, which a concurrent toggle must not change.
+        """
+        cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", [self.LOCK_CLASS, user_id])
+
+    def toggle(self, user, kind, question_id=None, comment_id=None):
+        """
+        Toggle the user's like/dislike on a question or comment and return whether it is now set.
+        Setting a reaction is a single upsert that also switches an opposite reaction and moves the
+        target's counters, toggling off is a single delete that does the same, so the cost never depends
+        on how many users reacted. Raises Http404 if the target does not exist.
+        """
+        if question_id is not None:
+            target_column, target_id, target_model = 'question_id', question_id, Question
+        else:
+            target_column, target_id, target_model = 'comment_id', comment_id, Comment
+        question_column = 'id' if target_model is Question else 'question_id' # Whose cached responses change
+        counter = Reaction.COUNTERS[kind]
+        opposite_counter = Reaction.COUNTERS[Reaction.LIKE if kind == Reaction.DISLIKE else Reaction.DISLIKE]
+        qn = connection.ops.quote_name
+        reaction_table, target_table = qn(self.model._meta.db_table), qn(target_model._meta.db_table)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            self.lock_user(cursor, user.pk)
+            # The WHERE makes re-sending the same reaction a no-op, (xmax = 0) is true for a fresh insert
+            cursor.execute(f"""
+                WITH upsert AS (
+                    INSERT INTO {reaction_table} (user_id, {target_column}, kind, created_at)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (user_id, {target_column}) DO UPDATE
+                        SET kind = EXCLUDED.kind, created_at = EXCLUDED.created_at
+                        WHERE {reaction_table}.kind <> EXCLUDED.kind
+                    RETURNING (xmax = 0) AS inserted
+                )
+                UPDATE {target_table}
+                SET {counter} = {counter} + 1,
+                    {opposite_counter} = {opposite_counter} - (CASE WHEN upsert.inserted THEN 0 ELSE 1 END)
+                FROM upsert
+                WHERE {target_table}.id = %s
+                RETURNING {target_table}.{question_column}
+            """, [user.pk, target_id, kind, timezone.now(), target_id])
+            row = cursor.fetchone()
+            if row is not None:
+                bump('questions', f'question:{row[0]}')
+                return True
+
+            # Nothing changed, so the same reaction already exists: toggle it off
+            cursor.execute(f"""
+                WITH removed AS (
+                    DELETE FROM {reaction_table}
+                    WHERE user_id = %s AND {target_column} = %s AND kind = %s
+                    RETURNING 1
+                )
+                UPDATE {target_table}
+                SET {counter} = {counter} - (SELECT COUNT(*) FROM removed)
+                WHERE id = %s
+                RETURNING {question_column}
+            """, [user.pk, target_id, kind, target_id])
+            row = cursor.fetchone()
+            if row is None:
+                raise Http404("No %s matches the given query." % target_model._meta.object_name)
+            bump('questions', f'question:{row[0]}')
+        return False
+
+
+class Reaction(models.Model):
+    """
+    A like or dislike of a user on exactly one question or comment.
+    A user has at most one reaction per target, liking a disliked post switches the kind.
+    """
+    LIKE = 'like'
+    DISLIKE = 'dislike'
+    KIND_CHOICES = (
+        (LIKE, 'Like'),
+        (DISLIKE, 'Dislike'),
+    )
+    COUNTERS = {LIKE: 'like_count', DISLIKE: 'dislike_count'} # Counter column of the target for each kind
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='reactions')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='reactions', null=True, blank=True)
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='reactions', null=True, blank=True)
+    kind = models.CharField(max_length=7, choices=KIND_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ReactionManager()
+
+    class Meta:
+        constraints = [
+            # NULL targets never conflict, so each constraint only applies to its own target type
+            models.UniqueConstraint(fields=['user', 'question'], name='unique_question_reaction'),
+            models.UniqueConstraint(fields=['user', 'comment'], name='unique_comment_reaction'),
+            models.CheckConstraint(
+                check=Q(question__isnull=False, comment__isnull=True) | Q(question__isnull=True, comment__isnull=False),
+                name='reaction_has_single_target',
+            ),
+        ]
+
+    def __str__(self):
+        target = f"question {self.question_id}" if self.question_id else f"comment {self.comment_id}"
+        return f"{self.user_id} {self.kind}s {target}"
+
+
+class TagStat(models.Model):
+    """
+    Per tag aggregates for the tag page, maintained incrementally by the tag signals (questions.tag_stats)
+    and rebuilt from scratch by the rebuild_tag_stats command.
+    """
+    tag = models.OneToOneField(Tag, on_delete=models.CASCADE, primary_key=True, related_name='stat')
+    question_count = models.IntegerField(default=0)
+    last_activity = models.DateTimeField(null=True, blank=True) # Last time a question with the tag was asked, edited or tagged
+    related = models.JSONField(default=list, blank=True) # Most co-occurring tags: [{"name": ..., "count": ...}]
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-question_count', 'tag'], name='tagstat_question_count_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tag_id}: {self.question_count} question(s)"
+
+
+class TagPair(models.Model):
+    """
+    Number of questions tagged with both tags, stored in both directions
+    """
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='+')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'other'], name='unique_tag_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['tag', '-count'], name='tagpair_tag_count_idx'),
+        ]
+
+
+class Tombstone(models.Model):
+    """
+    A deleted question or comment, recorded by a database trigger so the changes feed can report it.
+    Pruned after SYNC_TOMBSTONE_DAYS by the prune_tombstones command.
+    """
+    QUESTION = 'question'
+    COMMENT = 'comment'
+    KIND_CHOICES = (
+        (QUESTION, 'Question'),
+        (COMMENT, 'Comment'),
+    )
+
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    question_id = models.BigIntegerField(null=True, blank=True) # Question of a deleted comment
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted at {self.deleted_at}"
+
+
+class ImportCheckpoint(models.Model):
+    """
+    How many records of an import source have been loaded, saved in the same transaction as each batch
+    so an interrupted import_questions run resumes after the last committed batch
+    """
+    source = models.CharField(max_length=255, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source}: {self.position}"
+
+
+class LegacyQuestion(models.Model):
+    """
+    Id of an imported question in its source system, so comments of later batches and runs find it
+    """
+    source = models.CharField(max_length=255)
+    legacy_id = models.CharField(max_length=64)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'legacy_id'], name='unique_legacy_question'),
+        ]
+
+    def __str__(self):
+        return f"{self.source}:{self.legacy_id} -> {self.question_id}"
+
+
+class LegacyComment(models.Model):
+    """
+    Id of an imported comment in its source system, so a restarted import does not load it twice
+    """
+    source = models.CharField(max_length=255)
+    legacy_id = models.CharField(max_length=64)
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'legacy_id'], name='unique_legacy_comment'),
+        ]
+
+    def __str__(self):
+        return f"{self.source}:{self.legacy_id} -> {self.comment_id}"
@@ -0,0 +1,166 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique ordering, (created_at, id) by default.
+    Every page is one range query on the ordering columns, so deep pages cost the same as the first one
+    and no COUNT query is needed. Clients pick one of `orderings` with ?sort=, views can force an ordering
+    with a `keyset_ordering` attribute. Every ordering must end with a unique column.
+    """
+    ordering = ('-created_at', '-id')
+    orderings = {
+        'newest': ('-created_at', '-id'),
+        'most_liked': ('-like_count', '-id'),
+        'hot': ('-hot_score', '-id'),
+        'trending': ('-trending_score', '-id'),
+    }
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    sort_query_param = 'sort'
+    invalid_cursor_message = 'Invalid cursor'
+    # (setting name, default) of the page size and its cap
+    page_size_setting = ('QUESTIONS_PAGE_SIZE', 20)
+    max_page_size_setting = ('QUESTIONS_MAX_PAGE_SIZE', 100)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = getattr(view, 'keyset_ordering', None) or self.get_ordering(request)
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        values, reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [self.invert(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+
+        # One extra row tells whether there is a page after this one
+        try:
+            if values is not None:
+                queryset = queryset.filter(self.keyset_filter(ordering, values))
+            results = list(queryset[:self.page_size + 1])
+        except (ValidationError, ValueError, TypeError):  # Cursor values that do not fit the ordering columns
+            raise NotFound(self.invalid_cursor_message)
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        if reverse:
+            self.has_next, self.has_previous = values is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_ordering(self, request):
+        sort = request.query_params.get(self.sort_query_param)
+        return self.orderings.get(sort, self.ordering)
+
+    def get_page_size(self, request):
+        page_size = getattr(settings, *self.page_size_setting)
+        max_page_size = getattr(settings, *self.max_page_size_setting)
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, page_size))
+        except (TypeError, ValueError):
+            pass
+        return max(1, min(page_size, max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def keyset_filter(self, ordering, values):
+        """
+        Rows strictly after `values` in `ordering`:
+        (a > x) OR (a = x AND b > y) OR ..., with lt/gt picked by each field's direction
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        # The extra bound on the leading column lets the planner use it as an index range
+        first = ordering[0]
+        bound = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{bound}': values[0]}) & condition
+
+    def encode_cursor(self, obj, reverse):
+        values = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            values.append(value)
+        payload = json.dumps({'v': values, 'r': reverse}, separators=(',', ':'))
+        cursor = urlsafe_b64encode(payload.encode()).decode()
+        url = remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode()).decode())
+            values, reverse = payload['v'], bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+
+class CommentPagination(KeysetPagination):
+    """
+    Keyset pages of a question's comments, newest first or ?sort=oldest / ?sort=most_liked
+    """
+    orderings = {
+        'newest': ('-created_at', '-id'),
+        'oldest': ('created_at', 'id'),
+        'most_liked': ('-like_count', '-id'),
+    }
+    page_size_setting = ('COMMENTS_PAGE_SIZE', 20)
+    max_page_size_setting = ('COMMENTS_MAX_PAGE_SIZE', 100)
+
+    def first_page(self, comments, url):
+        """
+        Split the first page off `comments`, fetched in the default ordering with one extra row, and
+        return it with the link to the next page of the comments endpoint at `url`
+        """
+        self.page_size = getattr(settings, *self.page_size_setting)
+        self.base_url = url
+        comments = list(comments)
+        page = comments[:self.page_size]
+        if len(comments) <= self.page_size:
+            return page, None
+        return page, self.encode_cursor(page[-1], reverse=False)
@@ -0,0 +1,116 @@
+from django.db import connection, transaction
+from DjangoCoreAPI.response_cache import bump
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from questions.models import Question, Comment, Reaction
+
+TARGET_MODELS = {'question': Question, 'comment': Comment}
+TARGET_FIELDS = {'question': 'question_id', 'comment': 'comment_id'}
+
+
+def counter_update(deltas):
+    """
+    One CASE expression per counter so a single UPDATE moves the counters of every target
+    """
+    updates = {}
+    for counter in Reaction.COUNTERS.values():
+        whens = [When(pk=pk, then=Value(delta[counter])) for pk, delta in deltas.items() if delta[counter]]
+        if whens:
+            updates[counter] = F(counter) + Case(*whens, default=Value(0), output_field=IntegerField())
+    return updates
+
+
+def apply_reaction_batch(user, operations):
+    """
+    Apply a list of validated like/dislike/favorite toggles of one user in order and return a result per operation.
+    The operations are folded in memory over the current state, then the difference is written with
+    set-based statements, so the number of queries does not grow with the batch size.
+    The user's reaction lock is held for the whole transaction, so concurrent toggles cannot change the folded state.
+    """
+    results = [None] * len(operations)
+    ids = {target: {op['id'] for op in operations if op['target'] == target} for target in TARGET_MODELS}
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            Reaction.objects.lock_user(cursor, user.pk)
+        # id -> id of the question whose cached responses change
+        parents = {
+            'question': {pk: pk for pk in Question.objects.filter(pk__in=ids['question']).values_list('pk', flat=True)},
+            'comment': dict(Comment.objects.filter(pk__in=ids['comment']).values_list('pk', 'question_id')),
+        }
+        existing = {target: set(parents[target]) for target in TARGET_MODELS}
+        current = {}  # (target, id) -> Reaction
+        reactions = Reaction.objects.filter(
+            Q(question_id__in=existing['question']) | Q(comment_id__in=existing['comment']), user=user,
+        )
+        for reaction in reactions:
+            key = ('question', reaction.question_id) if reaction.question_id else ('comment', reaction.comment_id)
+            current[key] = reaction
+        favorites = set(
+            Question.favorited_by.through.objects.filter(customuser=user, question_id__in=existing['question'])
+            .values_list('question_id', flat=True)
+        )
+
+        # Fold the toggles in order, exactly like the single reaction endpoints would
+        state = {key: reaction.kind for key, reaction in current.items()}
+        favorite_state = {pk: True for pk in favorites}
+        for index, op in enumerate(operations):
+            key = (op['target'], op['id'])
+            if op['id'] not in existing[op['target']]:
+                results[index] = {**op, 'status': 'not_found'}
+                continue
+            if op['action'] == 'favorite':
+                active = not favorite_state.get(op['id'], False)
+                favorite_state[op['id']] = active
+            else:
+                active = state.get(key) != op['action']
+                state[key] = op['action'] if active else None
+            results[index] = {**op, 'status': 'ok', 'active': active}
+
+        # Write only the difference between the initial and the final state
+        deltas = {target: {} for target in TARGET_MODELS}
+        removed, upserts = [], {target: [] for target in TARGET_MODELS}
+        for key, kind in state.items():
+            target, pk = key
+            previous = current[key].kind if key in current else None
+            if kind == previous:
+                continue
+            delta = deltas[target].setdefault(pk, {counter: 0 for counter in Reaction.COUNTERS.values()})
+            if previous:
+                delta[Reaction.COUNTERS[previous]] -= 1
+            if kind:
+                delta[Reaction.COUNTERS[kind]] += 1
+                upserts[target].append(Reaction(user=user, kind=kind, **{TARGET_FIELDS[target]: pk}))
+            else:
+                removed.append(current[key].pk)
+
+        if removed:
+            Reaction.objects.filter(pk__in=removed).delete()
+        for target, rows in upserts.items():
+            if rows:
+                Reaction.objects.bulk_create(
+                    rows, update_conflicts=True, unique_fields=['user', target], update_fields=['kind'],
+                )
+        for target, model in TARGET_MODELS.items():
+            if deltas[target]:
+                model.objects.filter(pk__in=deltas[target]).update(**counter_update(deltas[target]))
+
+        added = [pk for pk, active in favorite_state.items() if active and pk not in favorites]
+        dropped = [pk for pk, active in favorite_state.items() if not active and pk in favorites]
+        through = Question.favorited_by.through
+        if added:
+            through.objects.bulk_create(
+                [through(question_id=pk, customuser_id=user.pk) for pk in added], ignore_conflicts=True,
+            )
+        if dropped:
+            through.objects.filter(customuser=user, question_id__in=dropped).delete()
+        if added or dropped:
+            whens = [When(pk=pk, then=Value(1)) for pk in added] + [When(pk=pk, then=Value(-1)) for pk in dropped]
+            Question.objects.filter(pk__in=added + dropped).update(
+                favorite_count=F('favorite_count') + Case(*whens, default=Value(0), output_field=IntegerField()),
+            )
+
+        changed = {parents[target][pk] for target in TARGET_MODELS for pk in deltas[target]}
+        changed.update(added, dropped)
+        if changed:
+            bump('questions', *(f'question:{pk}' for pk in changed))
+    return results
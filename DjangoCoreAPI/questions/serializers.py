@@ -1,21 +1,24 @@
 from rest_framework import serializers
-from questions.models import Question, Comment, Tag
+from django.conf import settings
+from django.urls import reverse
+from questions.models import Question, Comment, Tag, TagStat, Tombstone
+from questions.pagination import CommentPagination
+from questions.tags import set_question_tags, write_tags
 
 class CommentSerializer(serializers.ModelSerializer):
-    like_count = serializers.SerializerMethodField()
-    dislike_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Comment
         fields = ['id', 'user', 'question','body', 'created_at', 'updated_at','like_count', 'dislike_count']
-        read_only_fields = ['user','created_at','updated_at','liked_users', 'disliked_users']
-        # liked_users and disliked users are not included. Just count of them is included. Further it can be change.
-    
-    def get_like_count(self, obj):
-        return obj.like_count() # goes to model's function named like_count 
+        read_only_fields = ['user','created_at','updated_at','like_count', 'dislike_count']
+        # Reactions are not included. Just count of them (stored counters) is included. Further it can be change.
 
-    def get_dislike_count(self, obj):
-        return obj.dislike_count()
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        # Only edited columns are written so concurrent counter updates are not overwritten
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -25,24 +28,28 @@ class TagSerializer(serializers.ModelSerializer):
         
 
 class QuestionSerializer(serializers.ModelSerializer):
-    like_count = serializers.SerializerMethodField()
-    dislike_count = serializers.SerializerMethodField()
-    comments = CommentSerializer(many=True, read_only=True)  # Nested serializer for comments
+    # First page of comments and the link to the next one, the rest is served by question/<pk>/comments
+    comments = serializers.SerializerMethodField()
+    comments_next = serializers.SerializerMethodField()
     tags = serializers.ListField(child=serializers.CharField(max_length=50), write_only=True, required=False) # Every tag should be string, Write will only be used while POST request
     tag_names = serializers.SerializerMethodField() # For GET request
+    # Flags of the requesting user, annotated by Question.objects.for_serializer(user)
+    is_favorited = serializers.BooleanField(read_only=True, default=False)
+    is_liked = serializers.BooleanField(read_only=True, default=False)
+    is_disliked = serializers.BooleanField(read_only=True, default=False)
     
     class Meta:
         model = Question
-        fields = ["id","user","title","body","tags","tag_names","favorited_by","created_at","updated_at","like_count","dislike_count","comments"]
-        read_only_fields = ['user','favorited_by','created_at', 'updated_at', 'liked_users', 'disliked_users']
-        # liked_users and disliked users are not included. Just count of them is included. Further it can be change.
+        fields = ["id","user","title","body","tags","tag_names","created_at","updated_at","like_count","dislike_count","favorite_count","is_favorited","is_liked","is_disliked","comment_count","comments","comments_next"]
+        read_only_fields = ['user','created_at', 'updated_at', 'like_count', 'dislike_count', 'favorite_count', 'comment_count']
+        # Reactions are not included. Just count of them (stored counters) is included. Further it can be change.
         
     def create(self, validated_data):
         tags = validated_data.pop("tags", [])  # Extract tags into list
         question = Question.objects.create(**validated_data)
-        for tag_name in set(tags):  # Same tag filter
-            tag, created = Tag.objects.get_or_create(name=tag_name)
-            question.tags.add(tag)
+        if tags:
+            # Known tags come from the registry, the rest are resolved and created in bulk
+            write_tags(tags, lambda ids: question.tags.add(*ids.values()))
         return question
     
     def update(self, instance, validated_data):
@@ -52,24 +59,123 @@ class QuestionSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
         
         if tags is not None:
-            instance.tags.clear() # Clear existing tags
-            for tag_name in set(tags):
-                tag, created = Tag.objects.get_or_create(name=tag_name)
-                instance.tags.add(tag)
-        instance.save()
+            set_question_tags(instance, tags) # Only added and removed tags are written
+        # Only edited columns are written so concurrent counter updates are not overwritten
+        instance.save(update_fields=[*validated_data, 'updated_at'])
         return instance
     
     def get_tag_names(self, obj):
         return [tag.name for tag in obj.tags.all()]
-                
-    def get_like_count(self, obj):
-        return obj.like_count()
+    
+    def comment_page(self, obj):
+        if not hasattr(obj, '_comment_page'):
+            comments = getattr(obj, 'first_comments', None)  # Prefetched by Question.objects.for_serializer()
+            if comments is None:
+                comments = obj.comments.order_by('-created_at', '-id')[:getattr(settings, 'COMMENTS_PAGE_SIZE', 20) + 1]
+            url = reverse('question_comments', kwargs={'pk': obj.pk})
+            request = self.context.get('request')
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            obj._comment_page = CommentPagination().first_page(comments, url)
+        return obj._comment_page
+    
+    def get_comments(self, obj):
+        return CommentSerializer(self.comment_page(obj)[0], many=True).data
+    
+    def get_comments_next(self, obj):
+        return self.comment_page(obj)[1]
+    
 
-    def get_dislike_count(self, obj):
-        return obj.dislike_count()
     
+class QuestionSummarySerializer(serializers.ModelSerializer):
+    """
+    Compact question for lists. ?fields=id,title,... keeps only the listed fields, ?expand=comments adds the
+    comments and body can be asked for with ?fields=. Load the questions with Question.objects.for_summary(fields, user).
+    """
+    excerpt = serializers.CharField(read_only=True)
+    author = serializers.CharField(source='author_name', read_only=True)
+    tag_names = serializers.SerializerMethodField()
+    is_favorited = serializers.BooleanField(read_only=True)
+    is_liked = serializers.BooleanField(read_only=True)
+    is_disliked = serializers.BooleanField(read_only=True)
+    comments = CommentSerializer(many=True, read_only=True)
     
+    default_fields = [
+        "id", "user", "author", "title", "excerpt", "tag_names", "like_count", "dislike_count", "favorite_count",
+        "comment_count", "is_favorited", "is_liked", "is_disliked", "created_at", "updated_at",
+    ]
+    expandable_fields = ["comments"]
+    
+    class Meta:
+        model = Question
+        fields = [
+            "id", "user", "author", "title", "excerpt", "body", "tag_names", "like_count", "dislike_count", "favorite_count",
+            "comment_count", "is_favorited", "is_liked", "is_disliked", "created_at", "updated_at", "comments",
+        ]
+        
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+    
+    @classmethod
+    def requested_fields(cls, request):
+        """
+        Field names asked for with ?fields= and ?expand=, in declaration order
+        """
+        fields = request.query_params.get("fields")
+        requested = {name.strip() for name in fields.split(",")} if fields else set(cls.default_fields)
+        requested |= {name.strip() for name in request.query_params.get("expand", "").split(",")} & set(cls.expandable_fields)
+        return [name for name in cls.Meta.fields if name in requested]
+    
+    def get_tag_names(self, obj):
+        return [tag.name for tag in obj.tags.all()]
+
+
+class SyncQuestionSerializer(QuestionSerializer):
+    # The changes feed sends comments as their own stream
+    class Meta(QuestionSerializer.Meta):
+        fields = [
+            field for field in QuestionSerializer.Meta.fields if field not in ("comments", "comments_next")
+        ] + ["changed_at"]
+
+
+class TombstoneSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tombstone
+        fields = ["kind", "object_id", "question_id", "deleted_at"]
+
+
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
-        fields = "__all__"
\ No newline at end of file
+        fields = "__all__"
+
+
+class TagStatSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='tag.name')
+    
+    class Meta:
+        model = TagStat
+        fields = ["name", "question_count", "last_activity", "related"]
+
+class ReactionOperationSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=['like', 'dislike', 'favorite'])
+    target = serializers.ChoiceField(choices=['question', 'comment'])
+    id = serializers.IntegerField(min_value=1)
+
+    def validate(self, attrs):
+        if attrs['action'] == 'favorite' and attrs['target'] != 'question':
+            raise serializers.ValidationError("Only questions can be favorited.")
+        return attrs
+
+
+class BulkReactionSerializer(serializers.Serializer):
+    operations = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+    def validate_operations(self, value):
+        max_batch = getattr(settings, 'BULK_REACTIONS_MAX_BATCH', 500)
+        if len(value) > max_batch:
+            raise serializers.ValidationError(f"At most {max_batch} operations are allowed in one request.")
+        return value
@@ -0,0 +1,134 @@
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from DjangoCoreAPI.response_cache import bump
+from questions.models import Comment, Question, Tag
+from questions.tag_stats import apply_tag_change, touch_question_tags
+from questions.suggestions import QUESTION, TAG, suggestion_index
+from questions.tags import tag_registry, tags_created
+from questions.user_counters import ANSWERS_GIVEN, QUESTIONS_ASKED, adjust_user_counters
+
+
+# The suggestion index only learns about committed rows, rolled back writes never show up in it
+@receiver(post_save, sender=Question)
+def index_question_title(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'title' in update_fields:
+        transaction.on_commit(partial(suggestion_index.add, QUESTION, instance.pk, instance.title))
+
+
+@receiver(post_delete, sender=Question)
+def unindex_question_title(sender, instance, **kwargs):
+    transaction.on_commit(partial(suggestion_index.remove, QUESTION, instance.pk))
+
+
+@receiver(post_save, sender=Tag)
+def index_tag_name(sender, instance, **kwargs):
+    transaction.on_commit(partial(suggestion_index.add, TAG, instance.pk, instance.name))
+    tag_registry.clear()
+
+
+@receiver(tags_created, sender=Tag)
+def index_created_tags(sender, tags, **kwargs):
+    # Already sent once the tags are committed
+    for tag in tags:
+        suggestion_index.add(TAG, tag.pk, tag.name)
+
+
+@receiver(post_delete, sender=Tag)
+def unindex_tag_name(sender, instance, **kwargs):
+    transaction.on_commit(partial(suggestion_index.remove, TAG, instance.pk))
+    tag_registry.clear()
+
+
+@receiver(m2m_changed, sender=Question.tags.through)
+def update_tag_stats(sender, instance, action, reverse, pk_set, **kwargs):
+    # Additions are counted once the rows exist, removals while they still exist
+    if action == 'post_add' and pk_set:
+        delta, activity = 1, timezone.now()
+    elif action in ('pre_remove', 'pre_clear'):
+        delta, activity = -1, None
+    else:
+        return
+    if action == 'pre_clear':
+        pk_set = None
+    if reverse:
+        apply_tag_change(pk_set, [instance.pk], delta, activity)
+    else:
+        apply_tag_change([instance.pk], pk_set, delta, activity)
+
+
+@receiver(post_save, sender=Question)
+def touch_tag_stats(sender, instance, created, **kwargs):
+    if not created:
+        touch_question_tags(instance.pk, instance.updated_at)
+
+
+@receiver(pre_delete, sender=Question)
+def untag_deleted_question(sender, instance, **kwargs):
+    # The through rows are removed by the cascade, which does not send m2m_changed
+    apply_tag_change([instance.pk], None, -1)
+
+
+@receiver(pre_delete, sender=Tag)
+def untag_deleted_tag(sender, instance, **kwargs):
+    apply_tag_change(None, [instance.pk], -1)
+
+
+# Activity counters of the authors, in the transaction of the write
+
+@receiver(post_save, sender=Question)
+def count_asked_question(sender, instance, created, **kwargs):
+    if created:
+        adjust_user_counters(QUESTIONS_ASKED, {instance.user_id: 1})
+
+
+@receiver(post_delete, sender=Question)
+def uncount_asked_question(sender, instance, **kwargs):
+    adjust_user_counters(QUESTIONS_ASKED, {instance.user_id: -1})
+
+
+@receiver(post_save, sender=Comment)
+def count_given_answer(sender, instance, created, **kwargs):
+    if created:
+        adjust_user_counters(ANSWERS_GIVEN, {instance.user_id: 1})
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_given_answer(sender, instance, **kwargs):
+    adjust_user_counters(ANSWERS_GIVEN, {instance.user_id: -1})
+
+
+# Response cache invalidation (DjangoCoreAPI.response_cache)
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question(sender, instance, **kwargs):
+    bump('questions', f'question:{instance.pk}')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment(sender, instance, **kwargs):
+    bump('questions', f'question:{instance.question_id}')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(tags_created, sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    bump('tags')
+
+
+@receiver(m2m_changed, sender=Question.tags.through)
+@receiver(m2m_changed, sender=Question.favorited_by.through)
+def invalidate_question_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bump('questions', f'question:{instance.pk}')
+    elif pk_set:
+        bump('questions', *(f'question:{pk}' for pk in pk_set))
+    else:  # Cleared from the other side, the questions are no longer known
+        bump('questions', 'tags')
@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+from functools import partial
+from django.conf import settings
+from django.db import connections
+from django.db.models import CharField, Value
+from questions.models import Question, Tag
+
+QUESTION = 'question'
+TAG = 'tag'
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+def index_keys(kind, label):
+    """
+    Tags are matched from the start of their name, titles from the start of every word
+    """
+    text = normalize(label)
+    if kind == TAG:
+        return [text] if text else []
+    return list(dict.fromkeys(text.split(' '))) if text else []
+
+
+def matches(kind, label, prefix):
+    text = normalize(label)
+    if kind == TAG:
+        return text.startswith(prefix)
+    return (' ' + text).find(' ' + prefix) >= 0
+
+
+class PrefixIndex:
+    """
+    In-process autocomplete index over question titles and tag names.
+    Keys are kept in one sorted list of (key, kind, id): the whole name of a tag and every distinct word of a
+    title. A prefix lookup is a bisect on its first word followed by a short scan that checks the whole prefix.
+    It is built by a background thread, kept current by the signals in questions.signals and rebuilt after
+    SUGGESTIONS_REFRESH_SECONDS so every worker process eventually sees the other workers' writes.
+    Lookups never wait for a build: until the first one finishes nothing is suggested.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.build_thread = None
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.entries = []
+            self.labels = {}  # (kind, id) -> title or tag name
+            self.built_at = None
+            self.pending = None  # Changes made while a build runs, replayed over its result
+
+    def start_build(self):
+        """
+        Build the index in a background thread unless a build is already running
+        """
+        if not self.build_lock.acquire(blocking=False):
+            return
+        self.build_thread = threading.Thread(target=self.build_in_background, name='suggestion-index', daemon=True)
+        self.build_thread.start()
+
+    def build_in_background(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception("Building the suggestion index failed")
+        finally:
+            connections.close_all()  # The thread's own connections
+            self.build_lock.release()
+
+    def ensure_built(self):
+        refresh = getattr(settings, 'SUGGESTIONS_REFRESH_SECONDS', 300)
+        built_at = self.built_at
+        if built_at is None or (refresh and time.monotonic() - built_at > refresh):
+            self.start_build()
+
+    def build(self):
+        with self.lock:
+            self.pending = []
+        try:
+            titles = Question.objects.order_by().values_list(Value(QUESTION, output_field=CharField()), 'id', 'title')
+            names = Tag.objects.order_by().values_list(Value(TAG, output_field=CharField()), 'id', 'name')
+            entries, labels = [], {}
+            for kind, pk, label in titles.union(names, all=True).iterator(chunk_size=2000):
+                labels[(kind, pk)] = label
+                entries.extend((key, kind, pk) for key in index_keys(kind, label))
+            entries.sort()
+        except Exception:
+            with self.lock:
+                self.pending = None
+            raise
+        with self.lock:
+            pending, self.pending = self.pending, None
+            self.entries, self.labels, self.built_at = entries, labels, time.monotonic()
+            for change in pending:
+                change()
+
+    def add(self, kind, pk, label):
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append(partial(self._add, kind, pk, label))
+            if self.built_at is not None:
+                self._add(kind, pk, label)
+
+    def remove(self, kind, pk):
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append(partial(self._remove, kind, pk))
+            self._remove(kind, pk)
+
+    def _add(self, kind, pk, label):
+        self._remove(kind, pk)
+        self.labels[(kind, pk)] = label
+        for key in index_keys(kind, label):
+            insort(self.entries, (key, kind, pk))
+
+    def _remove(self, kind, pk):
+        label = self.labels.pop((kind, pk), None)
+        if label is None:
+            return
+        for key in index_keys(kind, label):
+            position = bisect_left(self.entries, (key, kind, pk))
+            if position < len(self.entries) and self.entries[position] == (key, kind, pk):
+                del self.entries[position]
+
+    def suggest(self, prefix, limit=10):
+        """
+        Up to `limit` tags and `limit` questions matching `prefix`, in key order.
+        The scan is bounded, so a one letter prefix costs the same as a long one.
+        """
+        prefix = normalize(prefix)
+        found = {QUESTION: {}, TAG: {}}
+        if not prefix:
+            return found
+        self.ensure_built()
+        first_word = prefix.split(' ')[0]
+        with self.lock:
+            start = bisect_left(self.entries, (first_word,))
+            for position in range(start, min(start + limit * 50, len(self.entries))):
+                key, kind, pk = self.entries[position]
+                if not key.startswith(first_word):
+                    break
+                if len(found[kind]) >= limit or pk in found[kind]:
+                    if len(found[QUESTION]) >= limit and len(found[TAG]) >= limit:
+                        break
+                    continue
+                label = self.labels[(kind, pk)]
+                if matches(kind, label, prefix):
+                    found[kind][pk] = label
+        return found
+
+
+suggestion_index = PrefixIndex()
@@ -0,0 +1,82 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import DateTimeField, ExpressionWrapper, Func, Q, Value
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from questions.models import Question, Comment, Tombstone
+
+# Stream name -> (queryset of the requesting user, ordering column). Each stream keeps its own position in the cursor.
+STREAMS = {
+    'questions': (lambda user: Question.objects.defer('search_vector').with_viewer_flags(user).prefetch_related('tags'), 'changed_at'),
+    'comments': (lambda user: Comment.objects.all(), 'changed_at'),
+    'deleted': (lambda user: Tombstone.objects.all(), 'deleted_at'),
+}
+
+
+class CursorExpired(Exception):
+    """
+    The cursor is older than the kept tombstones, the client has to sync from scratch
+    """
+
+
+def encode_cursor(positions):
+    payload = {name: [moment.isoformat(), pk] for name, (moment, pk) in positions.items()}
+    payload['issued'] = timezone.now().isoformat()
+    return urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(encoded):
+    """
+    Stream positions of a cursor and the time it was issued
+    """
+    if not encoded:
+        return {}, None
+    try:
+        payload = json.loads(urlsafe_b64decode(encoded.encode()).decode())
+        positions = {name: (parse_datetime(payload[name][0]), int(payload[name][1])) for name in payload if name in STREAMS}
+        issued = parse_datetime(payload['issued'])
+    except (TypeError, ValueError, KeyError, IndexError, AttributeError):
+        raise NotFound('Invalid cursor')
+    if issued is None or any(moment is None for moment, pk in positions.values()):
+        raise NotFound('Invalid cursor')
+    return positions, issued
+
+
+def settled_before():
+    """
+    Rows written in the last SYNC_SETTLE_SECONDS are held back: a transaction that started earlier may still
+    commit rows with older timestamps, which a cursor already past them would never see.
+    """
+    settle = timedelta(seconds=getattr(settings, 'SYNC_SETTLE_SECONDS', 2))
+    # statement_timestamp() is stable, unlike clock_timestamp(), so the bound can be an index condition
+    now = Func(function='statement_timestamp', template='statement_timestamp()', output_field=DateTimeField())
+    return ExpressionWrapper(now - Value(settle), output_field=DateTimeField())
+
+
+def changes_since(cursor, limit, user=None):
+    """
+    Rows of every stream after the cursor positions, up to `limit` per stream, ordered by (time, id).
+    Returns the rows per stream, the next cursor and whether a stream has more rows.
+    """
+    positions, issued = decode_cursor(cursor)
+    # Tombstones deleted since the cursor was issued may have been pruned
+    if issued and issued < timezone.now() - timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_DAYS', 30)):
+        raise CursorExpired()
+
+    bound = settled_before()
+    rows, has_more = {}, False
+    for name, (queryset, column) in STREAMS.items():
+        queryset = queryset(user).filter(**{f'{column}__lt': bound}).order_by(column, 'id')
+        if name in positions:
+            moment, pk = positions[name]
+            queryset = queryset.filter(Q(**{f'{column}__gt': moment}) | Q(**{column: moment, 'id__gt': pk}))
+        page = list(queryset[:limit + 1])
+        has_more = has_more or len(page) > limit
+        rows[name] = page[:limit]
+        if rows[name]:
+            last = rows[name][-1]
+            positions[name] = (getattr(last, column), last.pk)
+    return rows, encode_cursor(positions), has_more
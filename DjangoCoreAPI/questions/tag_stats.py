@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from questions.models import Question, Tag, TagPair, TagStat
+
+qn = connection.ops.quote_name
+THROUGH = qn(Question.tags.through._meta.db_table)
+TAG = qn(Tag._meta.db_table)
+STAT = qn(TagStat._meta.db_table)
+PAIR = qn(TagPair._meta.db_table)
+
+
+def related_limit():
+    return getattr(settings, 'TAG_STATS_RELATED', 5)
+
+
+def apply_tag_change(question_ids, tag_ids, delta, activity=None):
+    """
+    Move the aggregates for the through rows of `question_ids` (None: any question) with a tag in
+    `tag_ids` (None: any tag) by `delta`: +1 after they are added, -1 before they are removed.
+    The rows are read from the through table, so ids that are not attached are ignored.
+    """
+    questions = list(question_ids) if question_ids is not None else None
+    tags = list(tag_ids) if tag_ids is not None else None
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {STAT} (tag_id, question_count, last_activity, related)
+            SELECT tag_id, COUNT(*) * %s, %s::timestamptz, '[]'::jsonb
+            FROM {THROUGH}
+            WHERE (%s::bigint[] IS NULL OR question_id = ANY(%s)) AND (%s::bigint[] IS NULL OR tag_id = ANY(%s))
+            GROUP BY tag_id
+            ON CONFLICT (tag_id) DO UPDATE
+                SET question_count = {STAT}.question_count + EXCLUDED.question_count,
+                    last_activity = GREATEST({STAT}.last_activity, EXCLUDED.last_activity)
+        """, [delta, activity, questions, questions, tags, tags])
+
+        # Every ordered pair of tags on the same question where at least one side changed
+        cursor.execute(f"""
+            INSERT INTO {PAIR} (tag_id, other_id, count)
+            SELECT a.tag_id, b.tag_id, COUNT(*) * %s
+            FROM {THROUGH} a JOIN {THROUGH} b ON a.question_id = b.question_id AND a.tag_id <> b.tag_id
+            WHERE (%s::bigint[] IS NULL OR a.question_id = ANY(%s))
+                AND (%s::bigint[] IS NULL OR a.tag_id = ANY(%s) OR b.tag_id = ANY(%s))
+            GROUP BY a.tag_id, b.tag_id
+            ON CONFLICT (tag_id, other_id) DO UPDATE SET count = {PAIR}.count + EXCLUDED.count
+            RETURNING tag_id
+        """, [delta, questions, questions, tags, tags, tags])
+        affected = list({row[0] for row in cursor.fetchall()})
+        if affected:
+            cursor.execute(f"DELETE FROM {PAIR} WHERE tag_id = ANY(%s) AND count <= 0", [affected])
+            refresh_related(cursor, affected)
+
+
+def refresh_related(cursor, tag_ids=None):
+    """
+    Copy the top co-occurring tags from the pair table into TagStat.related
+    """
+    cursor.execute(f"""
+        UPDATE {STAT} s SET related = COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('name', top.name, 'count', top.count) ORDER BY top.count DESC, top.name)
+            FROM (
+                SELECT t.name, p.count
+                FROM {PAIR} p JOIN {TAG} t ON t.id = p.other_id
+                WHERE p.tag_id = s.tag_id
+                ORDER BY p.count DESC, t.name
+                LIMIT %s
+            ) top
+        ), '[]'::jsonb)
+        WHERE %s::bigint[] IS NULL OR s.tag_id = ANY(%s)
+    """, [related_limit(), tag_ids, tag_ids])
+
+
+def touch_question_tags(question_id, when=None):
+    """
+    Record activity on every tag of an edited question
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            UPDATE {STAT} SET last_activity = GREATEST(last_activity, %s)
+            WHERE tag_id IN (SELECT tag_id FROM {THROUGH} WHERE question_id = %s)
+        """, [when or timezone.now(), question_id])
+
+
+def rebuild_tag_stats():
+    """
+    Recompute every aggregate from the through table. Returns the number of tags.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {PAIR}")
+        cursor.execute(f"DELETE FROM {STAT}")
+        cursor.execute(f"""
+            INSERT INTO {STAT} (tag_id, question_count, last_activity, related)
+            SELECT t.id, COUNT(q.id), MAX(q.updated_at), '[]'::jsonb
+            FROM {TAG} t
+            LEFT JOIN {THROUGH} qt ON qt.tag_id = t.id
+            LEFT JOIN {qn(Question._meta.db_table)} q ON q.id = qt.question_id
+            GROUP BY t.id
+        """)
+        count = cursor.rowcount
+        cursor.execute(f"""
+            INSERT INTO {PAIR} (tag_id, other_id, count)
+            SELECT a.tag_id, b.tag_id, COUNT(*)
+            FROM {THROUGH} a JOIN {THROUGH} b ON a.question_id = b.question_id AND a.tag_id <> b.tag_id
+            GROUP BY a.tag_id, b.tag_id
+        """)
+        refresh_related(cursor)
+    return count
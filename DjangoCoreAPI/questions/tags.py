@@ -0,0 +1,106 @@
+import threading
+import time
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.dispatch import Signal
+from questions.models import Tag
+
+# Sent with the Tag instances inserted by bulk_create, which does not send post_save
+tags_created = Signal()
+
+
+class TagRegistry:
+    """
+    Process-local tag name -> id map, so question writes resolve known tags without a query.
+    Unknown names are looked up together and the missing ones created with one bulk insert.
+    Tag signals clear it, and it is dropped after TAG_REGISTRY_SECONDS so other processes' deletions are seen.
+    Until then an id may belong to a tag deleted elsewhere, write_tags() forgets such names and resolves them again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.ids = {}
+            self.loaded_at = time.monotonic()
+
+    def resolve(self, names):
+        """
+        Ids of the tags with these names, created when missing
+        """
+        names = set(names)
+        max_age = getattr(settings, 'TAG_REGISTRY_SECONDS', 300)
+        if time.monotonic() - self.loaded_at > max_age:
+            self.clear()
+        with self.lock:
+            ids = {name: self.ids[name] for name in names if name in self.ids}
+        missing = names - ids.keys()
+        if not missing:
+            return ids
+
+        found = dict(Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+        created = {}
+        if len(found) < len(missing):
+            # Concurrent writers may insert the same names, the conflicts are read back below
+            new_tags = [Tag(name=name) for name in missing - found.keys()]
+            Tag.objects.bulk_create(new_tags, ignore_conflicts=True)
+            created = dict(Tag.objects.filter(name__in=missing - found.keys()).values_list('name', 'id'))
+
+        with self.lock:
+            self.ids.update(found)
+        if created:
+            # Tags inserted by this transaction are only safe to share once it commits
+            transaction.on_commit(lambda: self.remember(created))
+        return {**ids, **found, **created}
+
+    def forget(self, names):
+        with self.lock:
+            for name in names:
+                self.ids.pop(name, None)
+
+    def remember(self, ids):
+        with self.lock:
+            self.ids.update(ids)
+        tags_created.send(sender=Tag, tags=[Tag(id=pk, name=name) for name, pk in ids.items()])
+
+
+tag_registry = TagRegistry()
+
+
+def write_tags(names, write):
+    """
+    Resolve the tag names and call write(ids by name) in a savepoint that checks foreign keys immediately.
+    The constraints are deferred to the commit otherwise, so the id of a tag deleted by another process
+    would fail the whole transaction there. Instead the names are forgotten and the write is repeated once.
+    """
+    names = set(names)
+    for attempt in range(2):
+        ids = tag_registry.resolve(names)
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+                write(ids)
+                cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+            return ids
+        except IntegrityError:
+            if attempt:
+                raise
+            tag_registry.forget(names)
+
+
+def set_question_tags(question, names):
+    """
+    Give the question exactly these tags, writing only the difference to the through table.
+    add() and remove() are used so m2m_changed is still sent.
+    """
+    def write(ids):
+        ids = set(ids.values())
+        current = {tag.pk for tag in question.tags.all()}
+        if current - ids:
+            question.tags.remove(*(current - ids))
+        if ids - current:
+            question.tags.add(*(ids - current))
+
+    write_tags(names, write)
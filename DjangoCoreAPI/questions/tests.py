@@ -1,11 +1,34 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from .models import Question,Comment,Tag
+from django.core.management import call_command, CommandError
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test.utils import CaptureQueriesContext
+from .models import Question,Comment,Tag,Reaction
+from .suggestions import suggestion_index
+from .tags import tag_registry
+from io import StringIO
+import threading
+from DjangoCoreAPI.response_cache import bump, cache_response, get_cache, get_or_set, get_versions
+from rest_framework.response import Response
+from DjangoCoreAPI.db_routing import STICKY_COOKIE, ReplicaRouter, ReplicaRoutingMiddleware, replica_health
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.db import OperationalError
+from DjangoCoreAPI.db_backend.base import DatabaseWrapper
+from DjangoCoreAPI.db_backend.metrics import connection_metrics
+from DjangoCoreAPI.db_backend.pool import pools
 import time
 import random
+import gzip
+import json
+from base64 import urlsafe_b64encode
+import os
+import tempfile
+import csv
 
 CustomUser = get_user_model()
 question_number = 100
@@ -96,7 +119,7 @@ class UserAPITestCase(TestCase):
         """
         self.client.force_authenticate(user=self.user)
         response = self.client.get(reverse('own_questions'))
-        for x in response.data:
+        for x in response.data["results"]:
             self.assertEqual(x["user"], self.user.id)
     
     
@@ -105,9 +128,9 @@ class UserAPITestCase(TestCase):
         Test for searching by string in questions
         """
         search_string = "test"
-        response = self.client.get(reverse("search"), {'search':search_string})
+        response = self.client.get(reverse("search"), {'search':search_string, 'fields': 'user,title,body'})
 
-        for rd in response.data:
+        for rd in response.data["results"]:
             is_found = False
             user_response = self.client.get(reverse('get-user-by-id', kwargs={'pk': rd["user"]}))
             if (
@@ -126,13 +149,349 @@ class UserAPITestCase(TestCase):
         search_tag = "tag1"
         response_tag = self.client.get(reverse("search"), {'tags__name':search_tag})
         
-        for rd in response_tag.data:
+        for rd in response_tag.data["results"]:
             is_found = False
             if (search_tag in rd["tag_names"]):
                 is_found = True
             self.assertTrue(is_found,"Question was returned even though the tag was not in the question's tag.")
             
     
+    def test_paginate_questions(self):
+        """
+        Test for walking the question list page by page with cursors
+        """
+        for i in range(4):
+            Question.objects.create(title=f"paginated question {i}", body="body", user=self.user)
+        
+        response = self.client.get(reverse("all_question"), {"page_size": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        self.assertIsNone(response.data["previous"], "First page should not have a previous page.")
+        
+        seen = [q["id"] for q in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            self.assertLessEqual(len(response.data["results"]), 2, "Page size is not respected.")
+            seen.extend(q["id"] for q in response.data["results"])
+        
+        expected = list(Question.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        self.assertEqual(seen, expected, "Pages do not cover every question exactly once in order.")
+        
+        response = self.client.get(response.data["previous"])
+        self.assertEqual([q["id"] for q in response.data["results"]], expected[2:4], "Previous page is not returned.")
+        
+        response = self.client.get(reverse("all_question"), {"cursor": "invalid"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, 'Expected status code not returned')
+        
+        # Well-formed cursors whose values do not fit the ordering columns
+        for values in (["x", "y"], ["2024-01-01T00:00:00", "abc"], [{"a": 1}, 2]):
+            cursor = urlsafe_b64encode(json.dumps({"v": values}).encode()).decode()
+            response = self.client.get(reverse("all_question"), {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, 'Expected status code not returned')
+    
+    
+    def test_full_text_search(self):
+        """
+        Test for ranked, phrase and prefix search
+        """
+        in_title = Question.objects.create(title="Hydraulic press leaking oil", body="Seal replaced", user=self.user)
+        in_body = Question.objects.create(title="Maintenance", body="The hydraulic pump is noisy", user=self.user)
+        Question.objects.create(title="Conveyor belt", body="Belt slips", user=self.user)
+        
+        response = self.client.get(reverse("search"), {"search": "hydraulic"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        self.assertEqual([q["id"] for q in response.data["results"]], [in_title.id, in_body.id], "Title match should rank first.")
+        
+        response = self.client.get(reverse("search"), {"search": '"pump is noisy"'})
+        self.assertEqual([q["id"] for q in response.data["results"]], [in_body.id], "Phrase search does not match.")
+        
+        response = self.client.get(reverse("search"), {"search": "hydrau*"})
+        self.assertEqual(len(response.data["results"]), 2, "Prefix search does not match.")
+        
+        response = self.client.get(reverse("search"), {"search": "hydraulic", "page_size": 1})
+        response = self.client.get(response.data["next"])
+        self.assertEqual([q["id"] for q in response.data["results"]], [in_body.id], "Ranked results are not paginated.")
+        
+        # Searches without any term are not ranked and list every question
+        for search in ("*", "!*"):
+            response = self.client.get(reverse("search"), {"search": search})
+            self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+            self.assertEqual(len(response.data["results"]), min(Question.objects.count(), 20), "Search without terms should not filter.")
+        
+        self.user.first_name = "Kemal"
+        self.user.save()
+        response = self.client.get(reverse("search"), {"search": "kemal"})
+        self.assertEqual(len(response.data["results"]), Question.objects.filter(user=self.user).count(), "Author name is not searchable.")
+    
+    
+    def test_filter_by_several_tags(self):
+        """
+        Test for ?tags= with all and any modes, combined with text search and pagination
+        """
+        pump, seal, motor = (Tag.objects.create(name=name) for name in ("pump", "seal", "motor"))
+        both = Question.objects.create(title="Pump seal leaks", body="Oil everywhere", user=self.user)
+        both.tags.add(pump, seal)
+        only_pump = Question.objects.create(title="Pump noise", body="Oil level fine", user=self.user)
+        only_pump.tags.add(pump)
+        only_motor = Question.objects.create(title="Motor hot", body="Oil smell", user=self.user)
+        only_motor.tags.add(motor)
+        
+        response = self.client.get(reverse("search"), {"tags": "pump,seal"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        self.assertEqual([q["id"] for q in response.data["results"]], [both.id], "All mode does not require every tag.")
+        
+        response = self.client.get(reverse("search"), {"tags": "seal,motor,pump", "tag_mode": "any"})
+        self.assertEqual([q["id"] for q in response.data["results"]], [only_motor.id, only_pump.id, both.id], "Any mode returns wrong or duplicated questions.")
+        
+        response = self.client.get(reverse("search"), {"tags": "pump, motor", "tag_mode": "any", "search": "noise"})
+        self.assertEqual([q["id"] for q in response.data["results"]], [only_pump.id], "Tags do not combine with text search.")
+        
+        response = self.client.get(reverse("search"), {"tags": "pump,motor", "tag_mode": "any", "page_size": 1, "sort": "newest"})
+        response = self.client.get(response.data["next"])
+        self.assertEqual([q["id"] for q in response.data["results"]], [only_pump.id], "Tag filter is not paginated.")
+    
+    
+    def test_question_summaries(self):
+        """
+        Test for the compact list representation
+        """
+        response = self.client.get(reverse("all_question"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        item = next(q for q in response.data["results"] if q["id"] == self.question.id)
+        self.assertEqual(item["excerpt"], self.question.body[:200], "Excerpt does not match.")
+        self.assertEqual(item["author"], "Test User", "Author does not match.")
+        self.assertEqual(item["comment_count"], 1, "Comment count does not match.")
+        self.assertNotIn("body", item, "Body is sent in the list.")
+        self.assertNotIn("comments", item, "Comments are sent without expand.")
+        
+        response = self.client.get(reverse("all_question"), {"fields": "id,body", "expand": "comments"})
+        item = next(q for q in response.data["results"] if q["id"] == self.question.id)
+        self.assertEqual(set(item), {"id", "body", "comments"}, "Requested fields do not match.")
+        self.assertEqual(item["comments"][0]["body"], self.comment.body, "Expanded comments do not match.")
+    
+    
+    def test_changes_feed(self):
+        """
+        Test for the delta sync feed: changed rows and deletions after the cursor only
+        """
+        with self.settings(SYNC_SETTLE_SECONDS=0):
+            response = self.client.get(reverse("changes"))
+            self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+            self.assertIn(self.question.id, [q["id"] for q in response.data["questions"]], "Initial sync misses questions.")
+            cursor = response.data["cursor"]
+            
+            response = self.client.get(reverse("changes"), {"cursor": cursor})
+            self.assertEqual((response.data["questions"], response.data["comments"], response.data["deleted"]), ([], [], []), "Unchanged rows are sent again.")
+            
+            other = Question.objects.create(title="Other", body="body", user=self.user)
+            other_id = other.id
+            comments = [Comment.objects.create(user=self.user, question=self.question, body=f"New comment {i}") for i in range(2)]
+            self.client.force_authenticate(user=self.user)
+            self.client.post(reverse("like_question", kwargs={"pk": self.question.id}))
+            other.delete()
+            
+            response = self.client.get(reverse("changes"), {"cursor": cursor})
+            self.assertEqual([q["id"] for q in response.data["questions"]], [self.question.id], "Liked question is not sent.")
+            self.assertEqual(response.data["questions"][0]["like_count"], 1, "Counter change is not sent.")
+            self.assertEqual([c["id"] for c in response.data["comments"]], [c.id for c in comments], "New comments are not sent.")
+            self.assertEqual([(d["kind"], d["object_id"]) for d in response.data["deleted"]], [("question", other_id)], "Deletion is not sent.")
+            
+            response = self.client.get(reverse("changes"), {"cursor": cursor, "limit": 1})
+            self.assertTrue(response.data["has_more"], "More changes are not reported.")
+            response = self.client.get(reverse("changes"), {"cursor": response.data["cursor"], "limit": 1})
+            self.assertEqual([c["id"] for c in response.data["comments"]], [comments[1].id], "Next page of changes does not continue.")
+        
+        with self.settings(SYNC_TOMBSTONE_DAYS=0):
+            response = self.client.get(reverse("changes"), {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_410_GONE, 'Expected status code not returned')
+    
+    
+    def test_fuzzy_search(self):
+        """
+        Test for the trigram fallback when full text search finds too few questions
+        """
+        press = Question.objects.create(title="Hydraulic press leaking oil", body="Seal replaced", user=self.user)
+        belt = Question.objects.create(title="Belt slips", body="Since monday", user=self.user)
+        belt.tags.add(Tag.objects.create(name="conveyor"))
+        
+        response = self.client.get(reverse("search"), {"search": "hydrolic"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        self.assertEqual([q["id"] for q in response.data["results"]], [press.id], "Misspelled title word does not match.")
+        
+        response = self.client.get(reverse("search"), {"search": "conveyer"})
+        self.assertEqual([q["id"] for q in response.data["results"]], [belt.id], "Misspelled tag name does not match.")
+        
+        response = self.client.get(reverse("search"), {"search": "xylophone"})
+        self.assertEqual(response.data["results"], [], "Unrelated words should not match.")
+        
+        with self.settings(SEARCH_FUZZY_MIN_HITS=3):
+            response = self.client.get(reverse("search"), {"search": "hydraulic leak"})
+            self.assertEqual([q["id"] for q in response.data["results"]], [press.id], "Fallback does not apply below the minimum.")
+            
+            # Full text hits are kept, and ranked first, when the fallback adds similar titles
+            in_body = Question.objects.create(title="Pump noise", body="The hydraulik fluid is low", user=self.user)
+            response = self.client.get(reverse("search"), {"search": "hydraulik"})
+            self.assertEqual([q["id"] for q in response.data["results"]], [in_body.id, press.id], "Full text hits are dropped by the fallback.")
+    
+    
+    def test_export(self):
+        """
+        Test for the streamed NDJSON export, the endpoint and the command
+        """
+        self.client.force_authenticate(user=self.user)
+        self.client.post(reverse("like_question", kwargs={"pk": self.question.id}))
+        self.client.post(reverse("favorite_question", kwargs={"pk": self.question.id}))
+        response = self.client.get(reverse("export"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN, 'Expected status code not returned')
+
+        admin = CustomUser.objects.create_user(email="admin@example.com", password="Password123!", is_staff=True)
+        self.client.force_authenticate(user=admin)
+        with self.settings(EXPORT_CHUNK_SIZE=1):
+            response = self.client.get(reverse("export"))
+            self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+            records = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(
+            [record["type"] for record in records], ["question", "comment", "reaction", "favorite"], "Exported records do not match.",
+        )
+        self.assertEqual(records[0]["tag_names"], ["tag1", "tag2"], "Exported tags do not match.")
+        
+        # Behind a transaction pooling proxy the rows are read in keyset batches
+        connection.settings_dict["DISABLE_SERVER_SIDE_CURSORS"] = True
+        try:
+            with self.settings(EXPORT_CHUNK_SIZE=1):
+                batched = [json.loads(line) for line in b"".join(self.client.get(reverse("export")).streaming_content).splitlines()]
+        finally:
+            connection.settings_dict["DISABLE_SERVER_SIDE_CURSORS"] = False
+        self.assertEqual(batched, records, "Batched export does not match.")
+
+        response = self.client.get(reverse("export"), {"gzip": "1"})
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)).count(b"\n"), 4, "Compressed export does not match.")
+        response = self.client.get(reverse("export"), {"updated_since": "2999-01-01T00:00:00Z"})
+        self.assertEqual(b"".join(response.streaming_content), b"", "Unchanged rows are exported.")
+        for updated_since in ("yesterday", "2024-13-01T00:00:00"):
+            response = self.client.get(reverse("export"), {"updated_since": updated_since})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, 'Expected status code not returned')
+        with self.assertRaises(CommandError):
+            call_command("export_questions", updated_since="2024-13-01T00:00:00", stdout=StringIO())
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "export.ndjson.gz")
+            call_command("export_questions", output=path, gzip=True, stdout=StringIO())
+            with gzip.open(path) as file:
+                self.assertEqual(len(file.readlines()), 4, "Exported file does not match.")
+
+
+    def test_import_questions(self):
+        """
+        Test for the batched legacy import and resuming it from its checkpoint
+        """
+        records = [
+            {"type": "question", "id": 7, "user_email": "legacy@example.com", "title": "Legacy pump question",
+             "body": "Old body", "tag_names": ["legacy", "tag1"], "created_at": "2015-03-01T10:00:00Z"},
+            {"type": "comment", "id": 1, "question_id": 7, "user_email": self.user.email, "body": "Legacy answer"},
+            {"type": "comment", "id": 2, "question_id": 99, "user_email": self.user.email, "body": "Orphan"},
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "legacy.jsonl")
+            with open(path, "w") as file:
+                file.writelines(json.dumps(record) + "\n" for record in records)
+            call_command("import_questions", path, batch_size=2, stdout=StringIO())
+
+            question = Question.objects.get(title="Legacy pump question")
+            self.assertEqual(question.created_at.year, 2015, "Legacy timestamp is not kept.")
+            self.assertFalse(question.user.is_active, "Unknown authors must be created inactive.")
+            self.assertEqual(sorted(question.tags.values_list("name", flat=True)), ["legacy", "tag1"], "Tags do not match.")
+            self.assertEqual(list(question.comments.values_list("body", flat=True)), ["Legacy answer"], "Comments do not match.")
+            response = self.client.get(reverse("search"), {"search": "pump"})
+            self.assertIn(question.id, [q["id"] for q in response.data["results"]], "Imported question is not searchable.")
+
+            # A second run only loads what was appended since the checkpoint
+            with open(path, "a") as file:
+                file.write(json.dumps({"type": "comment", "id": 3, "question_id": 7, "user_email": self.user.email, "body": "Later answer"}) + "\n")
+            output = StringIO()
+            call_command("import_questions", path, stdout=output)
+            self.assertIn("Resuming", output.getvalue(), "Checkpoint is not used.")
+            self.assertEqual(question.comments.count(), 2, "Resumed import does not match.")
+            question.refresh_from_db()
+            self.assertEqual((question.comment_count, question.trending_score), (2, 0), "Imported comments count as trending.")
+            self.assertEqual(Question.objects.filter(title="Legacy pump question").count(), 1, "Rows imported twice.")
+            
+            # A restart reads the whole file again without loading anything twice, malformed records are skipped
+            with open(path, "a") as file:
+                file.write(json.dumps({"type": "question", "id": 8, "title": "No author", "body": "b"}) + "\n")
+                file.write(json.dumps({"type": "question", "id": 9, "user_email": self.user.email, "title": "Bad date", "body": "b", "created_at": "2015-13-45T00:00:00"}) + "\n")
+                file.write("{not json\n")
+                file.write(json.dumps({"type": "question", "id": 10, "user_email": self.user.email, "title": "Restarted question", "body": "b"}) + "\n")
+            output = StringIO()
+            call_command("import_questions", path, restart=True, batch_size=3, stdout=output)
+            self.assertIn("1 imported, 7 skipped", output.getvalue(), "Restarted import does not match.")
+            self.assertEqual(question.comments.count(), 2, "Comments imported twice.")
+            self.assertEqual(Question.objects.filter(title__in=["Legacy pump question", "Restarted question"]).count(), 2, "Restarted import does not match.")
+            self.assertFalse(Question.objects.filter(title__in=["No author", "Bad date"]).exists(), "Malformed records are imported.")
+
+            path = os.path.join(directory, "legacy.csv")
+            with open(path, "w", newline="") as file:
+                writer = csv.DictWriter(file, ["type", "id", "question_id", "user_email", "title", "body", "tag_names", "created_at"])
+                writer.writeheader()
+                writer.writerow({"type": "question", "id": "c1", "user_email": self.user.email, "title": "CSV question", "body": "b", "tag_names": "a|b"})
+            call_command("import_questions", path, stdout=StringIO())
+            self.assertEqual(Question.objects.get(title="CSV question").tags.count(), 2, "CSV tags do not match.")
+
+
+    def test_suggestions(self):
+        """
+        Test for autocomplete from the in-memory prefix index
+        """
+        suggestion_index.reset()
+        with self.captureOnCommitCallbacks(execute=True):
+            press = Question.objects.create(title="Hydraulic press leaking oil", body="Seal replaced", user=self.user)
+            Tag.objects.create(name="hydraulics")
+        
+        # The first lookup starts building the index in the background instead of waiting for it
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("suggestions"), {"q": "hydr"})
+        self.assertEqual(response.data, {"tags": [], "questions": []}, "Unbuilt index suggests something.")
+        suggestion_index.build_thread.join()
+        suggestion_index.build() # The thread's connection cannot see the rows of this test's transaction
+        
+        response = self.client.get(reverse("suggestions"), {"q": "hydr"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        self.assertEqual(response.data["tags"], ["hydraulics"], "Tag is not suggested.")
+        self.assertEqual(response.data["questions"], [{"id": press.id, "title": press.title}], "Title is not suggested.")
+        
+        # Signals keep the built index current once the writes commit, lookups do not query the database
+        with self.captureOnCommitCallbacks(execute=True):
+            press.title = "Pneumatic press leaking oil"
+            press.save()
+            oven = Question.objects.create(title="Oven door", body="Hinge", user=self.user)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("suggestions"), {"q": "LEAK"})
+        self.assertEqual(response.data["questions"], [{"id": press.id, "title": press.title}], "Word in a title is not suggested.")
+        self.assertEqual(self.client.get(reverse("suggestions"), {"q": "hydraulic p"}).data["questions"], [], "Renamed title is still suggested.")
+        self.assertEqual(self.client.get(reverse("suggestions"), {"q": "press  leak"}).data["questions"], [{"id": press.id, "title": press.title}], "Words in a title are not suggested.")
+        self.assertEqual(self.client.get(reverse("suggestions"), {"q": "ress"}).data["questions"], [], "Middle of a word is suggested.")
+        self.assertEqual(self.client.get(reverse("suggestions"), {"q": "ov"}).data["questions"][0]["id"], oven.id, "New title is not suggested.")
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            oven.delete()
+        self.assertEqual(self.client.get(reverse("suggestions"), {"q": "ov"}).data["questions"], [], "Deleted title is still suggested.")
+        
+        # Rolled back titles are never suggested
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Question.objects.create(title="Phantom valve", body="Rolled back", user=self.user)
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(self.client.get(reverse("suggestions"), {"q": "phantom"}).data["questions"], [], "Rolled back title is suggested.")
+        
+        # An expired index is rebuilt in the background, lookups keep serving the old one without querying
+        suggestion_index.built_at -= 3600
+        with suggestion_index.build_lock, self.assertNumQueries(0):
+            response = self.client.get(reverse("suggestions"), {"q": "leak"})
+        self.assertEqual(response.data["questions"], [{"id": press.id, "title": press.title}], "Old index is not served during a rebuild.")
+    
+    
     def test_edit_question(self):
         """
         Test for editing questions
@@ -150,6 +509,81 @@ class UserAPITestCase(TestCase):
         self.assertEqual(set(response.data["tag_names"]), set(update_data["tags"]), "Updated tags does not appear")
     
     
+    def test_edit_question_tags_diff(self):
+        """
+        Test for tag writes: names are resolved in bulk and only the changed tags are written
+        """
+        Tag.objects.create(name="pump")
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse("create_question"), {"title": "Pump", "body": "Noisy", "tags": ["pump", "seal", "seal"]})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, 'Expected status code not returned')
+        question = Question.objects.get(pk=response.data["id"])
+        self.assertEqual(sorted(question.tags.values_list("name", flat=True)), ["pump", "seal"], "Tags are not attached.")
+        
+        url = reverse("edit-question", kwargs={"pk": question.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, {"tags": ["pump", "seal"]})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        writes = [q["sql"] for q in queries if q["sql"].startswith(('INSERT INTO "questions_question_tags"', 'DELETE FROM "questions_question_tags"'))]
+        self.assertEqual(writes, [], "Unchanged tags are rewritten.")
+        
+        response = self.client.patch(url, {"tags": ["seal", "motor"]})
+        self.assertEqual(sorted(response.data["tag_names"]), ["motor", "seal"], "Changed tags do not appear.")
+        self.assertEqual(Tag.objects.filter(name__in=["pump", "seal", "motor"]).count(), 3, "Tags are duplicated.")
+    
+    
+    def test_stale_tag_registry(self):
+        """
+        Test for question writes with the id of a tag deleted by another process
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            stale = tag_registry.resolve(["ghost", "shade"])
+        with connection.cursor() as cursor: # No signal reaches this process
+            cursor.execute('DELETE FROM questions_tag WHERE id IN %s', [tuple(stale.values())])
+        
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse("create_question"), {"title": "Ghost", "body": "b", "tags": ["ghost"]})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, 'Expected status code not returned')
+        question = Question.objects.get(pk=response.data["id"])
+        self.assertEqual(list(question.tags.values_list("name", flat=True)), ["ghost"], "Deleted tag is not created again.")
+        self.assertNotEqual(question.tags.get().pk, stale["ghost"], "Stale tag id is used.")
+        
+        response = self.client.patch(reverse("edit-question", kwargs={"pk": question.id}), {"tags": ["ghost", "shade"]})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        self.assertEqual(sorted(response.data["tag_names"]), ["ghost", "shade"], "Deleted tag is not created again.")
+    
+    
+    def test_tag_stats(self):
+        """
+        Test for the incrementally maintained tag statistics and their rebuild
+        """
+        pump, seal, motor = (Tag.objects.create(name=name) for name in ("pump", "seal", "motor"))
+        first = Question.objects.create(title="Pump seal leaks", body="Oil", user=self.user)
+        first.tags.add(pump, seal)
+        second = Question.objects.create(title="Pump motor hot", body="Smell", user=self.user)
+        second.tags.add(pump, motor)
+        third = Question.objects.create(title="Seal and pump", body="Again", user=self.user)
+        third.tags.add(pump, seal)
+        third.tags.remove(pump)
+        second.tags.set([pump, seal])
+        first.delete()
+        
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("tag_stats"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        stats = {stat["name"]: stat for stat in response.data}
+        self.assertEqual(response.data[0]["name"], "seal", "Tags are not ordered by question count.")
+        self.assertEqual((stats["seal"]["question_count"], stats["seal"]["related"]), (2, [{"name": "pump", "count": 1}]), "Seal statistics do not match.")
+        self.assertEqual((stats["pump"]["question_count"], stats["pump"]["related"]), (1, [{"name": "seal", "count": 1}]), "Pump statistics do not match.")
+        self.assertNotIn("motor", stats, "Unused tag is listed.")
+        self.assertIsNotNone(stats["seal"]["last_activity"], "Last activity is not recorded.")
+        
+        call_command("rebuild_tag_stats", stdout=StringIO())
+        rebuilt = self.client.get(reverse("tag_stats")).data
+        summary = lambda data: [(stat["name"], stat["question_count"], stat["related"]) for stat in data]
+        self.assertEqual(summary(rebuilt), summary(response.data), "Rebuilt tag statistics differ.")
+    
+    
     def test_edit_comment(self):
         """
         Test for editing comments
@@ -171,6 +605,39 @@ class UserAPITestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
         self.assertEqual(response.data["id"], self.question.id, "Question's ID does not match.")
 
+
+    def test_question_comments(self):
+        """
+        Test for paginated comments: the detail embeds the first page, the comments endpoint serves the rest
+        """
+        for i in range(4):
+            Comment.objects.create(user=self.user, question=self.question, body=f"answer {i}")
+        liked = Comment.objects.filter(body="answer 1").get()
+        self.client.force_authenticate(user=self.user)
+        self.client.post(reverse("like_comment", kwargs={"pk": liked.id}))
+
+        with self.settings(COMMENTS_PAGE_SIZE=2):
+            response = self.client.get(reverse("question", kwargs={"pk": self.question.id}))
+            self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+            self.assertEqual(response.data["comment_count"], 5, "Comment count does not match.")
+            self.assertEqual([c["body"] for c in response.data["comments"]], ["answer 3", "answer 2"], "First page does not match.")
+
+            bodies, url = [], response.data["comments_next"]
+            while url:
+                page = self.client.get(url)
+                self.assertEqual(page.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+                bodies += [c["body"] for c in page.data["results"]]
+                url = page.data["next"]
+            self.assertEqual(bodies, ["answer 1", "answer 0", "test comment body"], "Following pages do not match.")
+
+        url = reverse("question_comments", kwargs={"pk": self.question.id})
+        response = self.client.get(url, {"sort": "most_liked", "page_size": 1})
+        self.assertEqual(response.data["results"][0]["id"], liked.id, "Most liked comment is not first.")
+        self.assertIsNotNone(response.data["next"], "Next page link is missing.")
+
+        response = self.client.get(reverse("question_comments", kwargs={"pk": 0}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, 'Expected status code not returned')
+
     
     def test_like_question(self):
         """
@@ -254,6 +721,198 @@ class UserAPITestCase(TestCase):
         self.assertEqual(response_question.data["comments"][0]["dislike_count"], 0, "Comment is not undisliked successfully.")
 
     
+    def test_switch_reaction(self):
+        """
+        Test for switching a like to a dislike, a user keeps a single reaction per target
+        """
+        self.client.force_authenticate(user=self.user)
+        self.client.post(reverse("like_question", kwargs={"pk":self.question.id}))
+        response = self.client.post(reverse("dislike_question", kwargs={"pk":self.question.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        
+        self.question.refresh_from_db()
+        self.assertEqual((self.question.like_count, self.question.dislike_count), (0, 1), "Reaction is not switched.")
+        self.assertEqual(Reaction.objects.get(user=self.user, question=self.question).kind, Reaction.DISLIKE)
+        
+        response = self.client.post(reverse("like_comment", kwargs={"pk":0}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, 'Expected status code not returned')
+    
+    
+    def test_reaction_cost_is_constant(self):
+        """
+        Test for toggling a reaction with the same queries no matter how popular the question is
+        """
+        popular = Question.objects.create(title="popular question", body="body", user=self.user)
+        fans = CustomUser.objects.bulk_create([CustomUser(email=f"fan{i}@example.com") for i in range(20)])
+        Reaction.objects.bulk_create([Reaction(user=fan, question=popular, kind=Reaction.LIKE) for fan in fans])
+        self.client.force_authenticate(user=self.user)
+        
+        for question in (self.question, popular):
+            with CaptureQueriesContext(connection) as like_queries:
+                self.client.post(reverse("like_question", kwargs={"pk":question.id}))
+            with CaptureQueriesContext(connection) as unlike_queries:
+                self.client.post(reverse("like_question", kwargs={"pk":question.id}))
+            # The user's advisory lock and a single statement in a savepoint
+            self.assertLessEqual(len(like_queries), 4, "Like should be a single statement in a savepoint.")
+            self.assertLessEqual(len(unlike_queries), 5, "Unlike should be one more statement than like.")
+    
+    
+    def test_bulk_reactions(self):
+        """
+        Test for replaying queued reactions in one request
+        """
+        other = Question.objects.create(title="other question", body="body", user=self.user)
+        operations = [
+            {"action": "like", "target": "question", "id": self.question.id},
+            {"action": "dislike", "target": "question", "id": self.question.id},
+            {"action": "like", "target": "question", "id": other.id},
+            {"action": "like", "target": "question", "id": other.id},
+            {"action": "dislike", "target": "comment", "id": self.comment.id},
+            {"action": "favorite", "target": "question", "id": other.id},
+            {"action": "favorite", "target": "comment", "id": self.comment.id},
+            {"action": "like", "target": "question", "id": other.id + 1000},
+        ]
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse("bulk_reactions"), {"operations": operations}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        
+        results = response.data["results"]
+        self.assertEqual([r["status"] for r in results], ["ok"] * 6 + ["invalid", "not_found"])
+        self.assertEqual([r["active"] for r in results[:6]], [True, True, True, False, True, True])
+        
+        self.question.refresh_from_db()
+        other.refresh_from_db()
+        self.comment.refresh_from_db()
+        self.assertEqual((self.question.like_count, self.question.dislike_count), (0, 1), "Question reactions do not match.")
+        self.assertEqual((other.like_count, other.dislike_count), (0, 0), "Liking twice should cancel out.")
+        self.assertEqual(self.comment.dislike_count, 1, "Comment reactions do not match.")
+        self.assertTrue(other.favorited_by.filter(pk=self.user.pk).exists(), "Question is not favorited.")
+        
+        # Replaying the batch starts from the stored state: like+dislike still ends disliked, single toggles flip back
+        self.client.post(reverse("bulk_reactions"), {"operations": operations}, format="json")
+        self.assertEqual(list(Reaction.objects.filter(user=self.user).values_list("question_id", "kind")), [(self.question.id, "dislike")])
+        self.assertFalse(other.favorited_by.filter(pk=self.user.pk).exists(), "Favorite is not toggled back.")
+    
+    
+    def test_reactions_lock_the_user(self):
+        """
+        Test for batches and toggles of the same user waiting for each other
+        """
+        Reaction.objects.toggle(self.user, Reaction.LIKE, question_id=self.question.id) # Holds the lock until the test ends
+        acquired = {}
+        
+        def try_lock(user_id):
+            from django.db import connection
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_try_advisory_xact_lock(%s, %s)", [Reaction.objects.LOCK_CLASS, user_id])
+                    acquired[user_id] = cursor.fetchone()[0]
+            finally:
+                connection.close()
+        
+        other = CustomUser.objects.create_user(email="other-locker@example.com", password="Password123!")
+        for user_id in (self.user.pk, other.pk):
+            thread = threading.Thread(target=try_lock, args=(user_id,))
+            thread.start()
+            thread.join()
+        self.assertFalse(acquired[self.user.pk], "A concurrent batch of the same user was not blocked.")
+        self.assertTrue(acquired[other.pk], "Other users should not wait for each other.")
+    
+    
+    def test_reconcile_reaction_counters(self):
+        """
+        Test for repairing reaction counters that drifted from the reactions
+        """
+        Reaction.objects.create(user=self.user, question=self.question, kind=Reaction.LIKE) # Bypasses the counters
+        self.comment.dislike_count = 5
+        self.comment.save()
+        
+        out = StringIO()
+        call_command("reconcile_reaction_counters", stdout=out)
+        self.question.refresh_from_db()
+        self.comment.refresh_from_db()
+        self.assertEqual(self.question.like_count, 1, "Question like counter is not repaired.")
+        self.assertEqual(self.comment.dislike_count, 0, "Comment dislike counter is not repaired.")
+        self.assertIn("Question: 1 drifted", out.getvalue())
+    
+    
+    def test_sort_questions_by_likes(self):
+        """
+        Test for sorting the question list by the stored like counter
+        """
+        liked_question = Question.objects.create(title="liked question", body="body", user=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.client.post(reverse("like_question", kwargs={"pk": liked_question.id}))
+        
+        response = self.client.get(reverse("all_question"), {"sort": "most_liked"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        self.assertEqual(response.data["results"][0]["id"], liked_question.id, "Most liked question is not first.")
+    
+    
+    def test_user_activity_counters(self):
+        """
+        Test for questions_asked and answers_given kept by counter updates and their reconciliation
+        """
+        self.client.force_authenticate(user=self.user)
+        self.client.post(reverse("create_question"), {"title": "Counted question", "body": "body", "tags": []})
+        self.client.post(reverse("create_comment"), {"question": self.question.id, "body": "Counted answer"})
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.questions_asked, self.user.answers_given), (2, 2), "Counters are not incremented.")
+
+        with self.assertNumQueries(2): # The ETag and the user row
+            response = self.client.get(reverse("get-user-by-id", kwargs={"pk": self.user.id}))
+        self.assertEqual(response.data["questions_asked"], 2, "Profile counter does not match.")
+
+        self.question.delete() # Its comments go with it
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.questions_asked, self.user.answers_given), (1, 0), "Counters are not decremented.")
+
+        CustomUser.objects.filter(pk=self.user.pk).update(questions_asked=10)
+        output = StringIO()
+        call_command("reconcile_user_counters", stdout=output)
+        self.assertIn("1 drifted", output.getvalue(), "Drifted user is not reported.")
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.questions_asked, 1, "Counter is not reconciled.")
+
+
+    def test_hot_and_trending_feeds(self):
+        """
+        Test for the precomputed hot and trending rankings and the trending decay
+        """
+        quiet = Question.objects.create(title="Quiet question", body="body", user=self.user)
+        busy = Question.objects.create(title="Busy question", body="body", user=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.client.post(reverse("like_question", kwargs={"pk": self.question.id}))
+        self.client.post(reverse("favorite_question", kwargs={"pk": self.question.id}))
+        for i in range(3):
+            Comment.objects.create(user=self.user, question=busy, body=f"reply {i}")
+        self.assertEqual(Question.objects.get(pk=busy.id).comment_count, 3, "Comment count is not maintained.")
+
+        response = self.client.get(reverse("trending_questions"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        self.assertEqual([q["id"] for q in response.data["results"]][:3], [busy.id, self.question.id, quiet.id], "Trending order does not match.")
+        response = self.client.get(reverse("hot_questions"))
+        self.assertEqual(response.data["results"][0]["id"], busy.id, "Hot order does not match.")
+        self.assertEqual(response.data["results"][-1]["id"], quiet.id, "Hot order does not match.")
+
+        changed_at = Question.objects.get(pk=busy.id).changed_at
+        call_command("decay_trending_scores", hours=6, stdout=StringIO())
+        busy = Question.objects.get(pk=busy.id)
+        self.assertAlmostEqual(busy.trending_score, 3.0, msg="Trending score is not halved.")
+        self.assertEqual(busy.changed_at, changed_at, "Decay must not show up in the changes feed.")
+        
+        # A full save() of a stale instance keeps the trigger maintained columns and the reaction counters
+        stale = Question.objects.get(pk=busy.id)
+        Comment.objects.create(user=self.user, question=busy, body="reply 3")
+        self.client.post(reverse("favorite_question", kwargs={"pk": busy.id}))
+        stale.title = "Busy question, edited"
+        stale.save()
+        busy = Question.objects.get(pk=busy.id)
+        self.assertEqual((busy.comment_count, busy.trending_score), (4, 6.0), "Full save overwrites trigger maintained columns.")
+        self.assertEqual(busy.favorite_count, stale.favorite_count + 1, "Full save overwrites reaction counters.")
+        self.assertEqual(busy.title, "Busy question, edited", "Full save does not write the other columns.")
+
+
     def test_favorite_question(self):
         """
         Test for favorite question
@@ -262,8 +921,542 @@ class UserAPITestCase(TestCase):
         response = self.client.post(reverse("favorite_question", kwargs={"pk":self.question.id}))
         response_question = self.client.get(reverse("question", kwargs={"pk":self.question.id}))
         self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
-        self.assertIn(self.user.id, response_question.data["favorited_by"], "User's favorite is not found in question")
+        self.assertTrue(response_question.data["is_favorited"], "User's favorite is not found in question")
+        self.assertEqual(response_question.data["favorite_count"], 1, "Favorite count does not match.")
+        
+        response = self.client.post(reverse("favorite_question", kwargs={"pk":self.question.id}))
+        self.assertEqual(response.data["message"], "Removed from favorites", "Favorite is not toggled back.")
+        self.assertEqual(Question.objects.get(pk=self.question.id).favorite_count, 0, "Favorite count is not decremented.")
+        
+        response = self.client.post(reverse("favorite_question", kwargs={"pk":0}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, 'Expected status code not returned')
+    
+    
+    def test_viewer_flags(self):
+        """
+        Test for the favorite and reaction flags of the requesting user
+        """
+        other_user = CustomUser.objects.create_user(email="flags@example.com", password="Password123!")
+        self.client.force_authenticate(user=self.user)
+        self.client.post(reverse("favorite_question", kwargs={"pk":self.question.id}))
+        self.client.post(reverse("like_question", kwargs={"pk":self.question.id}))
+        
+        response = self.client.get(reverse("all_question"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        summary = next(row for row in response.data["results"] if row["id"] == self.question.id)
+        self.assertEqual(
+            (summary["is_favorited"], summary["is_liked"], summary["is_disliked"], summary["favorite_count"]),
+            (True, True, False, 1), "Flags of the requesting user do not match.",
+        )
+        
+        self.client.force_authenticate(user=other_user)
+        response = self.client.get(reverse("question", kwargs={"pk":self.question.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        self.assertEqual(
+            (response.data["is_favorited"], response.data["is_liked"], response.data["favorite_count"]),
+            (False, False, 1), "Flags leaked to another user.",
+        )
+        
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse("all_question"))
+        summary = next(row for row in response.data["results"] if row["id"] == self.question.id)
+        self.assertFalse(summary["is_favorited"], "Anonymous users have no favorites.")
+        
+
+class RankingMigrationTestCase(TransactionTestCase):
+    before = [("questions", "0017_import_checkpoints")]
+    
+    def tearDown(self):
+        # Back to the latest migrations for the next tests
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+    
+    
+    def test_migrate_existing_comments(self):
+        """
+        Test for migration 0018 on a database that already has questions and comments
+        """
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        executor.loader.build_graph()
+        apps = executor.loader.project_state(list(executor.loader.applied_migrations)).apps
+        user = apps.get_model("users", "CustomUser").objects.create(email="migration@example.com", password="x")
+        OldQuestion, OldComment = apps.get_model("questions", "Question"), apps.get_model("questions", "Comment")
+        question = OldQuestion.objects.create(title="Before ranking", body="body", user_id=user.pk)
+        OldComment.objects.bulk_create([OldComment(question_id=question.pk, user_id=user.pk, body=str(i)) for i in range(3)])
+        
+        executor = MigrationExecutor(connection)
+        executor.migrate([("questions", "0018_question_ranking")])
         
+        question = Question.objects.only("comment_count", "trending_score").get(pk=question.pk)
+        self.assertEqual((question.comment_count, question.trending_score), (3, 0), "Existing comments are not counted.")
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Listing N questions must cost a constant number of queries (no N+1 through the serializers)
+    """
+    def setUp(self):
+        self.client = APIClient()
+        self.users = [
+            CustomUser.objects.create_user(email=f"budget{i}@example.com", password="Password123!")
+            for i in range(3)
+        ]
+        self.user = self.users[0]
+        tags = [Tag.objects.create(name=f"budget-tag{i}") for i in range(3)]
+        
+        for i in range(10):
+            question = Question.objects.create(title=f"Budget question {i}", body="budget body", user=self.user)
+            question.tags.add(*tags)
+            Reaction.objects.bulk_create(
+                [Reaction(user=user, question=question, kind=Reaction.LIKE) for user in self.users[:2]] +
+                [Reaction(user=self.users[2], question=question, kind=Reaction.DISLIKE)]
+            )
+            question.favorited_by.add(*self.users)
+            for user in self.users:
+                comment = Comment.objects.create(user=user, question=question, body="budget comment")
+                Reaction.objects.bulk_create(
+                    [Reaction(user=self.user, comment=comment, kind=Reaction.LIKE)] +
+                    [Reaction(user=user, comment=comment, kind=Reaction.DISLIKE) for user in self.users[1:]]
+                )
+        call_command("reconcile_reaction_counters", stdout=StringIO()) # Reactions above bypass the counters
+        self.question = question
+        self.client.force_authenticate(user=self.user)
+        
+    
+    def test_list_query_budget(self):
+        """
+        Test for list endpoints: questions, tags, favorites and nested comments are prefetched
+        """
+        # Questions with their counters and author, tags and the expanded comments.
+        # A text search adds one bounded hit count that decides the fuzzy fallback, and runs in a
+        # transaction (a savepoint and its release inside the test's transaction).
+        expand = {"expand": "comments"}
+        endpoints = [
+            (reverse("all_question"), expand, 3),
+            (reverse("own_questions"), expand, 3),
+            (reverse("favorited_questions"), expand, 3),
+            (reverse("search"), {"search": "budget", **expand}, 6),
+            (reverse("search"), {"tags__name": "budget-tag1", **expand}, 3),
+        ]
+        for url, params, queries in endpoints:
+            with self.assertNumQueries(queries, msg=url):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+            self.assertEqual(len(response.data["results"]), 10, f"{url} did not return every question.")
+            self.assertEqual(response.data["results"][0]["like_count"], 2, "Like count does not match.")
+            self.assertEqual(response.data["results"][0]["comments"][0]["dislike_count"], 2, "Comment dislike count does not match.")
+        
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("all_question"), {"fields": "id,title,like_count"})
+        self.assertEqual(set(response.data["results"][0]), {"id", "title", "like_count"}, "Sparse fields do not match.")
+        
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("all_tags"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+    
+    
+    def test_detail_query_budget(self):
+        """
+        Test for the question detail endpoint
+        """
+        # One aggregate query for the ETag, then the question with the user's flags, its tags and comments
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("question", kwargs={"pk": self.question.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        self.assertEqual(response.data["dislike_count"], 1, "Dislike count does not match.")
+        self.assertEqual(response.data["favorite_count"], 3, "Favorite count does not match.")
+        self.assertTrue(response.data["is_favorited"], "Favorite flag does not match.")
+        
+        get_cache().clear()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("get-user-by-id", kwargs={"pk": self.user.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+
+
+class ConditionalRequestTestCase(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(email="etag@example.com", password="Password123!")
+        self.question = Question.objects.create(title="Conditional", body="body", user=self.user)
+        self.comment = Comment.objects.create(user=self.user, question=self.question, body="comment")
+        self.client.force_authenticate(user=self.user)
+        
+    
+    def test_not_modified(self):
+        """
+        Test for 304 answers of unchanged questions and users, and new ETags after changes
+        """
+        url = reverse("question", kwargs={"pk": self.question.id})
+        response = self.client.get(url)
+        etag = response["ETag"]
+        # Reactions do not move updated_at, so the ETag is the only validator
+        self.assertFalse(response.has_header("Last-Modified"), "Last-Modified is sent.")
+        
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED, 'Expected status code not returned')
+        
+        for change in (
+            lambda: self.client.post(reverse("like_comment", kwargs={"pk": self.comment.id})),
+            lambda: self.question.tags.add(Tag.objects.create(name="etag")),
+            lambda: self.comment.delete(),
+        ):
+            change()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+            self.assertNotEqual(response["ETag"], etag, "ETag did not change.")
+            etag = response["ETag"]
+        
+        url = reverse("get-user-by-id", kwargs={"pk": self.user.id})
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED, 'Expected status code not returned')
+        self.user.first_name = "Renamed"
+        self.user.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK, 'Expected status code not returned')
+    
+    
+    def test_if_match_on_edit(self):
+        """
+        Test for edits with a stale ETag rejected with 412
+        """
+        question_url = reverse("edit-question", kwargs={"pk": self.question.id})
+        etag = self.client.get(reverse("question", kwargs={"pk": self.question.id}))["ETag"]
+        response = self.client.patch(question_url, {"title": "First edit"}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        self.assertEqual(response["ETag"], self.client.get(reverse("question", kwargs={"pk": self.question.id}))["ETag"], "Edit does not return the new ETag.")
+        response = self.client.patch(question_url, {"title": "Lost update"}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED, 'Expected status code not returned')
+        
+        comment_url = reverse("edit-comment", kwargs={"pk": self.comment.id})
+        etag = self.client.get(comment_url)["ETag"]
+        self.assertEqual(self.client.patch(comment_url, {"body": "Edited"}, HTTP_IF_MATCH=etag).status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        self.assertEqual(self.client.patch(comment_url, {"body": "Lost"}, HTTP_IF_MATCH=etag).status_code, status.HTTP_412_PRECONDITION_FAILED, 'Expected status code not returned')
+        self.assertEqual(Comment.objects.get(pk=self.comment.id).body, "Edited", "Stale edit was saved.")
+
+
+class ReplicaRoutingTestCase(TestCase):
+    """
+    Reads of safe requests go to a healthy replica, writers stick to the primary for a while
+    """
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = CustomUser.objects.create_user(email="replica@example.com", password="Password123!")
+        get_cache().clear()
+        replica_health.lags, replica_health.checked_at = {"replica": 0.5}, time.monotonic()
+    
+    def tearDown(self):
+        replica_health.clear()
+    
+    def route(self, request, user=None):
+        """
+        Database a read of `request` is routed to, and the response
+        """
+        if user is not None:
+            request.user = user
+        routed = []
+        def view(request):
+            routed.append(ReplicaRouter().db_for_read(Question))
+            return HttpResponse()
+        response = ReplicaRoutingMiddleware(view)(request)
+        return routed[0], response
+    
+    
+    def test_read_routing(self):
+        """
+        Test for routing reads to the replica and back to the primary after writes
+        """
+        with self.settings(DATABASE_REPLICAS=["replica"], REPLICA_LAG_CHECK_SECONDS=60, REPLICA_MAX_LAG_SECONDS=5):
+            self.assertEqual(self.route(self.factory.get("/"))[0], "replica", "Safe request is not read from the replica.")
+            self.assertEqual(ReplicaRouter().db_for_read(Question), "default", "Reads outside requests must use the primary.")
+            
+            routed, response = self.route(self.factory.post("/"), self.user)
+            self.assertEqual(routed, "default", "Write request is read from the replica.")
+            self.assertIn(STICKY_COOKIE, response.cookies, "Writer is not marked sticky.")
+            
+            request = self.factory.get("/")
+            request.COOKIES[STICKY_COOKIE] = response.cookies[STICKY_COOKIE].value
+            self.assertEqual(self.route(request)[0], "default", "Sticky cookie is not honoured.")
+            self.assertEqual(self.route(self.factory.get("/"), self.user)[0], "default", "Sticky user is not honoured.")
+            other = CustomUser.objects.create_user(email="reader@example.com", password="Password123!")
+            self.assertEqual(self.route(self.factory.get("/"), other)[0], "replica", "Other users must keep using the replica.")
+            
+            replica_health.lags = {"replica": 60}
+            self.assertEqual(self.route(self.factory.get("/"))[0], "default", "Lagging replica is not skipped.")
+            replica_health.lags = {"replica": None}
+            self.assertEqual(self.route(self.factory.get("/"))[0], "default", "Unreachable replica is not skipped.")
+    
+    
+    def test_cache_filled_from_primary(self):
+        """
+        Test for cached responses computed from the primary while the request's other reads use the replica
+        """
+        routed = []
+        class CachedView:
+            @cache_response(["questions"])
+            def get(self, request):
+                routed.append(ReplicaRouter().db_for_read(Question))
+                return Response({}, status=status.HTTP_200_OK)
+        
+        def view(request):
+            routed.append(ReplicaRouter().db_for_read(Question))
+            CachedView().get(request)
+            return HttpResponse()
+        
+        with self.settings(DATABASE_REPLICAS=["replica"], REPLICA_LAG_CHECK_SECONDS=60, REPLICA_MAX_LAG_SECONDS=5):
+            ReplicaRoutingMiddleware(view)(self.factory.get("/"))
+        self.assertEqual(routed, ["replica", "default"], "Cached response is filled from the replica.")
+    
+    
+    def test_lag_measurement(self):
+        """
+        Test for measuring a replica against the WAL position of the primary
+        """
+        lsn = replica_health.primary_lsn()
+        self.assertIsNotNone(lsn, "Primary WAL position is not read.")
+        # The test database is not a standby, only the unreachable alias has no lag
+        self.assertEqual(replica_health.measure("default", lsn), 0, "Server out of recovery has a lag.")
+        self.assertIsNone(replica_health.measure("replica", lsn), "Unreachable replica has a lag.")
+    
+    
+    def test_lag_check_in_background(self):
+        """
+        Test for measuring the lag in a background thread while requests use the last measurement
+        """
+        with self.settings(DATABASE_REPLICAS=["replica"], REPLICA_LAG_CHECK_SECONDS=5, REPLICA_MAX_LAG_SECONDS=5):
+            replica_health.checked_at -= 60
+            with self.assertNumQueries(0):
+                self.assertEqual(self.route(self.factory.get("/"))[0], "replica", "Expired measurement is not served meanwhile.")
+            replica_health.refresh_thread.join(5)
+            # "replica" is not a configured database here, so the check finds it unreachable
+            self.assertEqual(replica_health.lags, {"replica": None}, "Lag is not measured again.")
+            self.assertEqual(self.route(self.factory.get("/"))[0], "default", "Unreachable replica is not skipped.")
+
+
+class ConnectionPoolTestCase(TestCase):
+    """
+    Pooled connections are reused and counted, callers wait for a connection of a full pool
+    """
+    # contrib.postgres looks new connections up by alias, the test pool belongs to "default" whose own connection is not pooled
+    alias = "default"
+    
+    def setUp(self):
+        connection_metrics.clear()
+    
+    def tearDown(self):
+        if self.alias in pools:
+            pools.pop(self.alias).close()
+    
+    def wrapper(self):
+        settings_dict = {**connection.settings_dict, "CONN_MAX_AGE": 0, "OPTIONS": {"pool": {"max_size": 1, "timeout": 0.5, "check_idle_seconds": 0}}}
+        return DatabaseWrapper(settings_dict, alias=self.alias)
+    
+    
+    def test_pool(self):
+        """
+        Test for reusing, waiting for and timing out on pooled connections
+        """
+        first = self.wrapper()
+        first.ensure_connection()
+        raw = first.connection
+        first.close()
+        second = self.wrapper()
+        with second.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        self.assertIs(second.connection, raw, "Released connection is not reused.")
+        
+        # The pool is full while `second` holds its connection
+        with self.assertRaises(OperationalError):
+            self.wrapper().ensure_connection()
+        
+        second.inc_thread_sharing()  # Released from another thread while the next caller waits
+        threading.Timer(0.05, second.close).start()
+        third = self.wrapper()
+        third.ensure_connection()
+        self.assertIs(third.connection, raw, "Waiting caller does not get the released connection.")
+        third.close()
+        
+        counters = connection_metrics.snapshot(self.alias)
+        self.assertEqual(counters["connects"], 1, "Pool opened more connections than needed.")
+        self.assertEqual((counters["acquisitions"], counters["waits"], counters["wait_timeouts"]), (3, 2, 1), "Pool waits are not counted.")
+        self.assertEqual(pools[self.alias].stats()["idle"], 1, "Connection is not back in the pool.")
+        
+        # A pooled connection the server dropped while idle is replaced before it is handed out
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_terminate_backend(%s)", [raw.get_backend_pid()])
+        fourth = self.wrapper()
+        with fourth.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        self.assertIsNot(fourth.connection, raw, "Dropped connection is reused.")
+        fourth.close()
+        counters = connection_metrics.snapshot(self.alias)
+        self.assertEqual((counters["connects"], counters["unusable"]), (2, 1), "Dropped connection is not counted.")
+    
+    
+    def test_database_metrics(self):
+        """
+        Test for the staff only connection metrics endpoint
+        """
+        client = APIClient()
+        client.force_authenticate(user=CustomUser.objects.create_user(email="user@example.com", password="Password123!"))
+        self.assertEqual(client.get(reverse("database_metrics")).status_code, status.HTTP_403_FORBIDDEN, 'Expected status code not returned')
+        
+        client.force_authenticate(user=CustomUser.objects.create_user(email="staff@example.com", password="Password123!", is_staff=True))
+        other = DatabaseWrapper(connection.settings_dict.copy(), alias="default")
+        other.ensure_connection()
+        other.close()
+        response = client.get(reverse("database_metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        self.assertTrue(response.data["default"]["health_checks"], "Health checks are not reported.")
+        self.assertIsNone(response.data["default"]["pool"], "Unpooled database reports a pool.")
+        self.assertEqual(response.data["default"]["connects"], 1, "Connects are not reported.")
+        self.assertGreater(response.data["default"]["connect_seconds_total"], 0, "Connect time is not reported.")
+
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(email="cache@example.com", password="Password123!")
+        self.question = Question.objects.create(title="Cached question", body="body", user=self.user)
+        self.client.force_authenticate(user=self.user)
+        
+    
+    def test_cached_responses_are_invalidated_by_writes(self):
+        """
+        Test for cache hits without queries and invalidation by question, comment and reaction writes
+        """
+        detail = reverse("question", kwargs={"pk": self.question.id})
+        user = reverse("get-user-by-id", kwargs={"pk": self.user.id})
+        # Question and user ETags cost one query even when the response is cached
+        for url, queries in ((reverse("all_question"), 0), (detail, 1), (reverse("all_tags"), 0), (user, 1)):
+            self.client.get(url)
+            with self.assertNumQueries(queries, msg=url):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        
+        self.client.post(reverse("like_question", kwargs={"pk": self.question.id}))
+        self.assertEqual(self.client.get(detail).data["like_count"], 1, "Like did not invalidate the question.")
+        
+        comment = Comment.objects.create(user=self.user, question=self.question, body="First")
+        self.assertEqual(self.client.get(reverse("all_question")).data["results"][0]["comment_count"], 1, "Comment did not invalidate the list.")
+        
+        self.client.post(reverse("like_comment", kwargs={"pk": comment.id}))
+        self.assertEqual(self.client.get(detail).data["comments"][0]["like_count"], 1, "Comment like did not invalidate the question.")
+        
+        self.client.post(reverse("bulk_reactions"), {"operations": [{"action": "favorite", "target": "question", "id": self.question.id}]}, format="json")
+        self.assertEqual(self.client.get(detail).data["is_favorited"], True, "Bulk favorite did not invalidate the question.")
+        
+        with self.captureOnCommitCallbacks(execute=True): # Bulk created tags are announced on commit
+            self.client.patch(reverse("edit-question", kwargs={"pk": self.question.id}), {"tags": ["cached"]})
+        self.assertEqual(self.client.get(reverse("all_tags")).data[0]["name"], "cached", "New tag did not invalidate the tags.")
+        self.assertEqual(self.client.get(detail).data["tag_names"], ["cached"], "Tag change did not invalidate the question.")
+    
+    
+    def test_stampede_guard(self):
+        """
+        Test for a single recomputation while another request holds the lock
+        """
+        calls = []
+        def compute():
+            calls.append(1)
+            return "fresh", True
+        
+        self.assertEqual(get_or_set("stampede", ["questions"], compute), "fresh")
+        self.assertEqual(get_or_set("stampede", ["questions"], compute), "fresh")
+        self.assertEqual(len(calls), 1, "Cached value was recomputed.")
+        
+        bump("questions")
+        key = f"response:stampede:{get_versions(['questions'])[0]}"
+        get_cache().add(f"{key}:lock", 1)
+        threading.Timer(0.05, lambda: get_cache().set(key, "from other request")).start()
+        self.assertEqual(get_or_set("stampede", ["questions"], compute), "from other request", "Waiting request did not reuse the result.")
+        self.assertEqual(len(calls), 1, "Locked value was recomputed.")
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    EXPLAIN every query the hot endpoints run on a seeded dataset. Sequential scans are disabled for the
+    test, so a seq scan still chosen on one of INDEXED_TABLES means no index serves that access path.
+    The estimated cost of every query must also stay under COST_BUDGET.
+    """
+    INDEXED_TABLES = {
+        "questions_question", "questions_comment", "questions_question_tags", "questions_question_favorited_by",
+        "questions_reaction", "questions_tombstone",
+    }
+    COST_BUDGET = 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [CustomUser.objects.create_user(email=f"plan{i}@example.com", password="Password123!") for i in range(5)]
+        cls.user = cls.users[0]
+        tags = Tag.objects.bulk_create([Tag(name=f"plan-tag{i}") for i in range(20)])
+        questions = Question.objects.bulk_create([
+            Question(user=cls.users[i % 5], title=f"Plan question {i} about pumps", body=f"plan body {i}") for i in range(500)
+        ])
+        Question.tags.through.objects.bulk_create([
+            Question.tags.through(question_id=question.id, tag_id=tags[(i + j) % 20].id)
+            for i, question in enumerate(questions) for j in range(2)
+        ])
+        Question.favorited_by.through.objects.bulk_create([
+            Question.favorited_by.through(question_id=question.id, customuser_id=cls.user.id) for question in questions[::7]
+        ])
+        Reaction.objects.bulk_create([
+            Reaction(user=user, question=question, kind=Reaction.LIKE) for question in questions[::3] for user in cls.users[:2]
+        ])
+        Comment.objects.bulk_create([
+            Comment(user=cls.users[j], question=question, body=f"plan answer {j}") for question in questions for j in range(3)
+        ])
+        cls.question = questions[0]
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        get_cache().clear()
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off") # Until the test's transaction is rolled back
+
+    def plan_nodes(self, plan):
+        yield plan
+        for child in plan.get("Plans", []):
+            yield from self.plan_nodes(child)
+
+    def test_query_plans(self):
+        """
+        Test that the endpoints' queries use indexes and stay within the cost budget
+        """
+        endpoints = [
+            (reverse("all_question"), {}),
+            (reverse("all_question"), {"sort": "most_liked"}),
+            (reverse("hot_questions"), {}),
+            (reverse("trending_questions"), {}),
+            (reverse("own_questions"), {}),
+            (reverse("favorited_questions"), {}),
+            (reverse("search"), {"search": "pumps", "page_size": 5}),
+            (reverse("search"), {"tags": "plan-tag1,plan-tag2"}),
+            (reverse("search"), {"tags__name": "plan-tag3"}),
+            (reverse("question", kwargs={"pk": self.question.id}), {}),
+            (reverse("question_comments", kwargs={"pk": self.question.id}), {"sort": "most_liked"}),
+            (reverse("changes"), {"limit": 50}),
+        ]
+        for url, params in endpoints:
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+
+            for query in captured.captured_queries:
+                if not query["sql"].lstrip().upper().startswith("SELECT"):
+                    continue
+                with connection.cursor() as cursor:
+                    cursor.execute(f"EXPLAIN (FORMAT JSON) {query['sql']}")
+                    plan = cursor.fetchone()[0][0]["Plan"]
+                scanned = {node.get("Relation Name") for node in self.plan_nodes(plan) if node["Node Type"] == "Seq Scan"}
+                self.assertFalse(scanned & self.INDEXED_TABLES, f"{url} {params}: sequential scan of {scanned} in {query['sql']}")
+                self.assertLessEqual(plan["Total Cost"], self.COST_BUDGET, f"{url} {params}: cost over budget for {query['sql']}")
+
 
 class APIPerformanceTestCase(TestCase):
     def setUp(self):
@@ -1,25 +1,34 @@
 from django.urls import path
 from questions.views import (
-    AllQuestions, AllTags, CreateQuestion, CreateComment, OwnQuestions, FavoritedQuestions, Search,
-    EditQuestion,EditComment, QuestionByID,
+    AllQuestions, HotQuestions, TrendingQuestions, AllTags, TagStats, CreateQuestion, CreateComment, OwnQuestions, FavoritedQuestions, Search,
+    EditQuestion,EditComment, QuestionByID, QuestionComments,
     LikeQuestion, DislikeQuestion, LikeComment, DislikeComment,
-    FavoriteQuestion,
+    FavoriteQuestion, BulkReactions, Suggestions, Changes, Export, DatabaseMetrics,
 )
 
 urlpatterns = [
     path("all-questions/", AllQuestions.as_view(), name="all_question"),
+    path("hot/", HotQuestions.as_view(), name="hot_questions"),
+    path("trending/", TrendingQuestions.as_view(), name="trending_questions"),
     path("all-tags/", AllTags.as_view(), name="all_tags"),
+    path("tag-stats/", TagStats.as_view(), name="tag_stats"),
     path("create-question/",CreateQuestion.as_view(),name="create_question"),
     path("create-comment/",CreateComment.as_view(),name="create_comment"),
     path("own-questions/",OwnQuestions.as_view(),name="own_questions"),
     path("favorited-questions/",FavoritedQuestions.as_view(),name="favorited_questions"),
     path("search/", Search.as_view(),name="search"),
+    path("suggestions/", Suggestions.as_view(), name="suggestions"),
     path('edit-question/<int:pk>', EditQuestion.as_view(), name='edit-question'),
     path('edit-comment/<int:pk>', EditComment.as_view(), name='edit-comment'),
     path("question/<int:pk>", QuestionByID.as_view(), name="question"),
+    path("question/<int:pk>/comments", QuestionComments.as_view(), name="question_comments"),
     path("like-question/<int:pk>", LikeQuestion.as_view(), name="like_question"),
     path("dislike-question/<int:pk>", DislikeQuestion.as_view(), name="dislike_question"),
     path("like-comment/<int:pk>", LikeComment.as_view(), name="like_comment"),
     path("dislike-comment/<int:pk>", DislikeComment.as_view(), name="dislike_comment"),
     path("favorite-question/<int:pk>", FavoriteQuestion.as_view(), name="favorite_question"),
+    path("bulk-reactions/", BulkReactions.as_view(), name="bulk_reactions"),
+    path("changes/", Changes.as_view(), name="changes"),
+    path("export/", Export.as_view(), name="export"),
+    path("metrics/database/", DatabaseMetrics.as_view(), name="database_metrics"),
 ]
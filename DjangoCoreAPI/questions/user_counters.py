@@ -0,0 +1,22 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Case, F, IntegerField, Value, When
+from DjangoCoreAPI.response_cache import bump
+
+QUESTIONS_ASKED = 'questions_asked'
+ANSWERS_GIVEN = 'answers_given'
+
+
+def adjust_user_counters(field, deltas):
+    """
+    Move `field` (questions_asked or answers_given) of each user in `deltas` ({user id: delta}) with one
+    UPDATE of F() increments, in the caller's transaction
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    whens = [When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()]
+    get_user_model().objects.filter(pk__in=deltas).update(
+        **{field: F(field) + Case(*whens, default=Value(0), output_field=IntegerField())},
+    )
+    # update() sends no post_save, the profiles are invalidated here
+    bump(*(f'user:{pk}' for pk in deltas))
@@ -1,12 +1,32 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework import status
 from rest_framework.generics import get_object_or_404, ListAPIView
-from rest_framework import filters
-from questions.models import Question, Comment, Tag
-from questions.serializers import QuestionSerializer, CommentSerializer, TagSerializer
+from questions.models import Question, Comment, Tag, Reaction, TagStat
+from questions.serializers import (
+    QuestionSerializer, CommentSerializer, TagSerializer, TagStatSerializer, BulkReactionSerializer,
+    ReactionOperationSerializer, SyncQuestionSerializer, TombstoneSerializer, QuestionSummarySerializer,
+)
+from questions.reactions import apply_reaction_batch
+from questions.export import export_ndjson
+from questions.sync import CursorExpired, changes_since
+from questions.pagination import CommentPagination, KeysetPagination
+from questions.filters import FullTextSearchFilter, TagFilterBackend
+from questions.suggestions import QUESTION, TAG, suggestion_index
 from drf_yasg.utils import swagger_auto_schema
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from DjangoCoreAPI.response_cache import cache_response
+from DjangoCoreAPI.db_backend.metrics import connection_metrics
+from DjangoCoreAPI.db_backend.pool import pools
+from django.utils.decorators import method_decorator
+from django.utils.cache import quote_etag
+from django.views.decorators.http import etag
+from questions.conditional import question_etag, question_state, comment_etag, comment_state
 from django_filters.rest_framework import DjangoFilterBackend
 
 
@@ -14,16 +34,31 @@ class AllQuestions(APIView):
     permission_classes = [AllowAny]
     
     @swagger_auto_schema(
-        responses={200: QuestionSerializer()}
+        responses={200: QuestionSummarySerializer(many=True)}
     )
+    @cache_response(['questions', 'tags'], per_user=True)
     def get(self, request):
-        questions = Question.objects.all()
-        serializer = QuestionSerializer(questions, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        fields = QuestionSummarySerializer.requested_fields(request)
+        questions = Question.objects.for_summary(fields, request.user)
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(questions, request, view=self)
+        serializer = QuestionSummarySerializer(page, many=True, fields=fields)
+        return paginator.get_paginated_response(serializer.data)
+    
+class HotQuestions(AllQuestions):
+    # Engagement on a log scale plus recency, precomputed in hot_score: one range scan of its index
+    keyset_ordering = ('-hot_score', '-id')
+
+
+class TrendingQuestions(AllQuestions):
+    # Engagement gained lately, precomputed in trending_score and decayed by decay_trending_scores
+    keyset_ordering = ('-trending_score', '-id')
+
     
 class AllTags(APIView):
     permission_classes = [AllowAny]
     
+    @cache_response(['tags'])
     def get(self, request):
         tags = Tag.objects.all()
         serializer = TagSerializer(tags, many=True)
@@ -31,6 +66,94 @@ class AllTags(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
     
     
+class Changes(APIView):
+    permission_classes = [AllowAny]
+    
+    # Delta sync: questions and comments changed, and deletions, since the client's last cursor
+    # /?cursor=...&limit=200, follow the returned cursor while has_more is true
+    def get(self, request):
+        max_limit = getattr(settings, 'SYNC_PAGE_SIZE', 200)
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", max_limit)), max_limit))
+        except ValueError:
+            limit = max_limit
+        try:
+            rows, cursor, has_more = changes_since(request.query_params.get("cursor"), limit, request.user)
+        except CursorExpired:
+            return Response({"error": "Cursor expired, sync again without a cursor."}, status=status.HTTP_410_GONE)
+        return Response({
+            "questions": SyncQuestionSerializer(rows["questions"], many=True).data,
+            "comments": CommentSerializer(rows["comments"], many=True).data,
+            "deleted": TombstoneSerializer(rows["deleted"], many=True).data,
+            "cursor": cursor,
+            "has_more": has_more,
+        }, status=status.HTTP_200_OK)
+
+
+class TagStats(APIView):
+    permission_classes = [AllowAny]
+    
+    # Tag cloud: question count, last activity and most co-occurring tags, from the TagStat aggregates
+    # /?limit=50
+    @swagger_auto_schema(
+        responses={200: TagStatSerializer(many=True)}
+    )
+    def get(self, request):
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 50)), 500))
+        except ValueError:
+            limit = 50
+        stats = TagStat.objects.filter(question_count__gt=0).select_related('tag').order_by('-question_count', 'tag')[:limit]
+        serializer = TagStatSerializer(stats, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class Export(APIView):
+    permission_classes = [IsAdminUser]
+    
+    # Every question, comment, reaction and favorite as NDJSON, one {"type": ...} object per line,
+    # streamed from server-side cursors: /?updated_since=2024-01-01T00:00:00Z&gzip=1
+    # The same export is written to a file by manage.py export_questions
+    def get(self, request):
+        updated_since = None
+        if request.query_params.get("updated_since"):
+            try:
+                updated_since = parse_datetime(request.query_params["updated_since"])
+            except ValueError: # Well formed but impossible, e.g. month 13
+                updated_since = None
+            if updated_since is None:
+                return Response({"error": "updated_since must be an ISO 8601 date and time."}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(updated_since):
+                updated_since = timezone.make_aware(updated_since)
+        compress = request.query_params.get("gzip") in ("1", "true")
+        response = StreamingHttpResponse(
+            export_ndjson(updated_since, compress),
+            content_type="application/gzip" if compress else "application/x-ndjson",
+        )
+        filename = "export.ndjson.gz" if compress else "export.ndjson"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class DatabaseMetrics(APIView):
+    permission_classes = [IsAdminUser]
+    
+    # Connection settings and this worker's counters per database: connects and their duration, unusable
+    # connections dropped by health checks, pool size and the time requests waited for a pooled connection
+    def get(self, request):
+        data = {}
+        for alias in connections:
+            settings_dict = connections.settings[alias]
+            data[alias] = {
+                "conn_max_age": settings_dict.get("CONN_MAX_AGE", 0),
+                "health_checks": settings_dict.get("CONN_HEALTH_CHECKS", False),
+                "server_side_cursors": not settings_dict.get("DISABLE_SERVER_SIDE_CURSORS", False),
+                "pool": pools[alias].stats() if alias in pools else None,
+                **connection_metrics.snapshot(alias),
+            }
+        return Response(data, status=status.HTTP_200_OK)
+
+
 class CreateQuestion(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -41,7 +164,8 @@ class CreateQuestion(APIView):
     def post(self, request):
         serializer = QuestionSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(user = request.user)
+            with transaction.atomic(): # The author's counter is moved in the same transaction
+                serializer.save(user = request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -59,7 +183,8 @@ class CreateComment(APIView):
     def post(self, request):
         serializer = CommentSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(user = request.user)
+            with transaction.atomic(): # The author's counter is moved in the same transaction
+                serializer.save(user = request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)        
       
@@ -68,42 +193,96 @@ class OwnQuestions(APIView):
     permission_classes = [IsAuthenticated]
     
     @swagger_auto_schema(
-        responses={200: QuestionSerializer()}
+        responses={200: QuestionSummarySerializer(many=True)}
     )
     def get(self,request):
-        own_questions = Question.objects.filter(user=request.user)
-        serializer = QuestionSerializer(own_questions, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        fields = QuestionSummarySerializer.requested_fields(request)
+        own_questions = Question.objects.for_summary(fields, request.user).filter(user=request.user)
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(own_questions, request, view=self)
+        serializer = QuestionSummarySerializer(page, many=True, fields=fields)
+        return paginator.get_paginated_response(serializer.data)
     
     
 class FavoritedQuestions(APIView):
     permission_classes = [IsAuthenticated]
     
     @swagger_auto_schema(
-        responses={200: QuestionSerializer()}
+        responses={200: QuestionSummarySerializer(many=True)}
     )
     def get(self,request):
-        favorited_questions = Question.objects.filter(favorited_by=request.user)
-        serializer = QuestionSerializer(favorited_questions, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        fields = QuestionSummarySerializer.requested_fields(request)
+        favorited_questions = Question.objects.for_summary(fields, request.user).filter(favorited_by=request.user)
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(favorited_questions, request, view=self)
+        serializer = QuestionSummarySerializer(page, many=True, fields=fields)
+        return paginator.get_paginated_response(serializer.data)
     
 
-# https://www.django-rest-framework.org/api-guide/filtering/#searchfilter
+# https://www.postgresql.org/docs/current/textsearch-controls.html
 # https://www.django-rest-framework.org/api-guide/filtering/#djangofilterbackend
-# optionally order filter can be added
-# optionally flexible search for spelling can be added 
 class Search(ListAPIView):
     permission_classes = [AllowAny]
     
     queryset = Question.objects.all()
-    serializer_class = QuestionSerializer
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend] # Contains search (Default)
+    serializer_class = QuestionSummarySerializer # /?fields=id,title&expand=comments
+    pagination_class = KeysetPagination # /?cursor=...&page_size=...
+    # Tag filtering first, so the full text hit count that decides the fuzzy fallback respects it
+    filter_backends = [DjangoFilterBackend, TagFilterBackend, FullTextSearchFilter]
+    # Ranked full text search over title, body and author name: "exact phrase", either or, -exclude, prefix*
+    # Too few hits add typo tolerant trigram matches of titles and tag names
+    # /?search=anystring
     # ManyToManyField with the lookup API double-underscore notation
-    search_fields = ['user__first_name','user__last_name','title', 'body'] # /?search=anystring
     filterset_fields = ['tags__name'] # /?tags__name=tagstring
+    # Several tags without duplicated rows: /?tags=pump,seal&tag_mode=all (default) or tag_mode=any
+    
+    search_ranked = False # Set by FullTextSearchFilter once it annotated `rank`
+    database = None # Alias the request reads from, picked once in list()
+    
+    @property
+    def keyset_ordering(self):
+        # Best matches first while searching, otherwise the paginator's ?sort= ordering
+        if self.search_ranked:
+            return ('-rank', '-id')
+        return None
+    
+    def list(self, request, *args, **kwargs):
+        # The fuzzy fallback sets its trigram thresholds for the current transaction only,
+        # so a text search runs in one transaction on one database
+        self.database = router.db_for_read(Question)
+        if not FullTextSearchFilter().get_search_text(request):
+            return super().list(request, *args, **kwargs)
+        with transaction.atomic(using=self.database):
+            return super().list(request, *args, **kwargs)
+    
+    def get_queryset(self):
+        questions = super().get_queryset().using(self.database)
+        return questions.for_summary(QuestionSummarySerializer.requested_fields(self.request), self.request.user)
+    
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', QuestionSummarySerializer.requested_fields(self.request))
+        return super().get_serializer(*args, **kwargs)
     
 
 
+class Suggestions(APIView):
+    permission_classes = [AllowAny]
+    
+    # Autocomplete for the search box, served from the in-memory prefix index without a database query
+    # /?q=hydr&limit=10
+    def get(self, request):
+        prefix = request.query_params.get("q", "")
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 10)), 50))
+        except ValueError:
+            limit = 10
+        found = suggestion_index.suggest(prefix, limit)
+        return Response({
+            "tags": list(found[TAG].values()),
+            "questions": [{"id": pk, "title": title} for pk, title in found[QUESTION].items()],
+        }, status=status.HTTP_200_OK)
+
+
 class EditQuestion(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -111,6 +290,8 @@ class EditQuestion(APIView):
         request_body=QuestionSerializer,
         responses={200: QuestionSerializer()}
     )
+    # If-Match with the ETag of question/<pk> rejects edits of a changed question with 412
+    @method_decorator(etag(question_etag))
     def patch(self, request, pk):
         question = get_object_or_404(Question,pk=pk)
         
@@ -120,17 +301,30 @@ class EditQuestion(APIView):
         serializer = QuestionSerializer(question, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            response = Response(serializer.data, status=status.HTTP_200_OK)
+            response["ETag"] = quote_etag(question_state(pk, request.user))
+            return response
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class EditComment(APIView):
     permission_classes = [IsAuthenticated]
     
+    # The comment with its ETag, for conditional edits
+    @swagger_auto_schema(
+        responses={200: CommentSerializer()}
+    )
+    @method_decorator(etag(comment_etag))
+    def get(self, request, pk):
+        comment = get_object_or_404(Comment, pk=pk)
+        serializer = CommentSerializer(comment)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+    
     @swagger_auto_schema(
         request_body=CommentSerializer,
         responses={200: CommentSerializer()}
     )
+    @method_decorator(etag(comment_etag))
     def patch(self, request, pk):
         comment = get_object_or_404(Comment, pk=pk)
     
@@ -144,7 +338,9 @@ class EditComment(APIView):
         serializer = CommentSerializer(comment, data=request_data, partial=True)
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            response = Response(serializer.data, status=status.HTTP_200_OK)
+            response["ETag"] = quote_etag(comment_state(pk, request.user))
+            return response
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
 
@@ -154,88 +350,98 @@ class QuestionByID(APIView):
     @swagger_auto_schema(
         responses={200: QuestionSerializer()}
     )
+    # Unchanged questions are answered with 304 from one aggregate query, before the cache or serializer
+    @method_decorator(etag(question_etag))
+    @cache_response(lambda request, pk: ['tags', f'question:{pk}'], per_user=True)
     def get(self,request, pk):
-        question = get_object_or_404(Question, pk=pk)
-        serializer = QuestionSerializer(question)
+        question = get_object_or_404(Question.objects.for_serializer(request.user), pk=pk)
+        serializer = QuestionSerializer(question, context={"request": request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+
+class QuestionComments(APIView):
+    permission_classes = [AllowAny]
+    
+    # Every comment of a question, a page at a time: /?sort=newest (default), oldest or most_liked&cursor=...
+    @swagger_auto_schema(
+        responses={200: CommentSerializer(many=True)}
+    )
+    @cache_response(lambda request, pk: [f'question:{pk}'])
+    def get(self, request, pk):
+        get_object_or_404(Question.objects.only('pk'), pk=pk)
+        paginator = CommentPagination()
+        page = paginator.paginate_queryset(Comment.objects.filter(question_id=pk), request, view=self)
+        serializer = CommentSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     
 class LikeQuestion(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        question = get_object_or_404(Question, pk=pk)
-        
-        if request.user in question.disliked_users.all():
-            question.disliked_users.remove(request.user)  # Remove from dislikes if already disliked
-            
-        if request.user in question.liked_users.all():
-            question.liked_users.remove(request.user)  # Toggle like off
-            return Response({"message": "Like removed"}, status=status.HTTP_200_OK)
-        else:
-            question.liked_users.add(request.user)  # Add like
+        if Reaction.objects.toggle(request.user, Reaction.LIKE, question_id=pk):
             return Response({"message": "Liked successfully"}, status=status.HTTP_200_OK)
+        return Response({"message": "Like removed"}, status=status.HTTP_200_OK)
         
 
 class DislikeQuestion(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        question = get_object_or_404(Question, pk=pk)
-        
-        if request.user in question.liked_users.all():
-            question.liked_users.remove(request.user)  # Remove from likes if already liked,
-            
-        if request.user in question.disliked_users.all():
-            question.disliked_users.remove(request.user)  # Toggle dislike off 
-            return Response({"message": "Dislike removed"}, status=status.HTTP_200_OK)
-        else:
-            question.disliked_users.add(request.user)  # Add dislike
+        if Reaction.objects.toggle(request.user, Reaction.DISLIKE, question_id=pk):
             return Response({"message": "Disliked successfully"}, status=status.HTTP_200_OK)
+        return Response({"message": "Dislike removed"}, status=status.HTTP_200_OK)
         
 
 class LikeComment(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        comment = get_object_or_404(Comment, pk=pk)
-        
-        if request.user in comment.disliked_users.all():
-            comment.disliked_users.remove(request.user)  # Remove from dislikes if already disliked
-            
-        if request.user in comment.liked_users.all():
-            comment.liked_users.remove(request.user)  # Toggle like off
-            return Response({"message": "Like removed"}, status=status.HTTP_200_OK)
-        else:
-            comment.liked_users.add(request.user)  # Add like
+        if Reaction.objects.toggle(request.user, Reaction.LIKE, comment_id=pk):
             return Response({"message": "Liked successfully"}, status=status.HTTP_200_OK)
+        return Response({"message": "Like removed"}, status=status.HTTP_200_OK)
         
 
 class DislikeComment(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        comment = get_object_or_404(Comment, pk=pk)
-        
-        if request.user in comment.liked_users.all():
-            comment.liked_users.remove(request.user)  # Remove from likes if already liked,
-            
-        if request.user in comment.disliked_users.all():
-            comment.disliked_users.remove(request.user)  # Toggle dislike off 
-            return Response({"message": "Dislike removed"}, status=status.HTTP_200_OK)
-        else:
-            comment.disliked_users.add(request.user)  # Add dislike
+        if Reaction.objects.toggle(request.user, Reaction.DISLIKE, comment_id=pk):
             return Response({"message": "Disliked successfully"}, status=status.HTTP_200_OK)
+        return Response({"message": "Dislike removed"}, status=status.HTTP_200_OK)
 
 
 class FavoriteQuestion(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        question = get_object_or_404(Question, pk=pk)
-        if request.user in question.favorited_by.all():
-            question.favorited_by.remove(request.user)
-            return Response({"message": "Removed from favorites"}, status=status.HTTP_200_OK)
-        else:
-            question.favorited_by.add(request.user)
-            return Response({"message": "Added to favorites"}, status=status.HTTP_200_OK)
\ No newline at end of file
+        if Question.objects.toggle_favorite(request.user, pk):
+            return Response({"message": "Added to favorites"}, status=status.HTTP_200_OK)
+        return Response({"message": "Removed from favorites"}, status=status.HTTP_200_OK)
+
+
+class BulkReactions(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        request_body=BulkReactionSerializer,
+        responses={200: 'Result of every operation in request order', 400: 'Invalid data'}
+    )
+    def post(self, request):
+        serializer = BulkReactionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Invalid items are reported one by one, the valid ones are applied together
+        operations, results = [], []
+        for item in serializer.validated_data['operations']:
+            operation = ReactionOperationSerializer(data=item)
+            if operation.is_valid():
+                operations.append(operation.validated_data)
+                results.append(None)
+            else:
+                results.append({'status': 'invalid', 'errors': operation.errors})
+        
+        applied = iter(apply_reaction_batch(request.user, operations))
+        results = [{'index': index, **(result or next(applied))} for index, result in enumerate(results)]
+        return Response({"results": results}, status=status.HTTP_200_OK)
@@ -53,6 +53,13 @@ class UpdateUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ('first_name', 'last_name', 'role', 'profile_picture', 'receive_email_notifications') # email field is removed maybe it can be added later
+
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        # Only edited columns are written so concurrent questions_asked/answers_given updates are not overwritten
+        instance.save(update_fields=list(validated_data))
+        return instance
         
 
 class ChangePasswordSerializer(serializers.Serializer):
@@ -0,0 +1,13 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from DjangoCoreAPI.response_cache import bump
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_user(sender, instance, update_fields=None, **kwargs):
+    bump(f'user:{instance.pk}')
+    # Question lists show the author's name, logins only write last_login
+    if update_fields is None or {'first_name', 'last_name'} & set(update_fields):
+        bump('questions')
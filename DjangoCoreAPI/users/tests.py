@@ -2,6 +2,7 @@ from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
+from django.db.models import F
 from rest_framework import status
 
 CustomUser = get_user_model()
@@ -101,6 +102,8 @@ class UserAPITestCase(TestCase):
         Test for updating user profile
         """
         self.client.force_authenticate(user=self.user)
+        # Counter moved by another request after this one loaded the user
+        CustomUser.objects.filter(pk=self.user.pk).update(questions_asked=F('questions_asked') + 1)
         update_data = {
             'first_name': 'Updated',
             'last_name': 'Name',
@@ -115,6 +118,7 @@ class UserAPITestCase(TestCase):
         self.assertEqual(updated_user.last_name, update_data["last_name"], 'Last name field is not updated.')
         self.assertEqual(updated_user.role, update_data["role"], 'Role field is not updated.')
         self.assertFalse(updated_user.receive_email_notifications, 'Receive email notification field is not updated.')
+        self.assertEqual(updated_user.questions_asked, 1, 'Concurrent counter update is overwritten.')
 
 
     def test_change_password(self):
@@ -127,8 +131,10 @@ class UserAPITestCase(TestCase):
             'new_password': 'NewPassword123!',
             'new_password2': 'NewPassword123!'
         }
+        CustomUser.objects.filter(pk=self.user.pk).update(answers_given=F('answers_given') + 1)
         response = self.client.post(reverse('change_password'), change_password_data)
         self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected status code not returned')
+        self.assertEqual(CustomUser.objects.get(pk=self.user.pk).answers_given, 1, 'Concurrent counter update is overwritten.')
 
         login_data = {
             'email': self.user_data['email'],
@@ -8,6 +8,10 @@ from rest_framework.generics import get_object_or_404
 from users.serializers import CustomUserSerializer, UpdateUserSerializer, RegisterSerializer, LoginSerializer, ChangePasswordSerializer
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from DjangoCoreAPI.response_cache import cache_response
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import etag
+import hashlib
 
 
 CustomUser = get_user_model()
@@ -95,7 +99,7 @@ class ChangePasswordUserView(APIView):
                 return Response({"old_password": ["Wrong password."]}, status=status.HTTP_400_BAD_REQUEST)
 
             user.set_password(serializer.validated_data['new_password'])
-            user.save()
+            user.save(update_fields=['password'])  # Keeps concurrent counter updates
             return Response({"message": "Password updated successfully"}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -112,9 +116,17 @@ class DeleteUserView(APIView):
         return Response({"message": "User account deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
 
 
+def user_etag(request, pk):
+    # Users have no modification time, the ETag is a digest of the serialized columns
+    row = CustomUser.objects.filter(pk=pk).values_list(*CustomUserSerializer.Meta.fields).first()
+    return hashlib.md5(repr(row).encode()).hexdigest() if row is not None else None
+
+
 class GetUserByIdView(APIView):
     permission_classes = [AllowAny]
     
+    @method_decorator(etag(user_etag))
+    @cache_response(lambda request, pk: [f'user:{pk}'])
     def get(self, request, pk):
         user = get_object_or_404(CustomUser, pk=pk)
         serializer = CustomUserSerializer(user)